@@ -2,6 +2,7 @@
 import os
 from pathlib import Path
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -146,7 +147,9 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
-CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken']
+CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken', 'Idempotent-Replayed']
+# Checkout forms send an Idempotency-Key so retried POSTs create one order
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 # Authentication
 LOGIN_URL = '/login/'
@@ -164,4 +167,41 @@ WHITENOISE_MANIFEST_STRICT = False
 
 print("🔐 SECURITY & CORS CONFIGURATION UPDATED")
 print(f"   CSRF Trusted Origins: {len(CSRF_TRUSTED_ORIGINS)} configured")
-print(f"   CORS Allowed Origins: {len(CORS_ALLOWED_ORIGINS)} configured")
\ No newline at end of file
+print(f"   CORS Allowed Origins: {len(CORS_ALLOWED_ORIGINS)} configured")
+
+# Caches. `default` is per process: catalog facets are keyed by the snapshot
+# version, so every worker can keep its own copy. `shared` must be one store
+# for all workers on all hosts, because writes invalidate entries in it
+# (store/tracking_cache.py): Redis when REDIS_URL is set, else a database
+# table created by `manage.py createcachetable`.
+REDIS_URL = os.environ.get('REDIS_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'store_shared_cache',
+    },
+}
+
+# Catalog snapshot shared by all workers on one host (see store/catalog_cache.py).
+# Catalog edits mark this file stale and the next read rebuilds it, which only
+# reaches the host that took the edit: with more than one app host, point this
+# at storage they all share, or run `manage.py rebuild_catalog_snapshot` on
+# each host after catalog changes.
+CATALOG_SNAPSHOT_PATH = os.environ.get('CATALOG_SNAPSHOT_PATH', BASE_DIR / 'var' / 'catalog.snapshot')
+
+# Outgoing mail, sent by run_notification_worker (see store/notifications.py)
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'False').lower() == 'true'
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', 30))
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'Frecha Iotech <noreply@frechaiotech.com>')
+# Seconds an order's status-update notification waits for further changes to merge into one digest
+NOTIFICATION_COALESCE_WINDOW = int(os.environ.get('NOTIFICATION_COALESCE_WINDOW', 120))
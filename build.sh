@@ -11,6 +11,22 @@ pip install -r requirements.txt
 echo "🔄 Applying database migrations..."
 python manage.py migrate
 
+# Table for the shared cache when REDIS_URL is not set (no-op if it exists)
+echo "🗄️ Creating cache table..."
+python manage.py createcachetable
+
+# Fill the numeric volume columns for rows written outside Model.save()
+echo "📶 Backfilling data volumes..."
+python manage.py backfill_data_volumes
+
+# Rebuild the catalog snapshot so workers never serve one from an older release
+echo "🗂️ Rebuilding catalog snapshot..."
+python manage.py rebuild_catalog_snapshot
+
+# Rebuild the product search index
+echo "🔎 Rebuilding search index..."
+python manage.py rebuild_search_index
+
 # Create superuser if environment variables are set (secure method)
 echo "👤 Setting up superuser..."
 if [ -n "$DJANGO_SUPERUSER_USERNAME" ] && [ -n "$DJANGO_SUPERUSER_EMAIL" ] && [ -n "$DJANGO_SUPERUSER_PASSWORD" ]; then
@@ -23,5 +39,9 @@ fi
 echo "📁 Collecting static files..."
 python manage.py collectstatic --no-input --clear
 
+# Customer notifications are sent by a separate long-running process (the
+# `worker` entry in the Procfile); until it runs they are sent inline.
+echo "📬 Start the notification worker with: python manage.py run_notification_worker"
+
 echo "✅ Production build completed successfully!"
 echo "🌐 Your application is ready at: https://frecha-iotech.onrender.com"
\ No newline at end of file
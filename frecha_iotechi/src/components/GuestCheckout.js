@@ -1,5 +1,5 @@
 // components/GuestCheckout.js
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import axios from 'axios';
 
 const GuestCheckout = ({ cartItems, total, onOrderSuccess, onBack }) => {
@@ -13,9 +13,14 @@ const GuestCheckout = ({ cartItems, total, onOrderSuccess, onBack }) => {
   });
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  // One key per order: retries of the same submission reuse it, so the
+  // server creates the order only once.
+  const idempotencyKey = useRef(null);
 
   const handleInputChange = (e) => {
     const { name, value, type, checked } = e.target;
+    // A changed form is a different order
+    idempotencyKey.current = null;
     setFormData(prev => ({
       ...prev,
       [name]: type === 'checkbox' ? checked : value
@@ -28,19 +33,28 @@ const GuestCheckout = ({ cartItems, total, onOrderSuccess, onBack }) => {
     setError('');
 
     try {
+      // The whole cart is one order; prices are looked up by the server
       const orderData = {
-        ...formData,
+        customer_name: formData.customer_name,
+        customer_email: formData.customer_email,
+        customer_phone: formData.customer_phone,
+        notes: formData.shipping_address,
         items: cartItems.map(item => ({
-          product_name: item.name,
-          quantity: item.quantity,
-          price: item.price
-        })),
-        total_amount: total
+          service_type: item.type.replace('-', '_'),
+          product_id: item.id,
+          quantity: item.quantity
+        }))
       };
 
-      const response = await axios.post('/api/orders/', orderData);
+      if (!idempotencyKey.current) {
+        idempotencyKey.current = window.crypto.randomUUID();
+      }
+      const response = await axios.post('/api/checkout/', orderData, {
+        headers: { 'Idempotency-Key': idempotencyKey.current }
+      });
 
       if (response.data.success) {
+        idempotencyKey.current = null;
         onOrderSuccess(response.data);
       } else {
         setError('Failed to place order. Please try again.');
@@ -1,8 +1,26 @@
 from django.contrib import admin
 from .models import (
     ServiceProvider, RouterProduct, DataPlan, Bundle, 
-    ElectronicsDevices, Order, OrderTracking
+    ElectronicsDevices, Order, OrderItem, OrderTracking, NotificationOutbox
 )
+from .notifications import notify_orders, requeue
+from .order_stats import update_order_status
+
+# What the notification templates read, plus the fields notify_orders saves
+NOTIFICATION_ORDER_FIELDS = [
+    'id', 'customer_name', 'customer_email', 'service_type', 'product_details', 'status', 'total_price',
+    'customer_notified', 'notification_sent_at', 'notification_method',
+]
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    fields = ['service_type', 'product_name', 'unit_price', 'quantity', 'line_total']
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 class OrderAdmin(admin.ModelAdmin):
     list_display = [
@@ -14,6 +32,7 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ['customer_name', 'customer_email', 'customer_phone', 'product_details']
     list_editable = ['status']
     readonly_fields = ['created_at', 'updated_at', 'completed_at']
+    inlines = [OrderItemInline]
     actions = [
         'mark_as_pending', 'mark_as_confirmed', 'mark_as_processing', 
         'mark_as_shipped', 'mark_as_delivered', 'mark_as_cancelled',
@@ -41,91 +60,54 @@ class OrderAdmin(admin.ModelAdmin):
     
     # Status actions
     def mark_as_pending(self, request, queryset):
-        updated = queryset.update(status='pending')
+        updated = update_order_status(queryset, 'pending')
         self.message_user(request, f"{updated} orders marked as pending")
     mark_as_pending.short_description = "Mark selected orders as pending"
     
     def mark_as_confirmed(self, request, queryset):
-        updated = queryset.update(status='confirmed')
+        updated = update_order_status(queryset, 'confirmed')
         self.message_user(request, f"{updated} orders marked as confirmed")
     mark_as_confirmed.short_description = "Mark selected orders as confirmed"
     
     def mark_as_processing(self, request, queryset):
-        updated = queryset.update(status='processing')
+        updated = update_order_status(queryset, 'processing')
         self.message_user(request, f"{updated} orders marked as processing")
     mark_as_processing.short_description = "Mark selected orders as processing"
     
     def mark_as_shipped(self, request, queryset):
-        updated = queryset.update(status='shipped')
+        updated = update_order_status(queryset, 'shipped')
         self.message_user(request, f"{updated} orders marked as shipped")
     mark_as_shipped.short_description = "Mark selected orders as shipped"
     
     def mark_as_delivered(self, request, queryset):
         from django.utils import timezone
-        updated = queryset.update(status='delivered', completed_at=timezone.now())
+        updated = update_order_status(queryset, 'delivered', completed_at=timezone.now())
         self.message_user(request, f"{updated} orders marked as delivered")
     mark_as_delivered.short_description = "Mark selected orders as delivered"
     
     def mark_as_cancelled(self, request, queryset):
-        updated = queryset.update(status='cancelled')
+        updated = update_order_status(queryset, 'cancelled')
         self.message_user(request, f"{updated} orders marked as cancelled")
     mark_as_cancelled.short_description = "Mark selected orders as cancelled"
     
     # Notification actions
+    def send_bulk_notification(self, request, queryset, message):
+        sent, failures = notify_orders(queryset.only(*NOTIFICATION_ORDER_FIELDS), message)
+        for order, error in failures:
+            self.message_user(request, f"Failed to send notification for order #{order.id}: {error}", level='ERROR')
+        self.message_user(request, f"Email notifications sent for {len(sent)} orders")
+    
     def send_notification_email(self, request, queryset):
-        success_count = 0
-        for order in queryset:
-            try:
-                # Send email notification
-                send_mail(
-                    f'Order #{order.id} Update - Frecha Iotech',
-                    f"""
-                    Dear {order.customer_name},
-                    
-                    Your order #{order.id} is currently being processed.
-                    
-                    Order Details:
-                    - Order ID: #{order.id}
-                    - Service: {order.get_service_type_display()}
-                    - Product: {order.product_details}
-                    - Status: {order.get_status_display()}
-                    - Total: TZS {order.total_price}
-                    
-                    We will notify you once your order is completed.
-                    
-                    Thank you for choosing Frecha Iotech!
-                    
-                    Best regards,
-                    Frecha Iotech Team
-                    """,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [order.customer_email],
-                    fail_silently=False,
-                )
-                # Update notification status
-                order.customer_notified = True
-                order.notification_method = 'email'
-                order.save()
-                success_count += 1
-            except Exception as e:
-                self.message_user(request, f"Failed to send notification for order #{order.id}: {str(e)}", level='ERROR')
-        
-        self.message_user(request, f"Email notifications sent for {success_count} orders")
+        self.send_bulk_notification(
+            request, queryset,
+            "Your order is currently being processed. We will notify you once your order is completed."
+        )
     send_notification_email.short_description = "Send email notification for selected orders"
     
     def send_custom_notification(self, request, queryset):
         # This would typically open a custom admin page for message input
         # For now, we'll use a simple message
-        for order in queryset:
-            try:
-                order.send_notification(
-                    method='email', 
-                    message="We're processing your order. You'll receive updates soon!"
-                )
-            except Exception as e:
-                self.message_user(request, f"Failed to send notification for order #{order.id}: {str(e)}", level='ERROR')
-        
-        self.message_user(request, f"Custom notifications sent for {queryset.count()} orders")
+        self.send_bulk_notification(request, queryset, "We're processing your order. You'll receive updates soon!")
     send_custom_notification.short_description = "Send custom notification to selected orders"
 
 @admin.register(ServiceProvider)
@@ -190,6 +172,20 @@ class ElectronicsDevicesAdmin(admin.ModelAdmin):
     list_editable = ['price', 'stock_quantity', 'is_available']
     readonly_fields = ['created_at', 'updated_at']
 
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['id', 'order', 'method', 'recipient_email', 'status', 'attempts', 'available_at', 'sent_at']
+    list_filter = ['status', 'method']
+    search_fields = ['recipient_email', 'recipient_phone', 'order__id']
+    readonly_fields = ['attempts', 'lease_token', 'last_error', 'created_at', 'sent_at']
+    raw_id_fields = ['order']
+    actions = ['requeue_notifications']
+    
+    def requeue_notifications(self, request, queryset):
+        requeued = requeue(queryset)
+        self.message_user(request, f"{requeued} notifications requeued")
+    requeue_notifications.short_description = "Requeue selected notifications"
+
 
 # Register the admin classes
 admin.site.register(Order, OrderAdmin)
@@ -197,4 +193,4 @@ admin.site.register(Order, OrderAdmin)
 # Optional: Customize admin site header and title
 admin.site.site_header = "Frecha Iotech Administration"
 admin.site.site_title = "Frecha Iotech Admin"
-admin.site.index_title = "Welcome to Frecha Iotech Admin Portal"
\ No newline at end of file
+admin.site.index_title = "Welcome to Frecha Iotech Admin Portal"
@@ -0,0 +1,309 @@
+# store/catalog_cache.py
+"""
+Shared, versioned snapshot of the public catalog.
+
+The active catalog is rendered once into a single file that every worker
+maps into memory. The file body is the `all_services` JSON document and the
+header records where each section's list starts and ends inside it, so the
+`public_*` endpoints are served as slices of the same mapping.
+
+When a catalog model changes, the signal handlers in store/signals.py only
+leave a marker file next to the snapshot once the transaction commits. The
+next catalog read on the host removes the marker and rebuilds the file, so
+a burst of admin edits costs one rebuild, paid by a reader rather than by
+each save. Workers notice the new file by its inode and remap it on their
+next request, which keeps one copy of the catalog per host instead of one
+per worker and one rebuild per change instead of one per worker.
+
+The snapshot and its marker live on the local filesystem, so a change only
+reaches the host it was made on (see CATALOG_SNAPSHOT_PATH in settings).
+
+Each section (and the whole document) is also stored pre-compressed after
+the raw body, so compressed responses are slices of the mapping too.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+from .compression import available_encodings, choose_encoding, compress
+
+SNAPSHOT_MAGIC = b'FRCAT2\n'
+HEADER_LENGTH = struct.Struct('>I')
+
+CATALOG_SECTIONS = ('providers', 'data_plans', 'bundles', 'routers', 'electronics')
+WHOLE_DOCUMENT = '*'
+
+_current = None
+_map_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+class CatalogSnapshot:
+    """A memory-mapped catalog snapshot file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.key = (stat.st_ino, stat.st_mtime_ns)
+
+        if self.mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f'{path} is not a catalog snapshot')
+        offset = len(SNAPSHOT_MAGIC)
+        (header_length,) = HEADER_LENGTH.unpack_from(self.mm, offset)
+        offset += HEADER_LENGTH.size
+        header = json.loads(self.mm[offset:offset + header_length])
+
+        self.version = header['version']
+        self.body_offset = offset + header_length
+        self.sections = header['sections']
+        self.variants = header['variants']
+        self.view = memoryview(self.mm)
+
+    def encodings(self, section=None):
+        """Encodings stored for one section, in order of preference"""
+        key = WHOLE_DOCUMENT if section is None else section
+        return [encoding for encoding, spans in self.variants.items() if key in spans]
+
+    def content(self, section=None, encoding=None):
+        """Return the bytes for one section, or the whole catalog document"""
+        key = WHOLE_DOCUMENT if section is None else section
+        if encoding is not None:
+            start, end = self.variants[encoding][key]
+        else:
+            start, end = self.sections[key]
+        return self.view[self.body_offset + start:self.body_offset + end]
+
+
+def get_snapshot_path():
+    return str(settings.CATALOG_SNAPSHOT_PATH)
+
+
+def get_stale_marker_path():
+    return get_snapshot_path() + '.stale'
+
+
+def build_catalog_payload():
+    """Serialize the active catalog exactly as `all_services` returns it"""
+    from .models import ServiceProvider, DataPlan, Bundle, RouterProduct, ElectronicsDevices
+    from .serializers import (
+        ServiceProviderSerializer, DataPlanSerializer, BundleSerializer,
+        RouterProductSerializer, ElectronicsDevicesSerializer
+    )
+    from .fast_serializers import fast_serialize
+
+    providers = ServiceProvider.objects.filter(is_active=True)
+    data_plans = DataPlan.objects.filter(is_active=True)
+    bundles = Bundle.objects.filter(is_active=True)
+    routers = RouterProduct.objects.filter(is_available=True)
+    electronics = ElectronicsDevices.objects.filter(is_available=True)
+
+    return {
+        'providers': fast_serialize(ServiceProviderSerializer, providers),
+        'data_plans': fast_serialize(DataPlanSerializer, data_plans),
+        'bundles': fast_serialize(BundleSerializer, bundles),
+        'routers': fast_serialize(RouterProductSerializer, routers),
+        'electronics': fast_serialize(ElectronicsDevicesSerializer, electronics)
+    }
+
+
+def write_catalog_snapshot():
+    """Render the active catalog into a new snapshot file and swap it in"""
+    payload = build_catalog_payload()
+    renderer = JSONRenderer()
+
+    # Assemble the document by hand so each section's offsets are known;
+    # the result is byte-identical to rendering the whole dict at once.
+    body = bytearray(b'{')
+    sections = {}
+    for index, name in enumerate(CATALOG_SECTIONS):
+        if index:
+            body += b','
+        body += renderer.render(name) + b':'
+        start = len(body)
+        body += renderer.render(payload[name])
+        sections[name] = [start, len(body)]
+    body += b'}'
+    sections[WHOLE_DOCUMENT] = [0, len(body)]
+
+    # Compressed variants go after the raw document; a variant that would
+    # not be smaller than the raw bytes is left out.
+    variants = {}
+    raw = bytes(body)
+    for encoding in available_encodings():
+        spans = variants[encoding] = {}
+        for key, (start, end) in sections.items():
+            data = compress(raw[start:end], encoding)
+            if len(data) < end - start:
+                spans[key] = [len(body), len(body) + len(data)]
+                body += data
+
+    version = time.time_ns() // 1000
+    header = json.dumps({'version': version, 'sections': sections, 'variants': variants}).encode()
+
+    path = get_snapshot_path()
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.catalog-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(HEADER_LENGTH.pack(len(header)))
+            f.write(header)
+            f.write(body)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return version
+
+
+def invalidate_catalog_snapshot():
+    """Mark the shared snapshot stale after a catalog change; the next read rebuilds it"""
+    marker = get_stale_marker_path()
+    os.makedirs(os.path.dirname(marker), exist_ok=True)
+    with open(marker, 'a'):
+        pass
+    # Every change moves the marker's mtime, which get_catalog_version reports.
+    os.utime(marker)
+
+
+def rebuild_catalog_snapshot():
+    """Rebuild the shared snapshot now"""
+    with _build_lock:
+        try:
+            os.unlink(get_stale_marker_path())
+        except FileNotFoundError:
+            pass
+        return write_catalog_snapshot()
+
+
+def refresh_stale_snapshot():
+    """
+    Rebuild the snapshot if a change marked it stale.
+
+    Removing the marker is the claim: one worker rebuilds while the others
+    keep serving the previous file. A change committed during the rebuild
+    leaves a new marker, so it is picked up by the read after.
+    """
+    marker = get_stale_marker_path()
+    try:
+        os.unlink(marker)
+    except FileNotFoundError:
+        return
+    try:
+        with _build_lock:
+            write_catalog_snapshot()
+    except BaseException:
+        with open(marker, 'a'):
+            pass
+        raise
+
+
+def read_snapshot_version(path):
+    """The version in a snapshot file's header, read without mapping the body"""
+    with open(path, 'rb') as f:
+        prefix = f.read(len(SNAPSHOT_MAGIC) + HEADER_LENGTH.size)
+        if prefix[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            return None
+        (header_length,) = HEADER_LENGTH.unpack_from(prefix, len(SNAPSHOT_MAGIC))
+        return json.loads(f.read(header_length))['version']
+
+
+def get_catalog_version():
+    """
+    A key that changes with the catalog, for caches derived from it.
+
+    It pairs the version of the snapshot file as it stands with the time of
+    the last change that marked it stale, so it moves on every catalog
+    write without rebuilding the snapshot (that waits for a catalog read).
+    """
+    path = get_snapshot_path()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        version = None
+    else:
+        snapshot = _current
+        if snapshot is not None and snapshot.key == (stat.st_ino, stat.st_mtime_ns):
+            version = snapshot.version
+        else:
+            try:
+                version = read_snapshot_version(path)
+            except FileNotFoundError:
+                version = None
+    try:
+        changed = os.stat(get_stale_marker_path()).st_mtime_ns
+    except FileNotFoundError:
+        changed = None
+    return version, changed
+
+
+def get_catalog_snapshot():
+    """Return the mapped snapshot, remapping when the file has been replaced"""
+    global _current
+
+    path = get_snapshot_path()
+    refresh_stale_snapshot()
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        with _build_lock:
+            if not os.path.exists(path):
+                write_catalog_snapshot()
+        stat = os.stat(path)
+
+    snapshot = _current
+    if snapshot is not None and snapshot.key == (stat.st_ino, stat.st_mtime_ns):
+        return snapshot
+
+    with _map_lock:
+        if _current is None or _current.key != (stat.st_ino, stat.st_mtime_ns):
+            # Requests still holding slices of the old mapping keep it alive
+            # until they finish; it is unmapped once the last view is gone.
+            try:
+                _current = CatalogSnapshot(path)
+            except ValueError:
+                # A file left behind by an older snapshot format.
+                with _build_lock:
+                    write_catalog_snapshot()
+                _current = CatalogSnapshot(path)
+        return _current
+
+
+def catalog_etag(version, section=None, encoding=None):
+    tag = f'catalog-{version}'
+    if section is not None:
+        tag += f'-{section}'
+    if encoding is not None:
+        tag += f'-{encoding}'
+    return f'"{tag}"'
+
+
+def catalog_response(request, section=None):
+    """Serve the catalog (or one section of it), answering conditional requests with 304"""
+    snapshot = get_catalog_snapshot()
+    encoding = choose_encoding(request, snapshot.encodings(section))
+    etag = catalog_etag(snapshot.version, section, encoding)
+    # The version is the build time in microseconds, which doubles as Last-Modified.
+    last_modified = snapshot.version // 1_000_000
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(snapshot.content(section, encoding), content_type='application/json')
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,71 @@
+# store/compression.py
+"""
+Content-encoding helpers for cached API payloads.
+
+Cached payloads are compressed once when the cache is built and the stored
+variant is picked per request from `Accept-Encoding`, so a hit never
+recompresses. Brotli is used when the `brotli` package is installed and
+gzip is always available.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 9
+# Quality 11 is noticeably slower to build for a small gain on JSON; the
+# snapshot is rebuilt inside the first catalog read after a change.
+BROTLI_QUALITY = 9
+
+
+def available_encodings():
+    """Encodings we can produce, most preferred first"""
+    if brotli is not None:
+        return ('br', 'gzip')
+    return ('gzip',)
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(bytes(data), quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        # A fixed mtime keeps the output (and so the file) deterministic.
+        return gzip.compress(bytes(data), compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f'Unsupported encoding: {encoding}')
+
+
+def parse_accept_encoding(header):
+    """Return `{coding: q}` for an Accept-Encoding header"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(request, encodings):
+    """
+    Pick the best of `encodings` the client accepts, or None for identity.
+
+    Higher q-values win; on a tie the order of `encodings` decides.
+    """
+    accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
@@ -0,0 +1,72 @@
+# store/conditional.py
+"""
+Cheap HTTP validators for catalog reads.
+
+A list's validator is `MAX(updated_at)` and `COUNT(*)` over the filtered
+queryset, taken in a single aggregate query; a detail route runs the same
+aggregate over the one-row queryset. The `updated_at` of every relation the
+serializer renders (e.g. `provider.name`, nested `data_plans`) is folded
+into the maximum, so editing a provider also changes the validators of the
+plans and bundles that show its name.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .eager_loading import get_eager_loading
+
+
+def get_validator_lookups(serializer_class, fields=None):
+    """Return the `updated_at` lookups that cover what the serializer renders"""
+    model = serializer_class.Meta.model
+    select_related, prefetch_related = get_eager_loading(serializer_class, fields)
+    paths = list(select_related) + [getattr(lookup, 'prefetch_to', lookup) for lookup in prefetch_related]
+
+    lookups = ['updated_at']
+    for path in paths:
+        related = model
+        for attr in path.split('__'):
+            related = related._meta.get_field(attr).related_model
+        if any(field.name == 'updated_at' for field in related._meta.get_fields()):
+            lookups.append(f'{path}__updated_at')
+    return lookups
+
+
+def compute_validators(request, queryset, serializer_class, fields=None):
+    """Return `(etag, last_modified)` for a queryset as rendered by `serializer_class`"""
+    lookups = get_validator_lookups(serializer_class, fields)
+    aggregates = {f'updated_{index}': Max(lookup) for index, lookup in enumerate(lookups)}
+    aggregates['count'] = Count('pk', distinct=True)
+    result = queryset.order_by().aggregate(**aggregates)
+
+    timestamps = [result[key] for key in aggregates if key != 'count' and result[key] is not None]
+    last_modified = max(timestamps) if timestamps else None
+
+    key = '|'.join([
+        queryset.model._meta.label,
+        *(timestamp.isoformat() for timestamp in timestamps),
+        str(result['count']),
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+    ])
+    etag = '"%s"' % hashlib.md5(key.encode()).hexdigest()
+    return etag, last_modified
+
+
+def not_modified_response(request, etag, last_modified):
+    """Return a 304 response if the request's validators still match, else None"""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        return set_validators(response, etag, last_modified)
+    return None
+
+
+def set_validators(response, etag, last_modified):
+    if 200 <= response.status_code < 300 or response.status_code == 304:
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
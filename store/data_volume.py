@@ -0,0 +1,111 @@
+# store/data_volume.py
+"""
+Numeric data volumes for plans and bundles.
+
+`DataPlan.data_volume` and `Bundle.total_data_volume` are free text ("1GB",
+"500MB", "1.5 GB", "10GB + 5GB Night", "Unlimited"). `parse_data_volume`
+turns them into megabytes so the models can store an indexed
+`data_volume_mb` and `price_per_gb`, and the list endpoints can filter and
+sort by them in SQL.
+"""
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.db.models import F
+
+# Telcos in Tanzania sell 1GB as 1024MB.
+UNIT_MB = {
+    'KB': Decimal(1) / 1024,
+    'MB': Decimal(1),
+    'GB': Decimal(1024),
+    'TB': Decimal(1024 * 1024),
+}
+# Unlimited volumes sort above every real one and have no price per GB.
+UNLIMITED_MB = 2147483647
+
+# A comma followed by groups of exactly three digits is a thousands separator
+# ("1,000MB", "1,500 MB"); any other comma is a decimal comma ("1,5GB").
+VOLUME_PATTERN = re.compile(r'(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:[.,]\d+)?)\s*([KMGT]B)\b', re.IGNORECASE)
+THOUSANDS_PATTERN = re.compile(r'\d{1,3}(?:,\d{3})+(?:\.\d+)?$')
+UNLIMITED_PATTERN = re.compile(r'unlimited|bila\s+kikomo', re.IGNORECASE)
+
+VOLUME_ORDERINGS = {
+    'price_per_gb': (F('price_per_gb').asc(nulls_last=True), 'id'),
+    '-price_per_gb': (F('price_per_gb').desc(nulls_last=True), 'id'),
+    'data_volume': (F('data_volume_mb').asc(nulls_last=True), 'id'),
+    '-data_volume': (F('data_volume_mb').desc(nulls_last=True), 'id'),
+}
+
+
+def parse_amount(amount):
+    """A number as matched by VOLUME_PATTERN, with its comma read as VOLUME_PATTERN describes"""
+    if THOUSANDS_PATTERN.match(amount):
+        return Decimal(amount.replace(',', ''))
+    return Decimal(amount.replace(',', '.'))
+
+
+def parse_data_volume(text):
+    """
+    Return the volume described by `text` in whole megabytes.
+
+    Several amounts ("10GB + 5GB Night") are added up. Returns
+    `UNLIMITED_MB` for unlimited volumes and None when nothing parses.
+    """
+    if not text:
+        return None
+    if UNLIMITED_PATTERN.search(text):
+        return UNLIMITED_MB
+    total = Decimal(0)
+    found = False
+    for amount, unit in VOLUME_PATTERN.findall(text):
+        try:
+            total += parse_amount(amount) * UNIT_MB[unit.upper()]
+        except InvalidOperation:
+            continue
+        found = True
+    if not found:
+        return None
+    return min(int(total.to_integral_value(ROUND_HALF_UP)), UNLIMITED_MB - 1)
+
+
+def compute_price_per_gb(price, volume_mb):
+    """Price of one GB at `price` for `volume_mb`, or None when it has no meaning"""
+    if price is None or not volume_mb or volume_mb == UNLIMITED_MB:
+        return None
+    value = Decimal(price) * 1024 / volume_mb
+    return min(value, Decimal('9999999999.99')).quantize(Decimal('0.01'), ROUND_HALF_UP)
+
+
+def parse_volume_param(value):
+    """
+    Read a `min_volume`/`max_volume` parameter in megabytes; a bare number is megabytes.
+
+    Returns None when the value doesn't parse or isn't finite, so the filter
+    is ignored like other bad parameters. Numbers are clamped to the range
+    of `data_volume_mb`.
+    """
+    if value in (None, ''):
+        return None
+    try:
+        number = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        return parse_data_volume(value)
+    if not number.is_finite():
+        return None
+    number = min(max(number, Decimal(0)), Decimal(UNLIMITED_MB))
+    return int(number.to_integral_value(ROUND_HALF_UP))
+
+
+def apply_volume_filters(queryset, params):
+    """Apply `min_volume`, `max_volume` and the volume orderings from the query string"""
+    min_volume = parse_volume_param(params.get('min_volume'))
+    max_volume = parse_volume_param(params.get('max_volume'))
+    if min_volume is not None:
+        queryset = queryset.filter(data_volume_mb__gte=min_volume)
+    if max_volume is not None:
+        queryset = queryset.filter(data_volume_mb__lte=max_volume)
+
+    ordering = params.get('ordering')
+    if ordering in VOLUME_ORDERINGS:
+        queryset = queryset.order_by(*VOLUME_ORDERINGS[ordering])
+    return queryset
@@ -0,0 +1,77 @@
+# store/eager_loading.py
+from functools import lru_cache
+
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+from .fast_serializers import PLAN_CACHE_SIZE, known_fields
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _eager_loading(serializer_class, fields):
+    """Return `(select_related, prefetch_related)` lookups for a serializer's sources"""
+    serializer = serializer_class(fields=set(fields)) if fields is not None else serializer_class()
+    model = serializer.Meta.model
+    select_related = set()
+    prefetch_related = {}
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+
+        if isinstance(field, (ManyRelatedField, serializers.ListSerializer)):
+            relation = model._meta.get_field(field.source)
+            queryset = prefetch_related.get(field.source)
+            if isinstance(field, serializers.ListSerializer):
+                child_select, child_prefetch = get_eager_loading(type(field.child))
+                queryset = relation.related_model._default_manager.all()
+                if child_select:
+                    queryset = queryset.select_related(*child_select)
+                if child_prefetch:
+                    queryset = queryset.prefetch_related(*child_prefetch)
+            prefetch_related[field.source] = queryset
+            continue
+
+        # Walk dotted sources (`provider.name`) along forward relations;
+        # a foreign key rendered as its pk needs no join.
+        path = []
+        current = model
+        attrs = field.source_attrs[:-1] if isinstance(field, RelatedField) else field.source_attrs
+        for attr in attrs:
+            try:
+                relation = current._meta.get_field(attr)
+            except Exception:
+                break
+            if not (relation.many_to_one or relation.one_to_one):
+                break
+            path.append(attr)
+            current = relation.related_model
+        if path:
+            select_related.add('__'.join(path))
+
+    prefetches = tuple(
+        Prefetch(source, queryset=queryset) if queryset is not None else source
+        for source, queryset in prefetch_related.items()
+    )
+    return tuple(sorted(select_related)), prefetches
+
+
+def get_eager_loading(serializer_class, fields=None):
+    return _eager_loading(serializer_class, known_fields(serializer_class, fields))
+
+
+def optimize_queryset(queryset, serializer_class, fields=None):
+    """Apply the joins and prefetches `serializer_class` needs to render `queryset`"""
+    select_related, prefetch_related = get_eager_loading(serializer_class, fields)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+
+    existing = {getattr(lookup, 'prefetch_to', lookup) for lookup in queryset._prefetch_related_lookups}
+    missing = [
+        lookup for lookup in prefetch_related
+        if getattr(lookup, 'prefetch_to', lookup) not in existing
+    ]
+    if missing:
+        queryset = queryset.prefetch_related(*missing)
+    return queryset
@@ -0,0 +1,188 @@
+# store/facets.py
+"""
+Facet counts and price histograms for the public catalog filters.
+
+Each catalog model is read with a single GROUP BY over all of its facet
+fields plus a price bucket, and the per-facet counts are rolled up from
+those groups in Python. Because every group carries all of its facet
+values, the counts can follow the current filter selection without more
+queries: a facet's counts apply every selected filter except its own, so
+the client can still see how many results each alternative value would
+give. Price filters (`min_price`/`max_price`) are applied in SQL and
+narrow every facet.
+
+Results are cached against the catalog snapshot version, which changes on
+every catalog write.
+"""
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Max, Min, Value, When
+from rest_framework import serializers
+
+from .models import DataPlan, Bundle, RouterProduct, ElectronicsDevices
+from .catalog_cache import get_catalog_snapshot
+
+FACET_CACHE_TIMEOUT = 60 * 60
+
+# Rendered like the catalog serializers' price fields.
+price_representation = serializers.DecimalField(max_digits=10, decimal_places=2).to_representation
+
+PLAN_PRICE_EDGES = (1000, 2500, 5000, 10000, 25000, 50000)
+PRODUCT_PRICE_EDGES = (50000, 100000, 250000, 500000, 1000000, 2500000)
+
+# section -> (model, visibility filter, price field, price bucket edges, facets)
+# Each facet is (name, query parameter, grouped field, label field or None).
+FACET_SOURCES = {
+    'data_plans': (
+        DataPlan, {'is_active': True}, 'price', PLAN_PRICE_EDGES, (
+            ('provider', 'provider', 'provider_id', 'provider__name'),
+            ('data_type', 'data_type', 'data_type', None),
+            ('network_type', 'network_type', 'network_type', None),
+        )
+    ),
+    'bundles': (
+        Bundle, {'is_active': True}, 'total_price', PLAN_PRICE_EDGES, (
+            ('provider', 'provider', 'provider_id', 'provider__name'),
+            ('bundle_type', 'bundle_type', 'bundle_type', None),
+        )
+    ),
+    'routers': (
+        RouterProduct, {'is_available': True}, 'price', PRODUCT_PRICE_EDGES, ()
+    ),
+    'electronics': (
+        ElectronicsDevices, {'is_available': True}, 'price', PRODUCT_PRICE_EDGES, (
+            ('category', 'category', 'category', None),
+        )
+    ),
+}
+FACET_SECTIONS = tuple(FACET_SOURCES)
+FACET_PARAMS = ('min_price', 'max_price') + tuple(sorted({
+    param for source in FACET_SOURCES.values() for _, param, _, _ in source[4]
+}))
+
+
+def parse_price(value, name='price'):
+    """A `min_price`/`max_price` value as a Decimal, None when absent; ValueError unless a finite number"""
+    if value in (None, ''):
+        return None
+    try:
+        price = Decimal(value)
+    except (InvalidOperation, TypeError, ValueError):
+        price = None
+    if price is None or not price.is_finite():
+        raise ValueError(f'{name} must be a number')
+    return price
+
+
+def price_bucket(price_field, edges):
+    """SQL expression giving the index of the histogram bucket a price falls in"""
+    return Case(
+        *[When(**{f'{price_field}__lt': edge}, then=Value(index)) for index, edge in enumerate(edges)],
+        default=Value(len(edges)),
+        output_field=IntegerField()
+    )
+
+
+def choice_labels(model, field_name):
+    field = model._meta.get_field(field_name)
+    return {value: str(label) for value, label in field.flatchoices}
+
+
+def compute_section_facets(section, params):
+    """Facet counts and price histogram for one catalog section"""
+    model, visible, price_field, edges, facets = FACET_SOURCES[section]
+
+    queryset = model.objects.filter(**visible)
+    min_price = parse_price(params.get('min_price'), 'min_price')
+    max_price = parse_price(params.get('max_price'), 'max_price')
+    if min_price is not None:
+        queryset = queryset.filter(**{f'{price_field}__gte': min_price})
+    if max_price is not None:
+        queryset = queryset.filter(**{f'{price_field}__lte': max_price})
+
+    group_fields = []
+    for _, _, field, label in facets:
+        group_fields.append(field)
+        if label:
+            group_fields.append(label)
+    groups = list(
+        queryset.order_by()
+        .values(*group_fields, bucket=price_bucket(price_field, edges))
+        .annotate(count=Count('pk'), low=Min(price_field), high=Max(price_field))
+    )
+
+    # Selected values per facet, compared as strings as they arrive in the query string.
+    selected = {
+        name: params.get(param) for name, param, _, _ in facets if params.get(param) not in (None, '')
+    }
+
+    def matches(group, skip=None):
+        return all(
+            str(group[field]) == selected[name]
+            for name, _, field, _ in facets
+            if name in selected and name != skip
+        )
+
+    facet_counts = {}
+    for name, _, field, label in facets:
+        labels = choice_labels(model, field) if label is None else {}
+        counts = {}
+        for group in groups:
+            value = group[field]
+            entry = counts.setdefault(value, {
+                'value': value,
+                'label': group[label] if label else labels.get(value, value),
+                'count': 0,
+            })
+            if matches(group, skip=name):
+                entry['count'] += group['count']
+        facet_counts[name] = sorted(counts.values(), key=lambda entry: (-entry['count'], str(entry['label'])))
+
+    selected_groups = [group for group in groups if matches(group)]
+    bounds = (0,) + edges + (None,)
+    buckets = [
+        {'min': bounds[index], 'max': bounds[index + 1], 'count': 0}
+        for index in range(len(edges) + 1)
+    ]
+    for group in selected_groups:
+        buckets[group['bucket']]['count'] += group['count']
+
+    lows = [group['low'] for group in selected_groups if group['low'] is not None]
+    highs = [group['high'] for group in selected_groups if group['high'] is not None]
+    return {
+        'total': sum(group['count'] for group in selected_groups),
+        'facets': facet_counts,
+        'price': {
+            'min': price_representation(min(lows)) if lows else None,
+            'max': price_representation(max(highs)) if highs else None,
+            'buckets': buckets,
+        },
+    }
+
+
+def facets_digest(sections, params):
+    relevant = [(key, params.get(key)) for key in FACET_PARAMS if params.get(key) not in (None, '')]
+    return hashlib.md5(repr((sections, relevant)).encode()).hexdigest()
+
+
+def get_catalog_facets(params, sections=None):
+    """
+    Return `(version, etag, facets)` for the requested sections.
+
+    `params` is a query dict; its filters are applied to every section that
+    has the matching facet. Raises ValueError for a price filter that is not
+    a finite number.
+    """
+    sections = tuple(section for section in (sections or FACET_SECTIONS) if section in FACET_SOURCES)
+    for name in ('min_price', 'max_price'):
+        parse_price(params.get(name), name)
+    version = get_catalog_snapshot().version
+    digest = facets_digest(sections, params)
+    key = f'catalog-facets:{version}:{digest}'
+    facets = cache.get(key)
+    if facets is None:
+        facets = {section: compute_section_facets(section, params) for section in sections}
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return version, f'"facets-{version}-{digest}"', facets
@@ -0,0 +1,237 @@
+# store/fast_serializers.py
+"""
+Read-only fast path for the catalog list serializers.
+
+`ModelSerializer(many=True)` builds a model instance per row and walks the
+field graph for every attribute. For read-only lists we instead compile the
+serializer once into a flat plan -- which columns to select with
+`values_list()` and which converter turns each column into its output
+value -- and then run that plan over plain tuples.
+
+The plan is derived from the serializer's own fields, and each converter
+is the field's `to_representation`, so the output matches the serializer
+field for field and in the same order. The parts that would normally touch
+the model per row are precomputed instead:
+
+- `get_<field>_display` sources resolve through a dict built from the choices
+- image URLs are joined onto the storage base URL once per plan
+- dotted sources such as `provider.name` become `provider__name` columns
+- many-to-many fields (and nested serializers over them) run one extra
+  query for the whole list rather than one per row
+
+Sources that call other model methods (e.g. `get_actual_price`) must list
+the columns they read in `Meta.method_sources`; the method then runs
+against a lightweight row object instead of a model instance.
+"""
+from functools import lru_cache
+from itertools import islice
+from types import SimpleNamespace
+from urllib.parse import urljoin
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+
+class CompiledListSerializer:
+    """A serializer class compiled into a `values_list()` plan"""
+    batch_size = 500
+
+    def __init__(self, serializer_class, fields=None):
+        self.serializer_class = serializer_class
+        serializer = serializer_class(fields=fields) if fields is not None else serializer_class()
+        self.model = serializer.Meta.model
+        self.method_sources = getattr(serializer.Meta, 'method_sources', {})
+
+        self.columns = []
+        self.plan = []
+        self.many_sources = {}
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, (ManyRelatedField, serializers.ListSerializer)):
+                self.add_many_field(name, field)
+            else:
+                self.add_field(name, field)
+
+        self.pk_index = self.column(self.model._meta.pk.attname) if self.many_sources else None
+
+    # ============ COMPILATION ============
+
+    def column(self, name):
+        """Return the position of a selected column, adding it if needed"""
+        if name not in self.columns:
+            self.columns.append(name)
+        return self.columns.index(name)
+
+    def add_field(self, name, field):
+        attrs = field.source_attrs
+        model_field = self.get_model_field(attrs[0])
+
+        if len(attrs) == 1 and model_field is None:
+            self.add_method_field(name, field, attrs[0])
+            return
+
+        if isinstance(field, RelatedField):
+            index = self.column(attrs[0])
+            self.plan.append((name, 'column', index, self.related_pk))
+            return
+
+        index = self.column('__'.join(attrs))
+        if isinstance(field, serializers.FileField):
+            self.plan.append((name, 'column', index, self.file_url_converter(model_field)))
+        else:
+            self.plan.append((name, 'column', index, field.to_representation))
+
+    def add_method_field(self, name, field, source):
+        display_prefix, display_suffix = 'get_', '_display'
+        if source.startswith(display_prefix) and source.endswith(display_suffix):
+            choice_field = self.model._meta.get_field(source[len(display_prefix):-len(display_suffix)])
+            index = self.column(choice_field.attname)
+            choices = {value: str(label) for value, label in choice_field.flatchoices}
+            convert = field.to_representation
+            self.plan.append((name, 'column', index, lambda value: convert(choices.get(value, value))))
+            return
+
+        if source not in self.method_sources:
+            raise ValueError(
+                f"{self.serializer_class.__name__}.{name} reads {source}(); "
+                f"list the columns it needs in Meta.method_sources"
+            )
+        arguments = tuple(self.method_sources[source])
+        indexes = tuple(self.column(argument) for argument in arguments)
+        method = getattr(self.model, source)
+        convert = field.to_representation
+
+        def call_method(row):
+            value = method(SimpleNamespace(**{arg: row[i] for arg, i in zip(arguments, indexes)}))
+            return None if value is None else convert(value)
+        self.plan.append((name, 'method', None, call_method))
+
+    def add_many_field(self, name, field):
+        source = field.source
+        if source not in self.many_sources:
+            relation = self.model._meta.get_field(source)
+            self.many_sources[source] = {
+                'related_model': relation.related_model,
+                'query_name': relation.related_query_name(),
+                'child': None,
+            }
+        if isinstance(field, serializers.ListSerializer):
+            self.many_sources[source]['child'] = compile_serializer(type(field.child))
+            self.plan.append((name, 'children', source, None))
+        else:
+            self.plan.append((name, 'pks', source, None))
+
+    def get_model_field(self, name):
+        try:
+            return self.model._meta.get_field(name)
+        except Exception:
+            return None
+
+    @staticmethod
+    def related_pk(value):
+        return value
+
+    @staticmethod
+    def file_url_converter(model_field):
+        storage = model_field.storage
+        if isinstance(storage, FileSystemStorage):
+            base_url = storage.base_url
+
+            def url(name):
+                return urljoin(base_url, filepath_to_uri(name).lstrip('/')) if name else None
+            return url
+        return lambda name: storage.url(name) if name else None
+
+    # ============ SERIALIZATION ============
+
+    def fetch_many(self, source, ids):
+        """Return `{parent_id: (pks, serialized_children)}` for one relation"""
+        spec = self.many_sources[source]
+        manager = spec['related_model']._default_manager
+        query_name = spec['query_name']
+        child = spec['child']
+        columns = child.columns if child is not None else []
+
+        grouped = {parent_id: ([], []) for parent_id in ids}
+        # Batch the IN list to stay under SQLite's bound-parameter limit.
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            rows = manager.filter(**{f'{query_name}__in': batch}).values_list(query_name, 'pk', *columns)
+            for parent_id, pk, *values in rows:
+                pks, children = grouped[parent_id]
+                pks.append(pk)
+                if child is not None:
+                    children.append(child.serialize_row(values))
+        return grouped
+
+    def serialize_row(self, row, many=None):
+        data = {}
+        for name, kind, index, convert in self.plan:
+            if kind == 'column':
+                value = row[index]
+                data[name] = None if value is None else convert(value)
+            elif kind == 'method':
+                data[name] = convert(row)
+            elif kind == 'pks':
+                data[name] = many[index][row[self.pk_index]][0]
+            else:
+                data[name] = many[index][row[self.pk_index]][1]
+        return data
+
+    def serialize_rows(self, rows):
+        many = {}
+        if self.many_sources:
+            ids = [row[self.pk_index] for row in rows]
+            for source in self.many_sources:
+                many[source] = self.fetch_many(source, ids)
+        return [self.serialize_row(row, many) for row in rows]
+
+    def serialize(self, queryset):
+        """Serialize a queryset of `self.model` into a list of dicts"""
+        return self.serialize_rows(list(queryset.values_list(*self.columns)))
+
+    def iter_serialize(self, queryset, chunk_size=500):
+        """Like `serialize`, but walks a server-side cursor and yields rows chunk by chunk"""
+        rows = queryset.values_list(*self.columns).iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield from self.serialize_rows(chunk)
+
+
+# Plans are keyed on the requested fieldset, which comes from the client,
+# so the cache is bounded and only ever sees names the serializer declares.
+PLAN_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=None)
+def declared_fields(serializer_class):
+    """The output field names `serializer_class` declares"""
+    return frozenset(serializer_class().fields)
+
+
+def known_fields(serializer_class, fields):
+    """`fields` narrowed to the names `serializer_class` declares, as a frozenset"""
+    if fields is None:
+        return None
+    return frozenset(fields) & declared_fields(serializer_class)
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _compile(serializer_class, fields):
+    return CompiledListSerializer(serializer_class, set(fields) if fields is not None else None)
+
+
+def compile_serializer(serializer_class, fields=None):
+    """Return the cached compiled plan for a serializer class and fieldset"""
+    return _compile(serializer_class, known_fields(serializer_class, fields))
+
+
+def fast_serialize(serializer_class, queryset, fields=None):
+    """Fast equivalent of `serializer_class(queryset, many=True).data`"""
+    return compile_serializer(serializer_class, fields).serialize(queryset)
@@ -0,0 +1,159 @@
+# store/idempotency.py
+"""
+`Idempotency-Key` support for order-creating endpoints.
+
+Checkout screens on flaky mobile networks retry POSTs, and every retry
+used to create another order. A client that sends an `Idempotency-Key`
+header now gets exactly one order per key: the first request claims the
+key by inserting an `IdempotencyKey` row, and its response is stored on
+that row. Repeats replay the stored response without touching the order
+tables.
+
+Concurrent duplicates are settled by the unique constraint on
+`(scope, key)`: whichever INSERT lands first owns the key, and the others
+get 409 while it is still in progress. A key reused with a different
+request body gets 422. Server errors release the key so the client can
+retry. Keys expire after `IDEMPOTENCY_KEY_TTL` and are deleted in bulk by
+`purge_idempotency_keys`.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# A claim older than this whose request never finished (a crashed worker)
+# may be taken over by a retry.
+IN_PROGRESS_TIMEOUT = timedelta(minutes=1)
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    """Hash of what the request asks for, to catch a key reused for a different request"""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def key_scope(scope, request):
+    """Keys are only unique per endpoint and per client, so one client can't replay another's response"""
+    owner = f'user:{request.user.pk}' if request.user.is_authenticated else 'anonymous'
+    return f'{scope}:{owner}'
+
+
+def claim_key(scope, key, fingerprint, retry=True):
+    """
+    Insert the key row; returns `(row, claimed)`.
+
+    `claimed` is False when another request already holds the key, in which
+    case `row` is that request's row (None if it vanished twice in a row).
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            row = IdempotencyKey.objects.create(
+                scope=scope, key=key, fingerprint=fingerprint, expires_at=now + IDEMPOTENCY_KEY_TTL
+            )
+        return row, True
+    except IntegrityError:
+        pass
+
+    row = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+    if row is None:
+        # Purged between our INSERT and SELECT; try once more.
+        return claim_key(scope, key, fingerprint, retry=False) if retry else (None, False)
+
+    stale = row.expires_at <= now or (
+        row.status_code is None and row.created_at <= now - IN_PROGRESS_TIMEOUT
+    )
+    if stale:
+        # Take the row over with a conditional UPDATE; if another retry got
+        # there first, the filter no longer matches and we treat it as taken.
+        fresh = {
+            'fingerprint': fingerprint, 'status_code': None, 'response_body': '',
+            'created_at': now, 'expires_at': now + IDEMPOTENCY_KEY_TTL,
+        }
+        taken = IdempotencyKey.objects.filter(
+            pk=row.pk, created_at=row.created_at, expires_at=row.expires_at
+        ).update(**fresh)
+        if taken:
+            for name, value in fresh.items():
+                setattr(row, name, value)
+            return row, True
+        row = IdempotencyKey.objects.filter(pk=row.pk).first()
+    return row, False
+
+
+def replay(row):
+    response = HttpResponse(row.response_body, status=row.status_code, content_type='application/json')
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(scope):
+    """
+    Make a DRF view (function or viewset method) honour `Idempotency-Key`.
+
+    Requests without the header are handled as before.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'}, status=400
+                )
+
+            fingerprint = request_fingerprint(request)
+            row, claimed = claim_key(key_scope(scope, request), key, fingerprint)
+            if not claimed:
+                if row is not None and row.fingerprint != fingerprint:
+                    return Response(
+                        {'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'}, status=422
+                    )
+                if row is None or row.status_code is None:
+                    response = Response({'error': 'A request with this Idempotency-Key is in progress'}, status=409)
+                    response['Retry-After'] = '1'
+                    return response
+                return replay(row)
+
+            try:
+                response = view(*args, **kwargs)
+            except Exception:
+                row.delete()
+                raise
+            if response.status_code >= 500 or not isinstance(response, Response):
+                row.delete()
+            else:
+                IdempotencyKey.objects.filter(pk=row.pk).update(
+                    status_code=response.status_code,
+                    response_body=JSONRenderer().render(response.data).decode()
+                )
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired_keys(batch_size=5000):
+    """Delete expired keys in batches; returns how many were deleted"""
+    now = timezone.now()
+    deleted = 0
+    while True:
+        batch = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        # Nothing hangs off these rows, so this is a single DELETE per batch.
+        deleted += IdempotencyKey.objects.filter(pk__in=batch).delete()[0]
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from store.models import DataPlan, Bundle
+from store.data_volume import parse_data_volume, compute_price_per_gb
+
+
+class Command(BaseCommand):
+    help = "Fill data_volume_mb and price_per_gb on data plans and bundles from their volume text"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        cases = [
+            ('data plans', DataPlan.objects.only('data_volume', 'price', 'data_volume_mb', 'price_per_gb'),
+             lambda plan: plan.data_volume, lambda plan: plan.price),
+            ('bundles', Bundle.objects.only(
+                'total_data_volume', 'total_price', 'discount_percentage', 'data_volume_mb', 'price_per_gb'
+            ), lambda bundle: bundle.total_data_volume, lambda bundle: bundle.get_actual_price()),
+        ]
+        for label, queryset, volume_of, price_of in cases:
+            changed, unparsed = [], 0
+            for instance in queryset.order_by('pk').iterator(chunk_size=batch_size):
+                volume_mb = parse_data_volume(volume_of(instance))
+                per_gb = compute_price_per_gb(price_of(instance), volume_mb)
+                unparsed += volume_mb is None
+                if (instance.data_volume_mb, instance.price_per_gb) != (volume_mb, per_gb):
+                    instance.data_volume_mb, instance.price_per_gb = volume_mb, per_gb
+                    changed.append(instance)
+            with transaction.atomic():
+                queryset.model.objects.bulk_update(changed, ['data_volume_mb', 'price_per_gb'], batch_size=batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f"Updated {len(changed)} {label} ({unparsed} with no recognisable volume)"
+            ))
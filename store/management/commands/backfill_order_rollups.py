@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.order_stats import parse_moment, reconcile_order_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute hourly and daily order rollups from the orders table and repair any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Only buckets from this date or datetime on (default: all time)")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_moment(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid --since value: {options['since']}")
+
+        drift = reconcile_order_rollups(since=since, dry_run=options['dry_run'])
+        for (granularity, start, service_type, status), (stored, expected) in sorted(drift.items()):
+            self.stdout.write(
+                f"{granularity:<4} {start:%Y-%m-%d %H:%M} {service_type:<12} {status:<10} "
+                f"stored {stored[0]:>6} / {stored[1]:>12}  expected {expected[0]:>6} / {expected[1]:>12}"
+            )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Order rollups are in step"))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} rollup rows drifted (not fixed: --dry-run)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(drift)} rollup rows"))
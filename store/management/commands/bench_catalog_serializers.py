@@ -0,0 +1,88 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from store.models import ServiceProvider, DataPlan, Bundle, RouterProduct, ElectronicsDevices
+from store.serializers import (
+    DataPlanSerializer, BundleSerializer, RouterProductSerializer, ElectronicsDevicesSerializer
+)
+from store.fast_serializers import fast_serialize
+
+
+class Command(BaseCommand):
+    help = "Compare ModelSerializer and the compiled fast path on a synthetic catalog (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Rows per catalog model")
+        parser.add_argument('--repeat', type=int, default=3, help="Timed runs per serializer (best is reported)")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            self.seed(rows)
+            cases = [
+                ('data plans', DataPlanSerializer, DataPlan.objects.select_related('provider')),
+                ('bundles', BundleSerializer, Bundle.objects.select_related('provider').prefetch_related(
+                    Prefetch('data_plans', queryset=DataPlan.objects.select_related('provider'))
+                )),
+                ('routers', RouterProductSerializer, RouterProduct.objects.all()),
+                ('electronics', ElectronicsDevicesSerializer, ElectronicsDevices.objects.all()),
+            ]
+            self.stdout.write(f"{'list':<12} {'rows':>7} {'ModelSerializer':>16} {'fast path':>10} {'speedup':>8}")
+            for label, serializer_class, queryset in cases:
+                slow, slow_bytes = self.best_of(options['repeat'], lambda: serializer_class(queryset.all(), many=True).data)
+                fast, fast_bytes = self.best_of(options['repeat'], lambda: fast_serialize(serializer_class, queryset.all()))
+                if slow_bytes != fast_bytes:
+                    self.stderr.write(self.style.ERROR(f"{label}: output differs from ModelSerializer"))
+                self.stdout.write(f"{label:<12} {rows:>7} {slow * 1000:>14.1f}ms {fast * 1000:>8.1f}ms {slow / fast:>7.1f}x")
+            transaction.set_rollback(True)
+
+    def best_of(self, repeat, serialize):
+        best, content = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content = JSONRenderer().render(serialize())
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, content
+
+    def seed(self, rows):
+        provider = ServiceProvider.objects.create(name='Benchmark Provider')
+        data_types = [value for value, _ in DataPlan.DATA_TYPES]
+        categories = [value for value, _ in ElectronicsDevices.CATEGORY_CHOICES]
+
+        plans = DataPlan.objects.bulk_create(
+            DataPlan(
+                name=f'Plan {i}', provider=provider, data_volume=f'{i % 50 + 1}GB',
+                validity_days=i % 30 + 1, price=Decimal(i) + Decimal('0.50'),
+                data_type=data_types[i % len(data_types)], description='Benchmark plan ' * 10
+            )
+            for i in range(rows)
+        )
+        bundles = Bundle.objects.bulk_create(
+            Bundle(
+                name=f'Bundle {i}', provider=provider, total_data_volume='10GB',
+                total_price=Decimal(i), discount_percentage=Decimal(i % 20), features=['a', 'b']
+            )
+            for i in range(rows)
+        )
+        Bundle.data_plans.through.objects.bulk_create(
+            Bundle.data_plans.through(bundle_id=bundle.id, dataplan_id=plans[(i + offset) % rows].id)
+            for i, bundle in enumerate(bundles)
+            for offset in range(3)
+        )
+        RouterProduct.objects.bulk_create(
+            RouterProduct(name=f'Router {i}', price=Decimal(i), specifications='4G ' * 20, image=f'routers/{i}.png')
+            for i in range(rows)
+        )
+        ElectronicsDevices.objects.bulk_create(
+            ElectronicsDevices(
+                name=f'Device {i}', price=Decimal(i), category=categories[i % len(categories)],
+                image=f'electronics/{i}.jpg' if i % 2 else None, stock_quantity=i % 7
+            )
+            for i in range(rows)
+        )
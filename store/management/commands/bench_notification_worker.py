@@ -0,0 +1,91 @@
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from store.models import NotificationOutbox, Order
+from store.notifications import BULK_POOL_SIZE, drain_outbox, enqueue_notification, notify_orders, render_notification
+from store.smtp_sink import SMTPSink
+
+# The order created by the benchmark is recognisable by this address and removed afterwards.
+BENCH_EMAIL = 'bench-notify@example.invalid'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure notification throughput against a local SMTP sink: sending inline with a new "
+        "connection per message (the former behaviour), the admin bulk sender, and queueing and "
+        "draining the outbox."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--latency', type=float, default=5.0, help="Milliseconds the sink takes per message")
+        parser.add_argument('--connect-latency', type=float, default=50.0, help="Milliseconds before the sink greets a new connection")
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--pool-size', type=int, default=BULK_POOL_SIZE, help="Connections used by the bulk sender")
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        self.stdout.write(
+            f"Database: {connection.vendor}, sink latency {options['latency']}ms per message, "
+            f"{options['connect_latency']}ms per connection"
+        )
+        self.stdout.write(f"{'path':<8} {'messages':>8} {'conns':>6} {'request s':>10} {'total s':>8} {'msgs/s':>8}")
+        order = Order.objects.create(
+            customer_name='Bench', customer_email=BENCH_EMAIL, customer_phone='0712345678',
+            product_details='Bench order', total_price=Decimal('1500.00'),
+        )
+        try:
+            sink = SMTPSink(latency=options['latency'] / 1000, connect_latency=options['connect_latency'] / 1000)
+            with sink, override_settings(**sink.settings()):
+                runs = [
+                    ('inline', lambda: self.inline(order, count)),
+                    ('bulk', lambda: self.bulk(order, count, options['pool_size'])),
+                    ('outbox', lambda: self.outbox(order, count, options['batch_size'])),
+                ]
+                for path, run in runs:
+                    sink.messages.clear()
+                    sink.connections = 0
+                    self.report(path, sink, *run())
+        finally:
+            order.delete()
+
+    def inline(self, order, count):
+        """What the admin request used to do: render and send each message on a new connection"""
+        started = time.perf_counter()
+        for _ in range(count):
+            subject, body, _ = render_notification(order, 'Benchmark message')
+            send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [order.customer_email])
+        elapsed = time.perf_counter() - started
+        return elapsed, elapsed
+
+    def bulk(self, order, count, pool_size):
+        """The admin actions: send now over a pool of persistent connections"""
+        started = time.perf_counter()
+        notify_orders([order] * count, 'Benchmark message', pool_size)
+        elapsed = time.perf_counter() - started
+        return elapsed, elapsed
+
+    def outbox(self, order, count, batch_size):
+        """The admin request only queues; the worker sends"""
+        started = time.perf_counter()
+        for _ in range(count):
+            enqueue_notification(order, message='Benchmark message')
+        queued = time.perf_counter() - started
+        totals = drain_outbox(batch_size)
+        elapsed = time.perf_counter() - started
+        if totals['sent'] != count:
+            self.stdout.write(self.style.WARNING(f"Only {totals['sent']} of {count} sent: {dict(totals)}"))
+        NotificationOutbox.objects.filter(order=order).delete()
+        return queued, elapsed
+
+    def report(self, path, sink, request_seconds, elapsed):
+        sent = len(sink.messages)
+        self.stdout.write(
+            f"{path:<8} {sent:>8} {sink.connections:>6} {request_seconds:>10.2f} {elapsed:>8.2f} {sent / elapsed:>8.1f}"
+        )
@@ -0,0 +1,98 @@
+import threading
+from collections import Counter
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from store.models import Order, OrderTracking
+from store.order_ingest import ORDER_CREATED_EVENT, place_order
+
+# Orders created by the benchmark are recognisable by this address and removed afterwards.
+BENCH_EMAIL = 'bench-ingest@example.invalid'
+
+
+def legacy_ingest(fields):
+    """The former create_order sequence: every statement in its own autocommit"""
+    order = Order.objects.create(**fields)
+    tracking, _ = OrderTracking.objects.get_or_create(
+        order=order, defaults={'customer_email': order.customer_email, 'customer_phone': order.customer_phone}
+    )
+    tracking.add_status_update(*ORDER_CREATED_EVENT)
+
+
+INGEST_PATHS = {
+    'atomic': place_order,
+    'legacy': legacy_ingest,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure orders/second for concurrent writers through create_order's ingest path. "
+        "Writes to the configured database (SQLite or PostgreSQL); the orders are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, action='append', help="Concurrent writer threads (repeatable, default 1, 4 and 8)")
+        parser.add_argument('--orders', type=int, default=200, help="Orders per writer")
+        parser.add_argument('--path', choices=list(INGEST_PATHS) + ['both'], default='both')
+        parser.add_argument('--keep', action='store_true', help="Keep the benchmark orders")
+
+    def handle(self, *args, **options):
+        paths = list(INGEST_PATHS) if options['path'] == 'both' else [options['path']]
+        self.errors = Counter()
+        self.stdout.write(f"Database: {connection.vendor}")
+        self.stdout.write(f"{'path':<8} {'writers':>7} {'orders':>7} {'failed':>7} {'seconds':>8} {'orders/s':>9}")
+        try:
+            for writers in options['writers'] or [1, 4, 8]:
+                for path in paths:
+                    created, failed, elapsed = self.run_writers(INGEST_PATHS[path], writers, options['orders'])
+                    self.stdout.write(
+                        f"{path:<8} {writers:>7} {created:>7} {failed:>7} {elapsed:>8.2f} {created / elapsed:>9.1f}"
+                    )
+            for message, count in self.errors.most_common():
+                # SQLite allows one writer at a time; writers that wait longer than
+                # the busy timeout fail with "database is locked".
+                self.stdout.write(self.style.WARNING(f"{count} failed: {message}"))
+        finally:
+            if not options['keep']:
+                Order.objects.filter(customer_email=BENCH_EMAIL).delete()
+
+    def run_writers(self, ingest, writers, orders):
+        start = threading.Barrier(writers + 1)
+        results = []
+        lock = threading.Lock()
+
+        def write(writer):
+            created = failed = 0
+            try:
+                start.wait()
+                for index in range(orders):
+                    fields = {
+                        'customer_name': f'Bench {writer}', 'customer_email': BENCH_EMAIL,
+                        'customer_phone': '0712345678', 'product_details': f'Bench order {index}',
+                        'total_price': Decimal('1500.00'),
+                    }
+                    try:
+                        ingest(fields)
+                        created += 1
+                    except Exception as e:
+                        failed += 1
+                        with lock:
+                            self.errors[str(e)] += 1
+            finally:
+                connection.close()
+                with lock:
+                    results.append((created, failed))
+
+        threads = [threading.Thread(target=write, args=(writer,)) for writer in range(writers)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return sum(created for created, _ in results), sum(failed for _, failed in results), elapsed
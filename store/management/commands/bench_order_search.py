@@ -0,0 +1,78 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from store.models import Order
+from store.order_search import search_orders
+from store.phone import normalize_phone
+
+FIRST_NAMES = ['Asha', 'Baraka', 'Neema', 'Juma', 'Rehema', 'Daudi', 'Zawadi', 'Emmanuel', 'Halima', 'Pendo',
+               'Salim', 'Upendo', 'Musa', 'Imani', 'Faraji', 'Grace', 'Hassani', 'Mwanaisha', 'Omari', 'Tumaini']
+LAST_NAMES = ['Mushi', 'Kimaro', 'Mrema', 'Mwakyusa', 'Lyimo', 'Massawe', 'Shirima', 'Mollel', 'Swai', 'Temba',
+              'Ngowi', 'Urassa', 'Makundi', 'Minja', 'Kweka', 'Tarimo', 'Mbwambo', 'Kileo', 'Mushy', 'Njau']
+PRODUCTS = ['Vodacom 10GB monthly bundle', 'Airtel 5GB weekly', 'Tigo unlimited night', 'Halotel 2GB daily',
+            'Huawei B535 4G router', 'TP-Link Archer MR600', 'Samsung Galaxy A14', 'HP ProBook laptop',
+            'Zantel family bundle', 'TTCL fibre 50Mbps', 'JBL Flip speaker', 'Anker power bank']
+
+
+class Command(BaseCommand):
+    help = "Compare admin order search via icontains with the order search index (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help="Orders to seed")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query (best is reported)")
+        parser.add_argument('--query', action='append', help="Query to run (repeatable)")
+
+    def handle(self, *args, **options):
+        queries = options['query'] or ['mushi', 'neema kimaro', 'router', '0754 1', '+255 754 123 456', 'xyz']
+        with transaction.atomic():
+            self.seed(options['rows'])
+            self.stdout.write(f"{'query':<18} {'icontains':>20} {'indexed':>20} {'speedup':>8}")
+            for query in queries:
+                slow, slow_hits = self.best_of(options['repeat'], lambda: self.icontains(query))
+                fast, fast_hits = self.best_of(options['repeat'], lambda: search_orders(query, limit=50)[1])
+                self.stdout.write(
+                    f"{query:<18} {slow * 1000:>9.1f}ms {slow_hits:>5} hits "
+                    f"{fast * 1000:>9.1f}ms {fast_hits:>5} hits {slow / fast:>7.1f}x"
+                )
+            transaction.set_rollback(True)
+
+    def icontains(self, query):
+        """First page plus count, the way admin_search_orders used to run it"""
+        orders = Order.objects.filter(
+            Q(customer_name__icontains=query) |
+            Q(customer_email__icontains=query) |
+            Q(customer_phone__icontains=query) |
+            Q(product_details__icontains=query)
+        )
+        list(orders.order_by('-created_at').values_list('id', flat=True)[:50])
+        return orders.count()
+
+    def best_of(self, repeat, run):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def seed(self, rows):
+        rng = random.Random(0)
+        orders = []
+        for i in range(rows):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            phone = f"07{rng.choice('1456')}{rng.randrange(10 ** 7):07d}"
+            orders.append(Order(
+                customer_name=f'{first} {last}', customer_email=f'{first}.{last}{i}@example.com'.lower(),
+                customer_phone=phone, customer_phone_e164=normalize_phone(phone),
+                product_details=rng.choice(PRODUCTS), total_price=Decimal(rng.randrange(1000, 500000))
+            ))
+            if len(orders) >= 5000:
+                Order.objects.bulk_create(orders)
+                orders = []
+        Order.objects.bulk_create(orders)
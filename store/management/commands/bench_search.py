@@ -0,0 +1,85 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from store.models import ElectronicsDevices
+from store.search import rebuild_search_index, search_entries
+from store.views import ElectronicsDevicesViewSet
+
+# A few hundred distinct words, so each query term matches a realistic
+# fraction of the catalog rather than most of it.
+WORDS = [
+    f'{head}{tail}'
+    for head in ('wire', 'blue', 'char', 'gam', 'ultr', 'port', 'rout', 'speak', 'cam', 'lapt',
+                 'tabl', 'smar', 'hdm', 'us', 'batt', 'disp', 'sol', 'net')
+    for tail in ('less', 'tooth', 'ger', 'ing', 'a', 'able', 'er', 'era', 'op', 'et',
+                 't', 'i', 'b', 'ery', 'lay', 'ar', 'work', 'pro')
+]
+
+
+class Command(BaseCommand):
+    help = "Compare electronics search via SearchFilter (icontains) with the full-text index (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help="Electronics rows to seed")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query (best is reported)")
+        parser.add_argument('--query', action='append', help="Query to run (repeatable)")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        queries = options['query'] or ['laptop', 'wireless charger', 'hdmi usb cable', 'xyz']
+        with transaction.atomic():
+            self.seed(rows)
+            rebuild_search_index()
+            # Hit counts differ a little: the index also covers the category and
+            # matches word prefixes, where icontains matches any substring.
+            self.stdout.write(
+                f"{'query':<18} {'icontains':>20} {'full-text':>20} {'speedup':>8}"
+            )
+            for query in queries:
+                slow, slow_hits = self.best_of(options['repeat'], lambda: self.icontains(query))
+                fast, fast_hits = self.best_of(options['repeat'], lambda: self.full_text(query))
+                self.stdout.write(
+                    f"{query:<18} {slow * 1000:>9.1f}ms {slow_hits:>5} hits "
+                    f"{fast * 1000:>9.1f}ms {fast_hits:>5} hits {slow / fast:>7.1f}x"
+                )
+            transaction.set_rollback(True)
+
+    def icontains(self, query):
+        """Count matches the way ElectronicsDevicesViewSet's SearchFilter does"""
+        view = ElectronicsDevicesViewSet()
+        request = Request(APIRequestFactory().get('/', {'search': query}))
+        queryset = ElectronicsDevices.objects.filter(is_available=True)
+        return filters.SearchFilter().filter_queryset(request, queryset, view).count()
+
+    def full_text(self, query):
+        """First page plus total, as /api/search/ runs it"""
+        return search_entries(query, ['electronics'], limit=20)[1]
+
+    def best_of(self, repeat, run):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def seed(self, rows):
+        rng = random.Random(0)
+        categories = [value for value, _ in ElectronicsDevices.CATEGORY_CHOICES]
+        ElectronicsDevices.objects.bulk_create(
+            ElectronicsDevices(
+                name=' '.join(rng.sample(WORDS, 3)).title() + f' {i}',
+                description=' '.join(rng.sample(WORDS, 20)),
+                specifications=' '.join(rng.sample(WORDS, 10)),
+                price=Decimal(i), category=categories[i % len(categories)]
+            )
+            for i in range(rows)
+        )
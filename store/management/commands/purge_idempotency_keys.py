@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from store.idempotency import purge_expired_keys
+
+
+class Command(BaseCommand):
+    help = "Delete expired Idempotency-Key records in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows deleted per statement")
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys"))
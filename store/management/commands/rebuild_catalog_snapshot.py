@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.catalog_cache import rebuild_catalog_snapshot, get_snapshot_path
+
+
+class Command(BaseCommand):
+    help = "Rebuild the shared catalog snapshot served by the public catalog endpoints"
+
+    def handle(self, *args, **options):
+        rebuild_catalog_snapshot()
+        self.stdout.write(self.style.SUCCESS(f"Catalog snapshot written to {get_snapshot_path()}"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the product search index from the catalog tables"
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products"))
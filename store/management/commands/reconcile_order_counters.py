@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from store.order_stats import reconcile_order_counters
+
+
+class Command(BaseCommand):
+    help = "Recount orders per scope and status and repair any drift in OrderCounter"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it")
+
+    def handle(self, *args, **options):
+        drift = reconcile_order_counters(dry_run=options['dry_run'])
+        for (scope, status), (stored, expected) in sorted(drift.items()):
+            self.stdout.write(f"{scope:<16} {status:<12} stored {stored:>8}  expected {expected:>8}")
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Order counters are in step"))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} counters drifted (not fixed: --dry-run)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {len(drift)} counters"))
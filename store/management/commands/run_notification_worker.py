@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.notifications import BATCH_SIZE, Mailer, clear_worker_heartbeat, drain_outbox, record_worker_heartbeat
+
+
+class Command(BaseCommand):
+    help = "Send queued customer notifications from the outbox, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Rows claimed per batch")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to wait when the outbox is empty")
+        parser.add_argument('--once', action='store_true', help="Exit once nothing is due instead of polling")
+
+    def handle(self, *args, **options):
+        mailer = Mailer()
+        try:
+            while True:
+                # The heartbeat tells requests to leave sending to this worker
+                totals = drain_outbox(options['batch_size'], mailer, heartbeat=record_worker_heartbeat)
+                if totals:
+                    self.stdout.write(
+                        f"Sent {totals['sent']}, retrying {totals['retried']}, dead-lettered {totals['dead']}"
+                    )
+                # Don't hold the SMTP connection open while idle; servers drop idle clients.
+                mailer.close()
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Stopping"))
+        finally:
+            mailer.close()
+            # Requests go back to sending inline until a worker is up again
+            clear_worker_heartbeat()
+        self.stdout.write(self.style.SUCCESS("Outbox drained"))
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_alter_electronicsdevices_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bundle',
+            index=models.Index(fields=['created_at', 'id'], name='bundle_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bundle',
+            index=models.Index(fields=['total_price', 'id'], name='bundle_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataplan',
+            index=models.Index(fields=['created_at', 'id'], name='dataplan_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataplan',
+            index=models.Index(fields=['price', 'id'], name='dataplan_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='electronicsdevices',
+            index=models.Index(fields=['created_at', 'id'], name='electronics_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='electronicsdevices',
+            index=models.Index(fields=['price', 'id'], name='electronics_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routerproduct',
+            index=models.Index(fields=['created_at', 'id'], name='router_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routerproduct',
+            index=models.Index(fields=['price', 'id'], name='router_price_id_idx'),
+        ),
+    ]
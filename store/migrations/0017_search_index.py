@@ -0,0 +1,98 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:23
+
+from django.db import migrations, models
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE store_searchentry_fts USING fts5(
+        title, body, content='store_searchentry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER store_searchentry_ai AFTER INSERT ON store_searchentry BEGIN
+        INSERT INTO store_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER store_searchentry_ad AFTER DELETE ON store_searchentry BEGIN
+        INSERT INTO store_searchentry_fts(store_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER store_searchentry_au AFTER UPDATE ON store_searchentry BEGIN
+        INSERT INTO store_searchentry_fts(store_searchentry_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO store_searchentry_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS store_searchentry_au",
+    "DROP TRIGGER IF EXISTS store_searchentry_ad",
+    "DROP TRIGGER IF EXISTS store_searchentry_ai",
+    "DROP TABLE IF EXISTS store_searchentry_fts",
+]
+
+# The 'simple' configuration (no stemming) is used because product names
+# and descriptions mix English and Swahili.
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE store_searchentry ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX store_searchentry_vector_idx ON store_searchentry USING GIN (search_vector)",
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS store_searchentry_vector_idx",
+    "ALTER TABLE store_searchentry DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+create_fulltext_index = run_vendor_sql({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD})
+drop_fulltext_index = run_vendor_sql({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0016_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('electronics', 'Electronics Device'), ('router', 'Router Product'), ('data_plan', 'Data Plan'), ('bundle', 'Bundle Package')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('price', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('is_visible', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Search Entry',
+                'verbose_name_plural': 'Search Entries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='searchentry_kind_object_uniq'),
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
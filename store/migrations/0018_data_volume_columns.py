@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0017_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bundle',
+            name='data_volume_mb',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Parsed from total_data_volume', null=True),
+        ),
+        migrations.AddField(
+            model_name='bundle',
+            name='price_per_gb',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, help_text='Based on the discounted price', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='dataplan',
+            name='data_volume_mb',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Parsed from data_volume', null=True),
+        ),
+        migrations.AddField(
+            model_name='dataplan',
+            name='price_per_gb',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bundle',
+            index=models.Index(fields=['price_per_gb', 'id'], name='bundle_ppgb_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bundle',
+            index=models.Index(fields=['data_volume_mb', 'id'], name='bundle_volume_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataplan',
+            index=models.Index(fields=['price_per_gb', 'id'], name='dataplan_ppgb_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataplan',
+            index=models.Index(fields=['data_volume_mb', 'id'], name='dataplan_volume_id_idx'),
+        ),
+    ]
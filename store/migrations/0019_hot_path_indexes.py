@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0018_data_volume_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bundle',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-is_featured', 'total_price'], name='bundle_active_feat_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bundle',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['provider', 'total_price'], name='bundle_active_prov_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dataplan',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['provider', 'price'], name='dataplan_active_prov_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='electronicsdevices',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['-created_at'], name='electronics_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='electronicsdevices',
+            index=models.Index(fields=['category', '-created_at'], name='electronics_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer_email', '-created_at'], name='order_email_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routerproduct',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['-created_at'], name='router_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceprovider',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['name'], name='provider_active_name_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:35
+
+from django.db import migrations, models
+
+
+def fill_order_counters(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    OrderCounter = apps.get_model('store', 'OrderCounter')
+    counts = {}
+    for user_id, status, count in (
+        Order.objects.order_by().values_list('user_id', 'status').annotate(count=models.Count('pk'))
+    ):
+        scopes = ['all'] if user_id is None else ['all', f'user:{user_id}']
+        for scope in scopes:
+            for key in ('total', status):
+                counts[scope, key] = counts.get((scope, key), 0) + count
+    OrderCounter.objects.bulk_create(
+        OrderCounter(scope=scope, status=status, count=count) for (scope, status), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0019_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=32)),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Order Counter',
+                'verbose_name_plural': 'Order Counters',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ordercounter',
+            constraint=models.UniqueConstraint(fields=('scope', 'status'), name='ordercounter_scope_status_uniq'),
+        ),
+        migrations.RunPython(fill_order_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:38
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+
+def fill_order_rollups(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    OrderRollup = apps.get_model('store', 'OrderRollup')
+    tz = timezone.get_default_timezone()
+    rollups = []
+    for granularity, truncate in (('hour', TruncHour), ('day', TruncDay)):
+        rows = (
+            Order.objects.order_by()
+            .values_list(truncate('created_at', tzinfo=tz), 'service_type', 'status')
+            .annotate(count=models.Count('pk'), revenue=models.Sum('total_price'))
+        )
+        rollups.extend(
+            OrderRollup(
+                granularity=granularity, bucket_start=start, service_type=service_type, status=status,
+                orders=count, revenue=revenue or 0
+            )
+            for start, service_type, status, count, revenue in rows
+        )
+    OrderRollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0020_order_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('service_type', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('orders', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Order Rollup',
+                'verbose_name_plural': 'Order Rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='orderrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'bucket_start', 'service_type', 'status'), name='orderrollup_bucket_uniq'),
+        ),
+        migrations.RunPython(fill_order_rollups, migrations.RunPython.noop),
+    ]
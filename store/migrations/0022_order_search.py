@@ -0,0 +1,105 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:40
+
+from django.db import migrations, models
+
+from store.phone import normalize_phone
+
+
+# Trigram tokens match any substring of three or more characters, which
+# suits names, email addresses and free-text product details alike.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE store_order_fts USING fts5(
+        customer_name, customer_email, product_details,
+        content='store_order', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER store_order_fts_ai AFTER INSERT ON store_order BEGIN
+        INSERT INTO store_order_fts(rowid, customer_name, customer_email, product_details)
+        VALUES (new.id, new.customer_name, new.customer_email, new.product_details);
+    END
+    """,
+    """
+    CREATE TRIGGER store_order_fts_ad AFTER DELETE ON store_order BEGIN
+        INSERT INTO store_order_fts(store_order_fts, rowid, customer_name, customer_email, product_details)
+        VALUES ('delete', old.id, old.customer_name, old.customer_email, old.product_details);
+    END
+    """,
+    """
+    CREATE TRIGGER store_order_fts_au AFTER UPDATE OF customer_name, customer_email, product_details
+    ON store_order BEGIN
+        INSERT INTO store_order_fts(store_order_fts, rowid, customer_name, customer_email, product_details)
+        VALUES ('delete', old.id, old.customer_name, old.customer_email, old.product_details);
+        INSERT INTO store_order_fts(rowid, customer_name, customer_email, product_details)
+        VALUES (new.id, new.customer_name, new.customer_email, new.product_details);
+    END
+    """,
+    "INSERT INTO store_order_fts(store_order_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS store_order_fts_au",
+    "DROP TRIGGER IF EXISTS store_order_fts_ad",
+    "DROP TRIGGER IF EXISTS store_order_fts_ai",
+    "DROP TABLE IF EXISTS store_order_fts",
+]
+
+# The indexed expression must match ORDER_SEARCH_DOCUMENT in store/order_search.py.
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX store_order_search_trgm_idx ON store_order USING GIN (
+        (customer_name || ' ' || customer_email || ' ' || product_details) gin_trgm_ops
+    )
+    """,
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS store_order_search_trgm_idx",
+]
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+create_order_search_index = run_vendor_sql({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD})
+drop_order_search_index = run_vendor_sql({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE})
+
+
+def fill_phone_numbers(apps, schema_editor):
+    Order = apps.get_model('store', 'Order')
+    batch = []
+    for order in Order.objects.only('id', 'customer_phone').iterator(chunk_size=1000):
+        order.customer_phone_e164 = normalize_phone(order.customer_phone)
+        if order.customer_phone_e164:
+            batch.append(order)
+        if len(batch) >= 1000:
+            Order.objects.bulk_update(batch, ['customer_phone_e164'])
+            batch = []
+    Order.objects.bulk_update(batch, ['customer_phone_e164'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0021_order_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='customer_phone_e164',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer_phone_e164', '-created_at'], name='order_phone_created_idx'),
+        ),
+        migrations.RunPython(fill_phone_numbers, migrations.RunPython.noop),
+        migrations.RunPython(create_order_search_index, drop_order_search_index),
+    ]
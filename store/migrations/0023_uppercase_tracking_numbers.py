@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:43
+
+from django.db import migrations
+
+
+def uppercase_tracking_numbers(apps, schema_editor):
+    """Tracking numbers are now looked up uppercased; generated ones already are"""
+    OrderTracking = apps.get_model('store', 'OrderTracking')
+    for tracking in OrderTracking.objects.only('id', 'tracking_number').iterator():
+        normalized = tracking.tracking_number.strip().upper()
+        if normalized != tracking.tracking_number:
+            OrderTracking.objects.filter(pk=tracking.pk).update(tracking_number=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0022_order_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(uppercase_tracking_numbers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:43
+
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.utils.dateparse import parse_datetime
+
+
+def copy_status_updates(apps, schema_editor):
+    """One event row per entry of each tracking row's `status_updates` list"""
+    OrderTracking = apps.get_model('store', 'OrderTracking')
+    OrderTrackingEvent = apps.get_model('store', 'OrderTrackingEvent')
+    events = []
+    for tracking in OrderTracking.objects.only('id', 'signup_date', 'status_updates').iterator(chunk_size=500):
+        for update in tracking.status_updates or []:
+            if not isinstance(update, dict):
+                continue
+            timestamp = parse_datetime(str(update.get('timestamp') or '')) or tracking.signup_date
+            if django.utils.timezone.is_naive(timestamp):
+                timestamp = django.utils.timezone.make_aware(timestamp, datetime.timezone.utc)
+            events.append(OrderTrackingEvent(
+                tracking_id=tracking.id, status=str(update.get('status') or '')[:50],
+                notes=str(update.get('notes') or ''), timestamp=timestamp
+            ))
+        if len(events) >= 1000:
+            OrderTrackingEvent.objects.bulk_create(events)
+            events = []
+    OrderTrackingEvent.objects.bulk_create(events)
+
+
+def restore_status_updates(apps, schema_editor):
+    OrderTracking = apps.get_model('store', 'OrderTracking')
+    OrderTrackingEvent = apps.get_model('store', 'OrderTrackingEvent')
+    timelines = {}
+    for tracking_id, status, notes, timestamp in (
+        OrderTrackingEvent.objects.order_by('tracking_id', 'timestamp', 'id')
+        .values_list('tracking_id', 'status', 'notes', 'timestamp')
+    ):
+        timelines.setdefault(tracking_id, []).append(
+            {'status': status, 'notes': notes, 'timestamp': timestamp.isoformat()}
+        )
+    for tracking_id, timeline in timelines.items():
+        OrderTracking.objects.filter(pk=tracking_id).update(status_updates=timeline)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0023_uppercase_tracking_numbers'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderTrackingEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=50)),
+                ('notes', models.TextField(blank=True)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tracking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='store.ordertracking')),
+            ],
+            options={
+                'verbose_name': 'Order Tracking Event',
+                'verbose_name_plural': 'Order Tracking Events',
+                'indexes': [models.Index(fields=['tracking', 'timestamp', 'id'], name='trackingevent_tracking_ts_idx')],
+            },
+        ),
+        migrations.RunPython(copy_status_updates, restore_status_updates),
+        migrations.RemoveField(
+            model_name='ordertracking',
+            name='status_updates',
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0024_tracking_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=255)),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('response_body', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Idempotency Key',
+                'verbose_name_plural': 'Idempotency Keys',
+                'indexes': [models.Index(fields=['expires_at'], name='idempotencykey_expires_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('scope', 'key'), name='idempotencykey_scope_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0025_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_type', models.CharField(choices=[('data_plan', 'Data Plan'), ('bundle', 'Bundle Package'), ('router', 'Router Product'), ('electronics', 'Electronics Device')], max_length=20)),
+                ('product_name', models.CharField(max_length=255)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('line_total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('bundle', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='store.bundle')),
+                ('data_plan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='store.dataplan')),
+                ('electronics_device', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='store.electronicsdevices')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='store.order')),
+                ('router_product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='store.routerproduct')),
+            ],
+            options={
+                'verbose_name': 'Order Item',
+                'verbose_name_plural': 'Order Items',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0026_order_items'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS'), ('both', 'Both')], default='email', max_length=20)),
+                ('recipient_email', models.EmailField(blank=True, max_length=254)),
+                ('recipient_phone', models.CharField(blank=True, max_length=20)),
+                ('subject', models.CharField(blank=True, max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('sms_body', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('dead', 'Dead letter')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('lease_token', models.CharField(blank=True, max_length=32)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='store.order')),
+            ],
+            options={
+                'verbose_name': 'Notification',
+                'verbose_name_plural': 'Notification Outbox',
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['available_at', 'id'], name='outbox_pending_due_idx')],
+            },
+        ),
+    ]
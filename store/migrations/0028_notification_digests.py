@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0027_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='statuses',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
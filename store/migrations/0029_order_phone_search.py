@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:10
+
+from django.db import migrations
+
+
+# A trigram index over the E.164 numbers, so support staff can find an
+# order from any run of its digits (e.g. the last six) and not only from
+# the start of the number.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE store_order_phone_fts USING fts5(
+        customer_phone_e164, content='store_order', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER store_order_phone_fts_ai AFTER INSERT ON store_order BEGIN
+        INSERT INTO store_order_phone_fts(rowid, customer_phone_e164) VALUES (new.id, new.customer_phone_e164);
+    END
+    """,
+    """
+    CREATE TRIGGER store_order_phone_fts_ad AFTER DELETE ON store_order BEGIN
+        INSERT INTO store_order_phone_fts(store_order_phone_fts, rowid, customer_phone_e164)
+        VALUES ('delete', old.id, old.customer_phone_e164);
+    END
+    """,
+    """
+    CREATE TRIGGER store_order_phone_fts_au AFTER UPDATE OF customer_phone_e164 ON store_order BEGIN
+        INSERT INTO store_order_phone_fts(store_order_phone_fts, rowid, customer_phone_e164)
+        VALUES ('delete', old.id, old.customer_phone_e164);
+        INSERT INTO store_order_phone_fts(rowid, customer_phone_e164) VALUES (new.id, new.customer_phone_e164);
+    END
+    """,
+    "INSERT INTO store_order_phone_fts(store_order_phone_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS store_order_phone_fts_au",
+    "DROP TRIGGER IF EXISTS store_order_phone_fts_ad",
+    "DROP TRIGGER IF EXISTS store_order_phone_fts_ai",
+    "DROP TABLE IF EXISTS store_order_phone_fts",
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX store_order_phone_trgm_idx ON store_order USING GIN (customer_phone_e164 gin_trgm_ops)",
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP INDEX IF EXISTS store_order_phone_trgm_idx",
+]
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0028_notification_digests'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_vendor_sql({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run_vendor_sql({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRESQL_REVERSE}),
+        ),
+    ]
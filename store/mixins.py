@@ -0,0 +1,84 @@
+# store/mixins.py
+from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import SAFE_METHODS
+
+from .eager_loading import optimize_queryset
+from .conditional import compute_validators, not_modified_response, set_validators
+
+
+class EagerLoadingMixin:
+    """
+    Eager-load whatever the serializer's nested fields and dotted sources read.
+
+    Applied in `filter_queryset` for the standard list/retrieve routes and in
+    `get_serializer` for custom actions that build their own querysets, so
+    every listing runs a fixed number of queries whatever the row count.
+    """
+    def get_requested_fields(self):
+        serializer_class = self.get_serializer_class()
+        get_fields = getattr(serializer_class, 'get_requested_fields', None)
+        return get_fields(self.request) if get_fields else None
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in SAFE_METHODS:
+            queryset = optimize_queryset(queryset, self.get_serializer_class(), self.get_requested_fields())
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if args and isinstance(args[0], QuerySet):
+            queryset = optimize_queryset(args[0], self.get_serializer_class(), self.get_requested_fields())
+            args = (queryset,) + args[1:]
+        return super().get_serializer(*args, **kwargs)
+
+
+class SparseFieldsetViewMixin:
+    """
+    Narrow read querysets to the fieldset requested with `?fields=`/`?view=summary`.
+
+    Hooks `filter_queryset` rather than `get_queryset` so it also applies to
+    ViewSets that build their own queryset.
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return self.get_serializer_class().narrow_queryset(queryset, self.request)
+
+
+class ConditionalGetMixin:
+    """
+    Answer If-None-Match/If-Modified-Since on list and retrieve with a 304
+    before anything is serialized (see store/conditional.py).
+    """
+    def get_validators(self, queryset):
+        serializer_class = self.get_serializer_class()
+        get_fields = getattr(serializer_class, 'get_requested_fields', None)
+        fields = get_fields(self.request) if get_fields else None
+        return compute_validators(self.request, queryset, serializer_class, fields)
+
+    def list(self, request, *args, **kwargs):
+        validators = self.get_validators(self.filter_queryset(self.get_queryset()))
+        response = not_modified_response(request, *validators)
+        if response is not None:
+            return response
+        return set_validators(super().list(request, *args, **kwargs), *validators)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (TypeError, ValueError, ValidationError):
+            # A malformed lookup value matches nothing, as get_object() would report
+            raise NotFound
+        validators = self.get_validators(queryset)
+        response = not_modified_response(request, *validators)
+        if response is not None:
+            return response
+        return set_validators(super().retrieve(request, *args, **kwargs), *validators)
+
+
+class CatalogViewSetMixin(ConditionalGetMixin, EagerLoadingMixin, SparseFieldsetViewMixin):
+    """Conditional GET, eager loading and sparse fieldsets for catalog ViewSets"""
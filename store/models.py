@@ -1,9 +1,11 @@
 # store/models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 import uuid
 
+from .data_volume import parse_data_volume, compute_price_per_gb
+
 class ServiceProvider(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -17,6 +19,9 @@ class ServiceProvider(models.Model):
     class Meta:
         verbose_name = "Service Provider"
         verbose_name_plural = "Service Providers"
+        indexes = [
+            models.Index(fields=['name'], condition=models.Q(is_active=True), name='provider_active_name_idx'),
+        ]
 
 class RouterProduct(models.Model):
     name = models.CharField(max_length=255)
@@ -31,6 +36,13 @@ class RouterProduct(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='router_created_id_idx'),
+            models.Index(fields=['price', 'id'], name='router_price_id_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_available=True), name='router_available_idx'),
+        ]
+
 # ============ SEPARATED DATA MODELS ============
 
 class DataPlan(models.Model):
@@ -62,16 +74,32 @@ class DataPlan(models.Model):
     network_type = models.CharField(max_length=10, choices=NETWORK_TYPES, default='4g')
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
+    data_volume_mb = models.PositiveIntegerField(null=True, blank=True, editable=False, help_text="Parsed from data_volume")
+    price_per_gb = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.name} - {self.provider.name} ({self.data_volume})"
     
+    def save(self, *args, **kwargs):
+        self.data_volume_mb = parse_data_volume(self.data_volume)
+        self.price_per_gb = compute_price_per_gb(self.price, self.data_volume_mb)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'data_volume_mb', 'price_per_gb'}
+        super().save(*args, **kwargs)
+    
     class Meta:
         verbose_name = "Data Plan"
         verbose_name_plural = "Data Plans"
         ordering = ['provider', 'price']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='dataplan_created_id_idx'),
+            models.Index(fields=['price', 'id'], name='dataplan_price_id_idx'),
+            models.Index(fields=['price_per_gb', 'id'], name='dataplan_ppgb_id_idx'),
+            models.Index(fields=['data_volume_mb', 'id'], name='dataplan_volume_id_idx'),
+            models.Index(fields=['provider', 'price'], condition=models.Q(is_active=True), name='dataplan_active_prov_price_idx'),
+        ]
 
 class Bundle(models.Model):
     """Model for bundled packages that can include multiple data plans"""
@@ -94,6 +122,8 @@ class Bundle(models.Model):
     features = models.JSONField(default=list, help_text="List of features included")
     is_active = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
+    data_volume_mb = models.PositiveIntegerField(null=True, blank=True, editable=False, help_text="Parsed from total_data_volume")
+    price_per_gb = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False, help_text="Based on the discounted price")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -107,10 +137,25 @@ class Bundle(models.Model):
             return self.total_price - discount_amount
         return self.total_price
     
+    def save(self, *args, **kwargs):
+        self.data_volume_mb = parse_data_volume(self.total_data_volume)
+        self.price_per_gb = compute_price_per_gb(self.get_actual_price(), self.data_volume_mb)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'data_volume_mb', 'price_per_gb'}
+        super().save(*args, **kwargs)
+    
     class Meta:
         verbose_name = "Bundle"
         verbose_name_plural = "Bundles"
         ordering = ['-is_featured', 'total_price']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='bundle_created_id_idx'),
+            models.Index(fields=['total_price', 'id'], name='bundle_price_id_idx'),
+            models.Index(fields=['price_per_gb', 'id'], name='bundle_ppgb_id_idx'),
+            models.Index(fields=['data_volume_mb', 'id'], name='bundle_volume_id_idx'),
+            models.Index(fields=['-is_featured', 'total_price'], condition=models.Q(is_active=True), name='bundle_active_feat_price_idx'),
+            models.Index(fields=['provider', 'total_price'], condition=models.Q(is_active=True), name='bundle_active_prov_price_idx'),
+        ]
 
 # ============ ELECTRONICS DEVICES ============
 
@@ -146,6 +191,41 @@ class ElectronicsDevices(models.Model):
         verbose_name = "Electronics Device"
         verbose_name_plural = "Electronics Devices"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='electronics_created_id_idx'),
+            models.Index(fields=['price', 'id'], name='electronics_price_id_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_available=True), name='electronics_available_idx'),
+            models.Index(fields=['category', '-created_at'], name='electronics_category_idx'),
+        ]
+
+# ============ SEARCH INDEX ============
+
+class SearchEntry(models.Model):
+    """Search document for one catalog product, kept in sync by store/signals.py"""
+    KIND_CHOICES = [
+        ('electronics', 'Electronics Device'),
+        ('router', 'Router Product'),
+        ('data_plan', 'Data Plan'),
+        ('bundle', 'Bundle Package'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    is_visible = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.kind} #{self.object_id} - {self.title}"
+    
+    class Meta:
+        verbose_name = "Search Entry"
+        verbose_name_plural = "Search Entries"
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchentry_kind_object_uniq'),
+        ]
 
 # ============ ORDER MODELS ============
 
@@ -172,6 +252,8 @@ class Order(models.Model):
     customer_name = models.CharField(max_length=255)
     customer_email = models.EmailField()
     customer_phone = models.CharField(max_length=20)
+    # E.164 copy of customer_phone, set in save() and used by order search
+    customer_phone_e164 = models.CharField(max_length=16, blank=True, default='', editable=False)
     
     # Order details
     service_type = models.CharField(max_length=20, choices=SERVICE_TYPES, default='data_plan')
@@ -210,63 +292,133 @@ class Order(models.Model):
         ordering = ['-created_at']
         verbose_name = "Order"
         verbose_name_plural = "Orders"
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_id_idx'),
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
+            models.Index(fields=['customer_email', '-created_at'], name='order_email_created_idx'),
+            models.Index(fields=['customer_phone_e164', '-created_at'], name='order_phone_created_idx'),
+        ]
     
     def __str__(self):
         return f"Order #{self.id} - {self.customer_name} - {self.get_status_display()}"
     
+    # OrderState as last read from or written to the database, so a delete
+    # takes the counts off the rows they were added to even if the instance
+    # was changed in memory since. save() reads the row itself instead.
+    _counted_state = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        from .order_stats import STATE_FIELDS, order_state
+        
+        instance = super().from_db(db, field_names, values)
+        if all(field in instance.__dict__ for field in STATE_FIELDS):
+            instance._counted_state = order_state(instance)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        from .order_stats import previous_order_state, record_order_change, saved_order_state
+        from .phone import normalize_phone
+        
+        self.customer_phone_e164 = normalize_phone(self.customer_phone)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'customer_phone_e164'}
+        # No savepoint: inside a caller's transaction a failure here fails the whole of it anyway.
+        with transaction.atomic(savepoint=False):
+            previous = previous_order_state(self)
+            super().save(*args, **kwargs)
+            current = saved_order_state(self, previous, kwargs.get('update_fields'))
+            record_order_change(previous, current)
+        self._counted_state = current
+    
     def mark_completed(self):
         self.status = 'delivered'
         self.completed_at = timezone.now()
         self.save()
     
     def send_notification(self, method='email', message=None):
-        """Send notification to customer"""
-        from django.core.mail import send_mail
-        from django.conf import settings
+        """
+        Queue a notification to the customer; run_notification_worker sends it.
         
-        if not message:
-            message = f"Your order #{self.id} status has been updated to: {self.get_status_display()}"
+        Without a `message` it is a status update, merged with other status
+        updates for this order that are still waiting (see store/notifications.py).
+        """
+        from .notifications import enqueue_notification, enqueue_status_notification
         
-        try:
-            if method in ['email', 'both']:
-                send_mail(
-                    f'Order #{self.id} Update - Frecha Iotech',
-                    f"""
-                    Dear {self.customer_name},
-                    
-                    {message}
-                    
-                    Order Details:
-                    - Order ID: #{self.id}
-                    - Service: {self.get_service_type_display()}
-                    - Product: {self.product_details}
-                    - Status: {self.get_status_display()}
-                    - Total: TZS {self.total_price}
-                    
-                    Thank you for choosing Frecha Iotech!
-                    
-                    Best regards,
-                    Frecha Iotech Team
-                    """,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [self.customer_email],
-                    fail_silently=False,
-                )
-            
-            if method in ['sms', 'both']:
-                sms_message = f"Frecha Iotech: {message}. Order #{self.id}"
-                print(f"📱 SMS would be sent to {self.customer_phone}: {sms_message}")
-            
-            self.customer_notified = True
-            self.notification_sent_at = timezone.now()
-            self.notification_method = method
-            self.save()
-            
-            return True
-            
-        except Exception as e:
-            print(f"❌ Notification failed: {e}")
-            return False
+        if message:
+            enqueue_notification(self, method=method, message=message)
+        else:
+            enqueue_status_notification(self, method=method)
+        return True
+
+class OrderItem(models.Model):
+    """One line of a cart order; prices are copied from the catalogue at checkout"""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    service_type = models.CharField(max_length=20, choices=Order.SERVICE_TYPES)
+
+    # The product this line was for; kept nullable like the Order references
+    data_plan = models.ForeignKey(DataPlan, on_delete=models.SET_NULL, null=True, blank=True)
+    bundle = models.ForeignKey(Bundle, on_delete=models.SET_NULL, null=True, blank=True)
+    router_product = models.ForeignKey(RouterProduct, on_delete=models.SET_NULL, null=True, blank=True)
+    electronics_device = models.ForeignKey(ElectronicsDevices, on_delete=models.SET_NULL, null=True, blank=True)
+
+    product_name = models.CharField(max_length=255)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField(default=1)
+    line_total = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name} (Order #{self.order_id})"
+
+    class Meta:
+        verbose_name = "Order Item"
+        verbose_name_plural = "Order Items"
+
+class OrderCounter(models.Model):
+    """Number of orders per scope ('all' or 'user:<id>') and status, kept by store/order_stats.py"""
+    scope = models.CharField(max_length=32)
+    status = models.CharField(max_length=20)
+    count = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.scope} {self.status}: {self.count}"
+    
+    class Meta:
+        verbose_name = "Order Counter"
+        verbose_name_plural = "Order Counters"
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'status'], name='ordercounter_scope_status_uniq'),
+        ]
+
+class OrderRollup(models.Model):
+    """Orders and revenue per hour or day of `created_at`, service type and status, kept by store/order_stats.py"""
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITY_CHOICES = [
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+    
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    service_type = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    orders = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start:%Y-%m-%d %H:%M} {self.service_type}/{self.status}: {self.orders}"
+    
+    class Meta:
+        verbose_name = "Order Rollup"
+        verbose_name_plural = "Order Rollups"
+        constraints = [
+            # Also serves the range reads, which filter on granularity and bucket_start.
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket_start', 'service_type', 'status'], name='orderrollup_bucket_uniq'
+            ),
+        ]
 
 class OrderTracking(models.Model):
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='tracking')
@@ -276,24 +428,114 @@ class OrderTracking(models.Model):
     signup_date = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     
-    # Tracking events
-    status_updates = models.JSONField(default=list)
-    
     def __str__(self):
         return f"Tracking #{self.tracking_number} - {self.order.customer_name}"
+    
+    @property
+    def status_updates(self):
+        """The event timeline, oldest first, shaped like the former `status_updates` JSON list"""
+        return [
+            {'status': status, 'notes': notes, 'timestamp': timestamp.isoformat()}
+            for status, notes, timestamp in (
+                self.events.order_by('timestamp', 'id').values_list('status', 'notes', 'timestamp')
+            )
+        ]
 
     def generate_tracking_number(self):
         return f"FRE{str(uuid.uuid4())[:8].upper()}"
     
     def save(self, *args, **kwargs):
+        from .tracking_cache import normalize_tracking_number
+        
         if not self.tracking_number:
             self.tracking_number = self.generate_tracking_number()
+        # Stored uppercase so lookups can be case-insensitive and still use the unique index
+        self.tracking_number = normalize_tracking_number(self.tracking_number)
         super().save(*args, **kwargs)
     
     def add_status_update(self, status, notes=""):
-        self.status_updates.append({
-            'status': status,
-            'notes': notes,
-            'timestamp': timezone.now().isoformat()
-        })
-        self.save()
\ No newline at end of file
+        """Record one tracking event with a single INSERT"""
+        return OrderTrackingEvent.objects.create(tracking=self, status=status, notes=notes or '')
+
+class OrderTrackingEvent(models.Model):
+    """One entry of an order's tracking timeline; rows are only ever appended"""
+    tracking = models.ForeignKey(OrderTracking, on_delete=models.CASCADE, related_name='events')
+    status = models.CharField(max_length=50)
+    notes = models.TextField(blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.tracking_id} {self.status} at {self.timestamp:%Y-%m-%d %H:%M}"
+    
+    class Meta:
+        verbose_name = "Order Tracking Event"
+        verbose_name_plural = "Order Tracking Events"
+        indexes = [
+            models.Index(fields=['tracking', 'timestamp', 'id'], name='trackingevent_tracking_ts_idx'),
+        ]
+
+class IdempotencyKey(models.Model):
+    """A client-supplied Idempotency-Key and the response it produced, kept by store/idempotency.py"""
+    scope = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    # Null while the first request is still being handled
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+    
+    class Meta:
+        verbose_name = "Idempotency Key"
+        verbose_name_plural = "Idempotency Keys"
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotencykey_scope_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotencykey_expires_idx'),
+        ]
+
+class NotificationOutbox(models.Model):
+    """A customer notification waiting to be sent by run_notification_worker (store/notifications.py)"""
+    PENDING = 'pending'
+    SENT = 'sent'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead letter'),
+    ]
+    METHOD_CHOICES = [('email', 'Email'), ('sms', 'SMS'), ('both', 'Both')]
+    
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='notifications')
+    method = models.CharField(max_length=20, choices=METHOD_CHOICES, default='email')
+    # Rendered when queued, so the message describes the order as it was then
+    recipient_email = models.EmailField(blank=True)
+    recipient_phone = models.CharField(max_length=20, blank=True)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    sms_body = models.TextField(blank=True)
+    # Order statuses a coalesced status update covers, oldest first; empty for other messages
+    statuses = models.JSONField(default=list, blank=True)
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a pending row may next be claimed; a claim pushes it out by the lease time
+    available_at = models.DateTimeField(default=timezone.now)
+    lease_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.get_method_display()} for Order #{self.order_id} ({self.status})"
+    
+    class Meta:
+        verbose_name = "Notification"
+        verbose_name_plural = "Notification Outbox"
+        indexes = [
+            models.Index(fields=['available_at', 'id'], condition=models.Q(status='pending'), name='outbox_pending_due_idx'),
+        ]
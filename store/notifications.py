@@ -0,0 +1,416 @@
+# store/notifications.py
+"""
+Customer notifications through a transactional outbox.
+
+`enqueue_notification` renders the message and INSERTs a
+`NotificationOutbox` row. Called in the transaction that changes the
+order, the notification exists exactly when the change commits, and the
+request never waits on the mail server. `run_notification_worker` drains
+the outbox:
+
+- Due rows are claimed in batches by a conditional UPDATE that stamps a
+  lease token, so two workers never claim the same row. A claim pushes
+  `available_at` out by `LEASE`; rows of a worker that dies mid-batch
+  become due again after that.
+- The emails go out over one SMTP connection, kept open while there is
+  work.
+- A failed row is retried after an exponential backoff (`retry_delay`)
+  and becomes a dead letter after `MAX_ATTEMPTS`. Dead rows can be
+  requeued from the admin.
+- Sent rows are marked with one UPDATE per batch, and the orders'
+  notification fields with one UPDATE per method.
+
+Status updates are coalesced: `enqueue_status_notification` holds an
+order's update for `NOTIFICATION_COALESCE_WINDOW` seconds, and later
+changes in that window are merged into it as one digest listing the
+steps. A delivered or cancelled order's update goes out straight away.
+
+Until a worker is running, notifications are still sent from the request
+that queued them, right after its transaction commits (`send_inline`), and
+status updates are not held for coalescing. The worker records a
+heartbeat in the shared cache on every batch; while it is fresh, requests
+only queue. Deployments run `python manage.py run_notification_worker` as
+a separate process (the `worker` entry in the Procfile).
+
+There is no SMS gateway yet, so SMS messages are logged (`send_sms`).
+
+Admin actions that notify many orders at once send immediately instead,
+through `notify_orders`: a small thread pool, each thread with its own
+persistent SMTP connection, and one `bulk_update` for the orders' fields.
+"""
+import logging
+import random
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import NotificationOutbox, Order
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 8
+RETRY_BASE_DELAY = timedelta(seconds=30)
+RETRY_MAX_DELAY = timedelta(hours=6)
+MAX_ERROR_LENGTH = 2000
+# SMTP connections (one per thread) used by admin bulk sends
+BULK_POOL_SIZE = 4
+# The worker counts as running while its last heartbeat is younger than this
+WORKER_HEARTBEAT_KEY = 'notification-worker:heartbeat'
+WORKER_HEARTBEAT_TIMEOUT = int(LEASE.total_seconds())
+
+# Status updates for these are sent without waiting for further changes
+TERMINAL_STATUSES = ('delivered', 'cancelled')
+
+EMAIL_METHODS = ('email', 'both')
+SMS_METHODS = ('sms', 'both')
+
+
+# ============ QUEUEING ============
+
+EMAIL_SUBJECT = 'Order #{order_id} Update - Frecha Iotech'
+EMAIL_BODY = '\n'.join([
+    'Dear {customer_name},',
+    '',
+    '{message}',
+    '',
+    'Order Details:',
+    '- Order ID: #{order_id}',
+    '- Service: {service}',
+    '- Product: {product}',
+    '- Status: {status}',
+    '- Total: TZS {total}',
+    '',
+    'Thank you for choosing Frecha Iotech!',
+    '',
+    'Best regards,',
+    'Frecha Iotech Team',
+])
+SMS_BODY = 'Frecha Iotech: {message}. Order #{order_id}'
+
+
+class NotificationTemplate:
+    """The message templates with `message` filled in once; `render()` only adds the order's fields"""
+
+    def __init__(self, message):
+        # Braces in the message are literal text, not placeholders
+        literal = message.replace('{', '{{').replace('}', '}}')
+        self.subject = EMAIL_SUBJECT
+        self.body = EMAIL_BODY.replace('{message}', literal)
+        self.sms_body = SMS_BODY.replace('{message}', literal)
+
+    def render(self, order):
+        """`(subject, email body, sms body)` for `order`"""
+        fields = {
+            'order_id': order.id, 'customer_name': order.customer_name,
+            'service': order.get_service_type_display(), 'product': order.product_details,
+            'status': order.get_status_display(), 'total': order.total_price,
+        }
+        return self.subject.format_map(fields), self.body.format_map(fields), self.sms_body.format_map(fields)
+
+    def email(self, order):
+        subject, body, _ = self.render(order)
+        return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [order.customer_email])
+
+
+def render_notification(order, message):
+    """`(subject, email body, sms body)` for a message about `order`"""
+    return NotificationTemplate(message).render(order)
+
+
+def enqueue_notification(order, method='email', message=None):
+    """Queue a notification about `order` with a single INSERT; returns the outbox row"""
+    if not message:
+        message = f"Your order #{order.id} status has been updated to: {order.get_status_display()}"
+    subject, body, sms_body = render_notification(order, message)
+    row = NotificationOutbox.objects.create(
+        order=order, method=method,
+        recipient_email=order.customer_email, recipient_phone=order.customer_phone,
+        subject=subject, body=body, sms_body=sms_body,
+    )
+    if not worker_running():
+        send_inline()
+    return row
+
+
+def status_message(order, statuses):
+    """The status-update text; earlier steps are listed when several changes were merged"""
+    message = f"Your order #{order.id} status has been updated to: {order.get_status_display()}"
+    if len(statuses) > 1:
+        labels = dict(Order.STATUS_CHOICES)
+        message += '. Steps since our last update: ' + ' → '.join(labels.get(status, status) for status in statuses)
+    return message
+
+
+def coalesce_window():
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_COALESCE_WINDOW', 0))
+
+
+def enqueue_status_notification(order, method='email'):
+    """
+    Queue a status update about `order`, merged into one that is still waiting if possible.
+
+    A new status update is held for the coalescing window. Changes made
+    while it waits rewrite it as a digest instead of adding another message;
+    a terminal status releases it at once. Returns the outbox row.
+    """
+    now = timezone.now()
+    worker = worker_running()
+    # Without a worker nobody would send a held update later
+    release_now = order.status in TERMINAL_STATUSES or not worker
+    waiting = (
+        NotificationOutbox.objects
+        .filter(order=order, method=method, status=NotificationOutbox.PENDING, lease_token='',
+                attempts=0, available_at__gt=now)
+        .order_by('-id').first()
+    )
+    if waiting is not None and waiting.statuses:
+        statuses = waiting.statuses
+        if statuses[-1] != order.status:
+            statuses = statuses + [order.status]
+        subject, body, sms_body = render_notification(order, status_message(order, statuses))
+        changes = {
+            'statuses': statuses, 'subject': subject, 'body': body, 'sms_body': sms_body,
+            'recipient_email': order.customer_email, 'recipient_phone': order.customer_phone,
+            'available_at': now if release_now else waiting.available_at,
+        }
+        # Only while no worker has claimed it; otherwise it is on its way and we queue a new one.
+        merged = NotificationOutbox.objects.filter(
+            pk=waiting.pk, lease_token='', status=NotificationOutbox.PENDING
+        ).update(**changes)
+        if merged:
+            for name, value in changes.items():
+                setattr(waiting, name, value)
+            if not worker:
+                send_inline()
+            return waiting
+
+    subject, body, sms_body = render_notification(order, status_message(order, [order.status]))
+    row = NotificationOutbox.objects.create(
+        order=order, method=method, statuses=[order.status],
+        recipient_email=order.customer_email, recipient_phone=order.customer_phone,
+        subject=subject, body=body, sms_body=sms_body,
+        available_at=now if release_now else now + coalesce_window(),
+    )
+    if not worker:
+        send_inline()
+    return row
+
+
+def record_worker_heartbeat():
+    caches['shared'].set(WORKER_HEARTBEAT_KEY, timezone.now().isoformat(), WORKER_HEARTBEAT_TIMEOUT)
+
+
+def clear_worker_heartbeat():
+    caches['shared'].delete(WORKER_HEARTBEAT_KEY)
+
+
+def worker_running():
+    return caches['shared'].get(WORKER_HEARTBEAT_KEY) is not None
+
+
+def send_inline():
+    """Send one batch of due rows once the current transaction commits, for when no worker is running"""
+    transaction.on_commit(send_due_batch)
+
+
+def send_due_batch():
+    try:
+        rows = claim_batch()
+        if rows:
+            mailer = Mailer()
+            try:
+                deliver_batch(rows, mailer)
+            finally:
+                mailer.close()
+    except Exception:
+        # The rows stay queued (and leased rows come back after LEASE); the request has already committed
+        logger.exception("Inline notification delivery failed")
+
+
+# ============ DELIVERY ============
+
+class Mailer:
+    """One SMTP connection, opened on first use and reused until `close()`"""
+
+    def __init__(self):
+        self.connection = None
+
+    def send(self, message):
+        if self.connection is None:
+            self.connection = get_connection(fail_silently=False)
+            self.connection.open()
+        try:
+            self.connection.send_messages([message])
+        except Exception:
+            # The connection may be unusable; the next message opens a fresh one.
+            self.close()
+            raise
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+
+def send_sms(phone, message):
+    logger.info("SMS to %s: %s", phone, message)
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter: about 30s, 1m, 2m, ... capped at RETRY_MAX_DELAY"""
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return delay / 2 + delay / 2 * random.random()
+
+
+def claim_batch(size=BATCH_SIZE):
+    """Lease up to `size` due rows to this caller and return them"""
+    now = timezone.now()
+    due = NotificationOutbox.objects.filter(status=NotificationOutbox.PENDING, available_at__lte=now)
+    ids = list(due.order_by('available_at', 'id').values_list('pk', flat=True)[:size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Rows another worker leased since the SELECT no longer match `due`.
+    due.filter(pk__in=ids).update(lease_token=token, available_at=now + LEASE, attempts=F('attempts') + 1)
+    return list(NotificationOutbox.objects.filter(pk__in=ids, lease_token=token).order_by('id'))
+
+
+def deliver_batch(rows, mailer):
+    """Send claimed rows and record the outcome; returns a Counter of sent/retried/dead"""
+    sent, failed = [], []
+    for row in rows:
+        try:
+            if row.method in EMAIL_METHODS:
+                mailer.send(EmailMessage(row.subject, row.body, settings.DEFAULT_FROM_EMAIL, [row.recipient_email]))
+            if row.method in SMS_METHODS:
+                send_sms(row.recipient_phone, row.sms_body)
+        except Exception as e:
+            failed.append((row, e))
+        else:
+            sent.append(row)
+
+    now = timezone.now()
+    outcome = Counter(sent=len(sent))
+    with transaction.atomic():
+        if sent:
+            NotificationOutbox.objects.filter(pk__in=[row.pk for row in sent]).update(
+                status=NotificationOutbox.SENT, sent_at=now, lease_token='', last_error=''
+            )
+            orders_by_method = defaultdict(list)
+            for row in sent:
+                orders_by_method[row.method].append(row.order_id)
+            for method, order_ids in orders_by_method.items():
+                Order.objects.filter(pk__in=order_ids).update(
+                    customer_notified=True, notification_sent_at=now, notification_method=method
+                )
+        for row, error in failed:
+            dead = row.attempts >= MAX_ATTEMPTS
+            NotificationOutbox.objects.filter(pk=row.pk, lease_token=row.lease_token).update(
+                status=NotificationOutbox.DEAD if dead else NotificationOutbox.PENDING,
+                available_at=now + retry_delay(row.attempts),
+                lease_token='',
+                last_error=f'{type(error).__name__}: {error}'[:MAX_ERROR_LENGTH],
+            )
+            outcome['dead' if dead else 'retried'] += 1
+            logger.warning(
+                "Notification %s for order #%s failed (attempt %s): %s", row.pk, row.order_id, row.attempts, error
+            )
+    return outcome
+
+
+def drain_outbox(batch_size=BATCH_SIZE, mailer=None, heartbeat=None):
+    """
+    Send everything that is due, batch by batch; returns a Counter of sent/retried/dead.
+
+    `heartbeat` is called before each batch.
+    """
+    own_mailer = mailer is None
+    mailer = mailer or Mailer()
+    totals = Counter()
+    try:
+        while True:
+            if heartbeat is not None:
+                heartbeat()
+            rows = claim_batch(batch_size)
+            if not rows:
+                return totals
+            totals.update(deliver_batch(rows, mailer))
+    finally:
+        if own_mailer:
+            mailer.close()
+
+
+def requeue(queryset):
+    """Make dead (or any) rows due again with a fresh retry budget"""
+    return queryset.exclude(status=NotificationOutbox.SENT).update(
+        status=NotificationOutbox.PENDING, attempts=0, available_at=timezone.now(), lease_token=''
+    )
+
+
+# ============ BULK SENDS ============
+
+NOTIFICATION_FIELDS = ['customer_notified', 'notification_sent_at', 'notification_method']
+
+
+def send_bulk(messages, pool_size=BULK_POOL_SIZE):
+    """
+    Send `(key, EmailMessage)` pairs over up to `pool_size` SMTP connections at once.
+
+    Each thread sends its share over one connection of its own. Returns
+    `{key: exception}` for the messages that failed.
+    """
+    shares = [messages[index::pool_size] for index in range(min(pool_size, len(messages)))]
+
+    def send_share(share):
+        mailer, failures = Mailer(), {}
+        try:
+            for key, message in share:
+                try:
+                    mailer.send(message)
+                except Exception as e:
+                    failures[key] = e
+        finally:
+            mailer.close()
+        return failures
+
+    failures = {}
+    if shares:
+        with ThreadPoolExecutor(max_workers=len(shares)) as pool:
+            for share_failures in pool.map(send_share, shares):
+                failures.update(share_failures)
+    return failures
+
+
+def notify_orders(orders, message, pool_size=BULK_POOL_SIZE):
+    """
+    Email `message` about each of `orders` now; returns `(sent, failures)`.
+
+    `failures` lists `(order, exception)` pairs. The orders that were emailed
+    get their notification fields saved with one `bulk_update`.
+    """
+    template = NotificationTemplate(message)
+    orders = list(orders)
+    failures = send_bulk([(order.pk, template.email(order)) for order in orders], pool_size)
+
+    now = timezone.now()
+    sent = [order for order in orders if order.pk not in failures]
+    for order in sent:
+        order.customer_notified = True
+        order.notification_sent_at = now
+        order.notification_method = 'email'
+    Order.objects.bulk_update(sent, NOTIFICATION_FIELDS)
+    return sent, [(order, failures[order.pk]) for order in orders if order.pk in failures]
+
@@ -0,0 +1,239 @@
+# store/optimizer.py
+"""
+Cheapest combination of data plans for a target volume and period.
+
+For a request like "20GB for 30 days" each plan is first stretched over
+the period: a plan valid for fewer days than asked for has to be bought
+again when it runs out, so it counts as `ceil(days / validity_days)`
+purchases with that many times its volume and price. Choosing how many of
+each stretched plan to buy so the volume is covered at the lowest price is
+then a bounded covering knapsack, solved separately for every provider and
+network type.
+
+The solver works on a table of the cheapest known price per volume step.
+Each plan is split into 1, 2, 4, ... copies (binary splitting), so a copy
+is either taken or not, and every copy updates the whole table in one
+vectorized step. Volumes are rounded down to whole steps, so a returned
+combination always really covers the target. The solution is read back
+from one row of "this copy improved the step" bits per copy, packed eight
+to a byte; the step size grows until those rows fit in MAX_TABLE_CELLS, so
+the memory a request can take is fixed whatever the target volume or the
+number of plans.
+
+Active plans are loaded into per-group arrays once per catalog version
+(read from the snapshot header, without rebuilding the snapshot). NumPy
+is used when installed; otherwise the same table is filled with plain
+lists at a coarser step size.
+"""
+import math
+import threading
+from decimal import Decimal
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .models import DataPlan
+from .catalog_cache import get_catalog_version
+from .data_volume import UNLIMITED_MB
+
+# With NumPy volumes up to 64GB are solved to the exact megabyte; larger
+# targets (and the list fallback) use coarser steps.
+MAX_VOLUME_STEPS = 65536 if np is not None else 2000
+# Copies x volume steps kept for reading the solution back: 1MB of packed
+# bits with NumPy, a couple of MB of list slots without.
+MAX_TABLE_CELLS = 1 << 23 if np is not None else 1 << 18
+MAX_DAYS = 366
+
+_groups = None
+_groups_lock = threading.Lock()
+
+
+class PlanGroup:
+    """Active plans of one provider and network type, as parallel arrays"""
+
+    def __init__(self, provider_id, provider_name, network_type, plans):
+        self.provider_id = provider_id
+        self.provider_name = provider_name
+        self.network_type = network_type
+        self.plans = plans
+        volumes = [plan['data_volume_mb'] for plan in plans]
+        validity = [plan['validity_days'] for plan in plans]
+        prices = [float(plan['price']) for plan in plans]
+        if np is not None:
+            self.volumes = np.array(volumes, dtype=np.int64)
+            self.validity = np.array(validity, dtype=np.int64)
+            self.prices = np.array(prices, dtype=np.float64)
+        else:
+            self.volumes, self.validity, self.prices = volumes, validity, prices
+
+    def purchases_per_period(self, days):
+        """How many times each plan must be bought to last `days`"""
+        if not days:
+            return [1] * len(self.plans)
+        if np is not None:
+            return (-(-days // self.validity)).tolist()
+        return [math.ceil(days / validity) for validity in self.validity]
+
+
+def load_plan_groups():
+    rows = (
+        DataPlan.objects
+        .filter(is_active=True, data_volume_mb__gt=0, validity_days__gte=1)
+        .order_by('provider_id', 'network_type', 'price', 'id')
+        .values(
+            'id', 'name', 'price', 'data_volume', 'validity_days', 'data_volume_mb',
+            'network_type', 'provider_id', 'provider__name'
+        )
+    )
+    grouped = {}
+    for row in rows:
+        key = (row['provider_id'], row['network_type'])
+        grouped.setdefault(key, (row['provider__name'], []))[1].append(row)
+    return {
+        key: PlanGroup(key[0], provider_name, key[1], plans)
+        for key, (provider_name, plans) in grouped.items()
+    }
+
+
+def get_plan_groups():
+    """Per-group plan arrays for the current catalog, reloaded when it changes"""
+    global _groups
+
+    version = get_catalog_version()
+    cached = _groups
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _groups_lock:
+        if _groups is None or _groups[0] != version:
+            _groups = (version, load_plan_groups())
+        return _groups[1]
+
+
+# ============ SOLVER ============
+
+def split_counts(needed):
+    """1, 2, 4, ... adding up to at least `needed`, so any count up to it can be formed"""
+    counts, total, count = [], 0, 1
+    while total < needed:
+        counts.append(count)
+        total += count
+        count *= 2
+    return counts
+
+
+def build_items(group, purchases, steps, unit_mb):
+    """0/1 items `(plan_index, purchases, volume_steps, price)` for one group"""
+    items = []
+    for index, plan in enumerate(group.plans):
+        per_period = purchases[index]
+        volume = plan['data_volume_mb']
+        if volume == UNLIMITED_MB:
+            needed, step_of = 1, (lambda count: steps)
+        else:
+            needed = math.ceil(steps * unit_mb / (per_period * volume))
+            step_of = (lambda count, volume=volume: min(count * volume // unit_mb, steps))
+        price = float(plan['price'])
+        for count in split_counts(needed):
+            volume_steps = step_of(count * per_period)
+            if volume_steps:
+                items.append((index, count * per_period, volume_steps, count * per_period * price))
+    return items
+
+
+def fill_table(items, steps):
+    """Cheapest price per covered volume step, plus which items improved each step"""
+    if np is not None:
+        table = np.full(steps + 1, np.inf)
+        table[0] = 0.0
+        taken = []
+        for _, _, volume_steps, price in items:
+            shifted = np.concatenate((np.full(volume_steps, table[0]), table[:steps + 1 - volume_steps])) + price
+            better = shifted < table
+            table = np.where(better, shifted, table)
+            taken.append(np.packbits(better))
+        return float(table[steps]), taken
+
+    table = [0.0] + [math.inf] * steps
+    taken = []
+    for _, _, volume_steps, price in items:
+        shifted = [table[max(step - volume_steps, 0)] + price for step in range(steps + 1)]
+        better = [new < old for new, old in zip(shifted, table)]
+        table = [new if improved else old for new, old, improved in zip(shifted, table, better)]
+        taken.append(better)
+    return table[steps], taken
+
+
+def improved(better, step):
+    """Whether a row from `fill_table` marks `step`"""
+    if np is not None:
+        return bool(better[step >> 3] & (0x80 >> (step & 7)))
+    return better[step]
+
+
+def solve_group(group, volume_mb, days):
+    """Cheapest purchases from one group covering `volume_mb` over `days`, or None"""
+    purchases = group.purchases_per_period(days)
+    unit_mb = max(1, math.ceil(volume_mb / MAX_VOLUME_STEPS))
+    while True:
+        steps = math.ceil(volume_mb / unit_mb)
+        items = build_items(group, purchases, steps, unit_mb)
+        if len(items) * (steps + 1) <= MAX_TABLE_CELLS or steps == 1:
+            break
+        # The number of copies hardly depends on the step size, so one
+        # coarsening is nearly always enough.
+        unit_mb = max(unit_mb + 1, math.ceil(volume_mb * len(items) / MAX_TABLE_CELLS))
+    cost, taken = fill_table(items, steps)
+    if math.isinf(cost):
+        return None
+
+    quantities = {}
+    step = steps
+    for (index, count, volume_steps, _), better in zip(reversed(items), reversed(taken)):
+        if improved(better, step):
+            quantities[index] = quantities.get(index, 0) + count
+            step = max(step - volume_steps, 0)
+
+    purchases, total_price, total_volume, unlimited = [], Decimal('0'), 0, False
+    for index, quantity in sorted(quantities.items()):
+        plan = group.plans[index]
+        total_price += plan['price'] * quantity
+        if plan['data_volume_mb'] == UNLIMITED_MB:
+            unlimited = True
+        else:
+            total_volume += plan['data_volume_mb'] * quantity
+        purchases.append({
+            'id': plan['id'],
+            'name': plan['name'],
+            'data_volume': plan['data_volume'],
+            'validity_days': plan['validity_days'],
+            'price': str(plan['price']),
+            'quantity': quantity,
+        })
+    return {
+        'provider': group.provider_id,
+        'provider_name': group.provider_name,
+        'network_type': group.network_type,
+        'total_price': str(total_price.quantize(Decimal('0.01'))),
+        'total_volume_mb': None if unlimited else total_volume,
+        'unlimited': unlimited,
+        'plans': purchases,
+    }
+
+
+def optimize_plans(volume_mb, days=0, provider=None, network_type=None, limit=5):
+    """Best combination per provider and network type, cheapest first"""
+    if volume_mb <= 0 or days < 0:
+        raise ValueError('volume_mb must be positive and days not negative')
+    results = []
+    for (provider_id, group_network), group in get_plan_groups().items():
+        if provider is not None and str(provider_id) != str(provider):
+            continue
+        if network_type and group_network != network_type:
+            continue
+        solution = solve_group(group, volume_mb, days)
+        if solution is not None:
+            results.append(solution)
+    results.sort(key=lambda solution: (Decimal(solution['total_price']), solution['provider'], solution['network_type']))
+    return results[:limit]
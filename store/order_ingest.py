@@ -0,0 +1,128 @@
+# store/order_ingest.py
+"""
+The write path for new orders.
+
+An order, its tracking row and the first tracking event are created in
+one transaction, so a failure leaves nothing half-written and the whole
+ingest costs a single commit. Each statement is an INSERT except the two
+counter upserts made by `Order.save()`; nothing is read back, since the
+caller already holds every value it needs to render the response.
+
+A cart checks out as one order with an `OrderItem` per line, written by
+a single `bulk_create` in the same transaction. Line prices come from the
+catalogue (one query per product type in the cart), never from the client.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+
+from .models import Bundle, DataPlan, ElectronicsDevices, Order, OrderItem, OrderTracking, RouterProduct
+
+ORDER_CREATED_EVENT = ('order_created', 'Order placed successfully')
+
+MAX_CART_LINES = 50
+MAX_LINE_QUANTITY = 100
+# Largest value Order.total_price can hold
+MAX_ORDER_TOTAL = Decimal('99999999.99')
+CENT = Decimal('0.01')
+
+# service_type -> (product model, reference field on Order/OrderItem, "for sale" filter)
+CART_PRODUCTS = {
+    'data_plan': (DataPlan, 'data_plan', {'is_active': True}),
+    'bundle': (Bundle, 'bundle', {'is_active': True}),
+    'router': (RouterProduct, 'router_product', {'is_available': True}),
+    'electronics': (ElectronicsDevices, 'electronics_device', {'is_available': True}),
+}
+
+
+def place_order(fields, user=None, event=ORDER_CREATED_EVENT, items=()):
+    """
+    Create an order from validated `fields`, with tracking; returns `(order, tracking)`.
+
+    `event` is the `(status, notes)` of the first tracking event, or None to
+    skip it. `items` are unsaved `OrderItem`s to attach to the order.
+    """
+    with transaction.atomic():
+        order = Order(user=user, **fields)
+        order.save(force_insert=True)
+        if items:
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
+        tracking = OrderTracking(
+            order=order, customer_email=order.customer_email, customer_phone=order.customer_phone
+        )
+        tracking.save(force_insert=True)
+        if event is not None:
+            tracking.add_status_update(*event)
+    return order, tracking
+
+
+def unit_price(product):
+    if isinstance(product, Bundle):
+        return product.get_actual_price().quantize(CENT, rounding=ROUND_HALF_UP)
+    return product.price
+
+
+def price_cart(entries):
+    """
+    Priced, unsaved `OrderItem`s for `(service_type, product_id, quantity)` entries.
+
+    Repeats of a product are merged into one line. Returns `(lines, missing)`,
+    where `missing` lists the `(service_type, product_id)` pairs that are
+    unknown or no longer for sale.
+    """
+    quantities = {}
+    for service_type, product_id, quantity in entries:
+        key = (service_type, product_id)
+        quantities[key] = quantities.get(key, 0) + quantity
+
+    wanted = {}
+    for service_type, product_id in quantities:
+        wanted.setdefault(service_type, []).append(product_id)
+    products = {}
+    for service_type, ids in wanted.items():
+        model, _, for_sale = CART_PRODUCTS[service_type]
+        for product in model.objects.filter(pk__in=ids, **for_sale):
+            products[service_type, product.pk] = product
+
+    lines, missing = [], []
+    for (service_type, product_id), quantity in quantities.items():
+        product = products.get((service_type, product_id))
+        if product is None:
+            missing.append((service_type, product_id))
+            continue
+        price = unit_price(product)
+        lines.append(OrderItem(
+            service_type=service_type, product_name=product.name,
+            unit_price=price, quantity=quantity, line_total=price * quantity,
+            **{CART_PRODUCTS[service_type][1]: product}
+        ))
+    return lines, missing
+
+
+def place_cart_order(customer, lines, user=None):
+    """
+    Create one order for the priced `lines` from `price_cart`; returns `(order, tracking)`.
+
+    The header totals are summed in one pass over the lines. Its
+    `service_type` is that of the line with the largest total, so counters
+    and rollups keep seeing one of the four product types, and a single-line
+    cart also sets the header's product reference.
+    """
+    total, units, summary, lead = Decimal('0.00'), 0, [], None
+    for line in lines:
+        total += line.line_total
+        units += line.quantity
+        summary.append(f'{line.quantity} x {line.product_name}')
+        if lead is None or line.line_total > lead.line_total:
+            lead = line
+
+    fields = dict(
+        customer, service_type=lead.service_type, product_details='\n'.join(summary),
+        quantity=units, total_price=total
+    )
+    if len(lines) == 1:
+        reference = CART_PRODUCTS[lead.service_type][1]
+        fields[reference] = getattr(lead, reference)
+    return place_order(fields, user=user, items=lines)
@@ -0,0 +1,180 @@
+# store/order_search.py
+"""
+Order search for support staff.
+
+A whole phone number is normalized to E.164 (store/phone.py) and looked
+up as a prefix range on the indexed `customer_phone_e164` column, newest
+orders first. A shorter run of digits may be part of a phone number or of
+an order's text (a product or serial number), so it matches either: the
+start of a number through the same range, any part of one (so the last
+six digits find an order) through the trigram index on that column from
+migration 0029, or the text through the index below, newest first.
+Anything else (or a whole number with no phone hits) is matched as
+substrings of the customer name, email and product details through the
+trigram index from migration 0022:
+
+- SQLite: an FTS5 table with the trigram tokenizer, kept in step with
+  `store_order` by triggers, ranked with bm25() (name over email over
+  product details)
+- PostgreSQL: a pg_trgm GIN index over the three columns, ranked with
+  word_similarity()
+
+Other backends fall back to `icontains`, newest first.
+"""
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Order
+from .phone import is_full_phone_number, phone_search_digits, phone_search_prefix
+
+MAX_TERMS = 8
+# Trigram indexes can only look up substrings of at least three characters;
+# shorter terms filter the candidates the longer ones found.
+MIN_INDEXED_LENGTH = 3
+
+# Must match the expression indexed in migration 0022.
+ORDER_SEARCH_DOCUMENT = "(customer_name || ' ' || customer_email || ' ' || product_details)"
+
+
+def parse_terms(query):
+    """Whitespace-separated terms, so email addresses and order notes stay whole"""
+    return query.lower().split()[:MAX_TERMS]
+
+
+def like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def phone_range(prefix):
+    """`(low, high)` bounds of the numbers starting with `prefix`, for a B-tree range scan"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def newest_first(orders, limit, offset):
+    ids = list(orders.order_by('-created_at', '-id').values_list('id', flat=True)[offset:offset + limit])
+    total = len(ids) if offset == 0 and len(ids) < limit else orders.count()
+    return ids, total
+
+
+def search_phone(prefix, limit, offset):
+    low, high = phone_range(prefix)
+    return newest_first(
+        Order.objects.filter(customer_phone_e164__gte=low, customer_phone_e164__lt=high), limit, offset
+    )
+
+
+def phone_digits_condition(digits):
+    """Orders whose E.164 number contains `digits` anywhere"""
+    if connections[Order.objects.db].vendor == 'sqlite':
+        return Q(pk__in=RawSQL(
+            "SELECT rowid FROM store_order_phone_fts WHERE store_order_phone_fts MATCH %s", [f'"{digits}"']
+        ))
+    # On PostgreSQL the LIKE '%...%' this compiles to uses the pg_trgm index.
+    return Q(customer_phone_e164__contains=digits)
+
+
+def text_condition(terms):
+    """Orders matching every term as a substring of their text, through the search index where there is one"""
+    vendor = connections[Order.objects.db].vendor
+    if vendor == 'sqlite' and all(len(term) >= MIN_INDEXED_LENGTH for term in terms):
+        match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        return Q(pk__in=RawSQL("SELECT rowid FROM store_order_fts WHERE store_order_fts MATCH %s", [match]))
+    if vendor == 'postgresql':
+        return Q(pk__in=RawSQL(
+            "SELECT id FROM store_order WHERE " + " AND ".join(f"{ORDER_SEARCH_DOCUMENT} ILIKE %s" for _ in terms),
+            [like_pattern(term) for term in terms]
+        ))
+    condition = Q()
+    for term in terms:
+        condition &= icontains_condition(term)
+    return condition
+
+
+def search_digits(query, prefix, digits, limit, offset):
+    """Orders whose phone number starts with or contains the query's digits, or whose text matches it"""
+    low, high = phone_range(prefix)
+    condition = (
+        Q(customer_phone_e164__gte=low, customer_phone_e164__lt=high)
+        | phone_digits_condition(digits)
+        | text_condition(parse_terms(query))
+    )
+    return newest_first(Order.objects.filter(condition), limit, offset)
+
+
+def search_text(terms, limit, offset):
+    """Ranked order ids matching every term as a substring, and the total"""
+    indexed = [term for term in terms if len(term) >= MIN_INDEXED_LENGTH]
+    short = [term for term in terms if len(term) < MIN_INDEXED_LENGTH]
+
+    connection = connections[Order.objects.db]
+    if connection.vendor == 'sqlite' and indexed:
+        match = ' '.join('"{}"'.format(term.replace('"', '""')) for term in indexed)
+        where = (
+            " FROM store_order_fts CROSS JOIN store_order o ON o.id = store_order_fts.rowid"
+            " WHERE store_order_fts MATCH %s"
+        )
+        params, select_params = [match], []
+        for term in short:
+            where += (
+                " AND (o.customer_name LIKE %s ESCAPE '\\' OR o.customer_email LIKE %s ESCAPE '\\'"
+                " OR o.product_details LIKE %s ESCAPE '\\')"
+            )
+            params += [like_pattern(term)] * 3
+        # bm25() is lower for better matches; weights are (name, email, product details).
+        select = "SELECT o.id, -bm25(store_order_fts, 10.0, 5.0, 1.0) AS score"
+        order = " ORDER BY score DESC, o.id DESC LIMIT %s OFFSET %s"
+    elif connection.vendor == 'postgresql':
+        where = " FROM store_order WHERE " + " AND ".join(
+            f"{ORDER_SEARCH_DOCUMENT} ILIKE %s" for _ in terms
+        )
+        params, select_params = [like_pattern(term) for term in terms], [' '.join(terms)]
+        select = f"SELECT id, word_similarity(%s, {ORDER_SEARCH_DOCUMENT}) AS score"
+        order = " ORDER BY score DESC, id DESC LIMIT %s OFFSET %s"
+    else:
+        return icontains_orders(terms, limit, offset)
+
+    with connection.cursor() as cursor:
+        cursor.execute(select + where + order, select_params + params + [limit, offset])
+        ids = [row[0] for row in cursor.fetchall()]
+        if offset == 0 and len(ids) < limit:
+            total = len(ids)
+        else:
+            cursor.execute("SELECT COUNT(*)" + where, params)
+            total = cursor.fetchone()[0]
+    return ids, total
+
+
+def icontains_condition(term):
+    return (
+        Q(customer_name__icontains=term) |
+        Q(customer_email__icontains=term) |
+        Q(product_details__icontains=term)
+    )
+
+
+def icontains_orders(terms, limit, offset):
+    orders = Order.objects.all()
+    for term in terms:
+        orders = orders.filter(icontains_condition(term))
+    ids = list(orders.order_by('-created_at', '-id').values_list('id', flat=True)[offset:offset + limit])
+    return ids, orders.count()
+
+
+def search_orders(query, limit=50, offset=0):
+    """Return `(orders, total)`: one ranked page of orders matching `query`"""
+    query = query.strip()
+    ids, total = [], 0
+    prefix, digits = phone_search_prefix(query), phone_search_digits(query)
+    if prefix and is_full_phone_number(query):
+        ids, total = search_phone(prefix, limit, offset)
+    elif prefix and digits:
+        ids, total = search_digits(query, prefix, digits, limit, offset)
+    if not total:
+        terms = parse_terms(query)
+        if terms:
+            ids, total = search_text(terms, limit, offset)
+
+    orders = Order.objects.in_bulk(ids)
+    return [orders[pk] for pk in ids if pk in orders], total
@@ -0,0 +1,360 @@
+# store/order_stats.py
+"""
+Incrementally maintained order counts and time-bucketed rollups.
+
+`OrderCounter` holds one row per (scope, status): the scope is 'all' or
+'user:<id>', and the status is an order status or 'total'. `OrderRollup`
+holds hourly and daily buckets (by `created_at`, in the default time zone)
+of order count and revenue per service type and status.
+
+Every write that creates, deletes or changes an order adjusts the matching
+rows of both in the same transaction, so the dashboards read counts with
+one indexed query instead of one COUNT(*) per status, and charts cost
+O(buckets) instead of O(orders).
+
+Writes that bypass `Order.save()` must go through `update_order_status`
+(for status changes, which also drops cached tracking responses) or emit
+post_delete (QuerySet.delete does).
+`reconcile_order_counters` and `reconcile_order_rollups` repair any drift
+from other raw SQL.
+"""
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Order, OrderCounter, OrderRollup
+from .tracking_cache import invalidate_order_tracking
+
+GLOBAL_SCOPE = 'all'
+TOTAL = 'total'
+
+# What the counters and rollups know about one order.
+OrderState = namedtuple('OrderState', 'user_id status service_type created_at total_price')
+STATE_FIELDS = OrderState._fields
+
+ROLLUP_TRUNCATE = {
+    OrderRollup.HOUR: TruncHour,
+    OrderRollup.DAY: TruncDay,
+}
+ROLLUP_STEPS = {
+    OrderRollup.HOUR: timedelta(hours=1),
+    OrderRollup.DAY: timedelta(days=1),
+}
+# Longest range one rollup read may cover, in buckets.
+MAX_ROLLUP_BUCKETS = 2000
+
+
+def order_state(order):
+    return OrderState(
+        order.user_id, order.status, order.service_type, order.created_at,
+        Decimal(str(order.total_price or 0))
+    )
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def counter_keys(state):
+    """The (scope, status) rows one order in `state` counts towards"""
+    scopes = [GLOBAL_SCOPE] if state.user_id is None else [GLOBAL_SCOPE, user_scope(state.user_id)]
+    return [(scope, key) for scope in scopes for key in (TOTAL, state.status)]
+
+
+def bucket_start(moment, granularity):
+    """Start of the hour or day `moment` falls in, in the default time zone"""
+    local = timezone.localtime(moment, timezone.get_default_timezone())
+    if granularity == OrderRollup.DAY:
+        return local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return local.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_keys(state):
+    """The (granularity, bucket_start, service_type, status) rows one order in `state` counts towards"""
+    return [
+        (granularity, bucket_start(state.created_at, granularity), state.service_type, state.status)
+        for granularity in ROLLUP_TRUNCATE
+    ]
+
+
+class StatsDelta:
+    """Counter and rollup changes collected for one transaction"""
+
+    def __init__(self):
+        self.counters = Counter()
+        self.rollups = {}
+
+    def add(self, state, sign):
+        for key in counter_keys(state):
+            self.counters[key] += sign
+        for key in rollup_keys(state):
+            orders, revenue = self.rollups.get(key, (0, Decimal('0')))
+            self.rollups[key] = (orders + sign, revenue + sign * state.total_price)
+
+    def change(self, previous, current):
+        if previous is not None:
+            self.add(previous, -1)
+        if current is not None:
+            self.add(current, 1)
+        return self
+
+    def apply(self):
+        """Write the collected changes; must run inside a transaction"""
+        apply_counter_deltas(self.counters)
+        apply_rollup_deltas(self.rollups)
+
+
+def add_to_rows(model, key_fields, value_fields, rows):
+    """
+    Add `(key..., value...)` rows onto `model`'s rows with those keys, creating missing ones.
+
+    SQLite and PostgreSQL do it in one INSERT ... ON CONFLICT DO UPDATE, which
+    is also safe when two transactions create the same row at once; other
+    backends fall back to an UPDATE (plus get_or_create) per row.
+    """
+    rows = sorted(row for row in rows if any(row[len(key_fields):]))
+    if not rows:
+        return
+    connection = connections[model.objects.db]
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        for row in rows:
+            keys = dict(zip(key_fields, row))
+            changes = {name: F(name) + value for name, value in zip(value_fields, row[len(key_fields):])}
+            if not model.objects.filter(**keys).update(**changes):
+                model.objects.get_or_create(**keys)
+                model.objects.filter(**keys).update(**changes)
+        return
+
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    fields = [model._meta.get_field(name) for name in key_fields + value_fields]
+    placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    sql = (
+        f"INSERT INTO {table} ({', '.join(quote(field.column) for field in fields)})"
+        f" VALUES {', '.join([placeholders] * len(rows))}"
+        f" ON CONFLICT ({', '.join(quote(model._meta.get_field(name).column) for name in key_fields)})"
+        f" DO UPDATE SET " + ', '.join(
+            f"{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}"
+            for column in (model._meta.get_field(name).column for name in value_fields)
+        )
+    )
+    params = [field.get_db_prep_save(value, connection) for row in rows for field, value in zip(fields, row)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def apply_counter_deltas(deltas):
+    """Add `{(scope, status): delta}` to the counters"""
+    add_to_rows(
+        OrderCounter, ('scope', 'status'), ('count',),
+        [(scope, status, delta) for (scope, status), delta in deltas.items()]
+    )
+
+
+def apply_rollup_deltas(deltas):
+    """Add `{(granularity, bucket_start, service_type, status): (orders, revenue)}` to the rollups"""
+    add_to_rows(
+        OrderRollup, ('granularity', 'bucket_start', 'service_type', 'status'), ('orders', 'revenue'),
+        [key + value for key, value in deltas.items()]
+    )
+
+
+def previous_order_state(order):
+    """
+    State the counters currently hold for `order`, or None for a new order.
+
+    Read from the row itself, locked until the caller's transaction ends, and
+    not from the instance: a copy loaded before another writer's save would
+    otherwise move the same counts a second time.
+    """
+    if order._state.adding:
+        return None
+    row = Order.objects.filter(pk=order.pk).select_for_update().values_list(*STATE_FIELDS).first()
+    return OrderState(*row) if row is not None else None
+
+
+def saved_order_state(order, previous, update_fields=None):
+    """State of `order`'s row after a save that wrote `update_fields` (None for every field)"""
+    current = order_state(order)
+    if previous is None or update_fields is None:
+        return current
+    written = {Order._meta.get_field(name).attname for name in update_fields}
+    return previous._replace(**{field: getattr(current, field) for field in STATE_FIELDS if field in written})
+
+
+def record_order_change(previous, current):
+    StatsDelta().change(previous, current).apply()
+
+
+def record_order_deleted(state):
+    with transaction.atomic():
+        StatsDelta().change(state, None).apply()
+
+
+def update_order_status(queryset, status, **fields):
+    """`queryset.update(status=status, **fields)` that keeps the counters, rollups and tracking cache in step"""
+    with transaction.atomic():
+        rows = list(queryset.exclude(status=status).select_for_update().values_list('id', *STATE_FIELDS))
+        updated = queryset.update(status=status, **fields)
+        delta = StatsDelta()
+        for _, *state in rows:
+            state = OrderState(*state)
+            delta.change(state, state._replace(status=status))
+        delta.apply()
+        invalidate_order_tracking([row[0] for row in rows])
+    return updated
+
+
+# ============ COUNTERS ============
+
+def read_counts(scope=GLOBAL_SCOPE):
+    """`{status: count, 'total': count}` for one scope, from a single indexed read"""
+    counts = {status: 0 for status, _ in Order.STATUS_CHOICES}
+    counts[TOTAL] = 0
+    counts.update(OrderCounter.objects.filter(scope=scope).values_list('status', 'count'))
+    return counts
+
+
+def expected_counts():
+    """Counters recomputed from the orders table"""
+    expected = Counter()
+    for user_id, status, count in (
+        Order.objects.order_by().values_list('user_id', 'status').annotate(count=Count('pk'))
+    ):
+        for key in counter_keys(OrderState(user_id, status, None, None, None)):
+            expected[key] += count
+    return expected
+
+
+def reconcile_order_counters(dry_run=False):
+    """Make the counters match the orders table; returns `{(scope, status): (stored, expected)}` for rows that drifted"""
+    with transaction.atomic():
+        stored = {
+            (scope, status): count
+            for scope, status, count in OrderCounter.objects.select_for_update().values_list('scope', 'status', 'count')
+        }
+        expected = expected_counts()
+        drift = {
+            key: (stored.get(key, 0), expected.get(key, 0))
+            for key in set(stored) | set(expected)
+            if stored.get(key, 0) != expected.get(key, 0)
+        }
+        if not dry_run:
+            apply_counter_deltas(Counter({key: want - have for key, (have, want) in drift.items()}))
+    return drift
+
+
+# ============ ROLLUPS ============
+
+def expected_rollups(since=None):
+    """Rollup rows recomputed from the orders table, for buckets starting at or after `since`"""
+    tz = timezone.get_default_timezone()
+    expected = {}
+    for granularity, truncate in ROLLUP_TRUNCATE.items():
+        orders = Order.objects.order_by()
+        if since is not None:
+            orders = orders.filter(created_at__gte=bucket_start(since, granularity))
+        rows = (
+            orders.values_list(truncate('created_at', tzinfo=tz), 'service_type', 'status')
+            .annotate(count=Count('pk'), revenue=Sum('total_price'))
+        )
+        for start, service_type, status, count, revenue in rows:
+            expected[granularity, start, service_type, status] = (count, revenue or Decimal('0'))
+    return expected
+
+
+def reconcile_order_rollups(since=None, dry_run=False):
+    """
+    Make the rollups match the orders table, from `since` (or all time) on.
+
+    Returns `{(granularity, bucket_start, service_type, status): (stored, expected)}`
+    for the rows that drifted, each side an `(orders, revenue)` pair.
+    """
+    with transaction.atomic():
+        rows = OrderRollup.objects.select_for_update()
+        stored = {}
+        for granularity in ROLLUP_TRUNCATE:
+            granular = rows.filter(granularity=granularity)
+            if since is not None:
+                granular = granular.filter(bucket_start__gte=bucket_start(since, granularity))
+            for start, service_type, status, orders, revenue in granular.values_list(
+                'bucket_start', 'service_type', 'status', 'orders', 'revenue'
+            ):
+                stored[granularity, start, service_type, status] = (orders, revenue)
+        expected = expected_rollups(since)
+
+        empty = (0, Decimal('0'))
+        drift = {
+            key: (stored.get(key, empty), expected.get(key, empty))
+            for key in set(stored) | set(expected)
+            if stored.get(key, empty) != expected.get(key, empty)
+        }
+        if not dry_run:
+            apply_rollup_deltas({
+                key: (want[0] - have[0], want[1] - have[1]) for key, (have, want) in drift.items()
+            })
+    return drift
+
+
+def parse_moment(value):
+    """An ISO date or datetime from a query string, made aware in the default time zone; None if invalid"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        moment = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.get_default_timezone())
+    return moment
+
+
+def read_rollups(granularity, start, end, service_type=None, status=None):
+    """
+    Buckets from the one containing `start` to the one containing `end`.
+
+    Every bucket in the range is returned, empty ones included, with its
+    totals and a breakdown by service type and by status.
+    """
+    first, last = bucket_start(start, granularity), bucket_start(end, granularity)
+    rows = OrderRollup.objects.filter(granularity=granularity, bucket_start__gte=first, bucket_start__lte=last)
+    if service_type:
+        rows = rows.filter(service_type=service_type)
+    if status:
+        rows = rows.filter(status=status)
+
+    buckets = {}
+    moment, step = first, ROLLUP_STEPS[granularity]
+    while moment <= last:
+        buckets[moment] = {
+            'start': moment, 'orders': 0, 'revenue': Decimal('0'), 'by_service_type': {}, 'by_status': {},
+        }
+        # Step in the default time zone so days stay aligned to local midnight.
+        moment = bucket_start(moment + step, granularity)
+
+    for start_at, row_service, row_status, orders, revenue in rows.values_list(
+        'bucket_start', 'service_type', 'status', 'orders', 'revenue'
+    ):
+        bucket = buckets.get(bucket_start(start_at, granularity))
+        if bucket is None or not orders:
+            continue
+        bucket['orders'] += orders
+        bucket['revenue'] += revenue
+        for breakdown, key in (('by_service_type', row_service), ('by_status', row_status)):
+            entry = bucket[breakdown].setdefault(key, {'orders': 0, 'revenue': Decimal('0')})
+            entry['orders'] += orders
+            entry['revenue'] += revenue
+    return list(buckets.values())
+
+
+def orders_since(moment):
+    """Orders created from the start of the hour containing `moment`, read from the hourly rollups"""
+    return OrderRollup.objects.filter(
+        granularity=OrderRollup.HOUR, bucket_start__gte=bucket_start(moment, OrderRollup.HOUR)
+    ).aggregate(total=Sum('orders'))['total'] or 0
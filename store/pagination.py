@@ -0,0 +1,158 @@
+# store/pagination.py
+import base64
+import datetime
+import json
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+def cursor_value(value):
+    """
+    A JSON-safe copy of a key value that loses no precision.
+
+    Datetimes keep their microseconds (DjangoJSONEncoder cuts them to
+    milliseconds, and the keyset filter would then skip rows in the same
+    millisecond as the page boundary); decimals are kept as strings.
+    """
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset (cursor) pagination over `(key, id)`.
+
+    Pagination only kicks in when the request carries `limit` or `cursor`;
+    otherwise `paginate_queryset` returns None and the view keeps returning
+    the full list. Each page is a single indexed range scan, so response time
+    does not grow with the page number or the table size.
+
+    Query parameters:
+    - `limit`: page size (capped at `max_limit`)
+    - `sort`: one of the keys in `orderings`
+    - `cursor`: opaque token taken from the previous page's `next`
+    - `estimate`: when truthy, include an `estimated_total` instead of an exact count
+    """
+    orderings = {
+        'created': ('-created_at', '-id'),
+    }
+    default_ordering = 'created'
+    default_limit = 50
+    max_limit = 200
+    estimate_cap = 10000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if 'cursor' not in params and 'limit' not in params:
+            return None
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.sort = params.get('sort', self.default_ordering)
+        if self.sort not in self.orderings:
+            self.sort = self.default_ordering
+        ordering = self.orderings[self.sort]
+
+        self.estimated_total = None
+        if params.get('estimate', '').lower() in ('1', 'true', 'yes'):
+            self.estimated_total = self.estimate_count(queryset)
+
+        queryset = queryset.order_by(*ordering)
+        cursor = params.get('cursor')
+        if cursor:
+            queryset = queryset.filter(self.get_keyset_filter(queryset.model, ordering, cursor))
+
+        rows = list(queryset[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+        self.next_cursor = self.encode_cursor(rows[-1], ordering) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        payload = {
+            'results': data,
+            'next': self.next_cursor,
+        }
+        if self.estimated_total is not None:
+            payload['estimated_total'] = self.estimated_total
+        return Response(payload)
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except (TypeError, ValueError):
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def encode_cursor(self, row, ordering):
+        values = [cursor_value(getattr(row, field.lstrip('-'))) for field in ordering]
+        raw = json.dumps([self.sort] + values)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, model, ordering, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            sort, *values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if sort != self.sort or len(values) != len(ordering):
+                raise ValueError(cursor)
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_keyset_filter(self, model, ordering, cursor):
+        """Build `(a, b) > (x, y)` as `a > x OR (a = x AND b > y)`"""
+        values = self.decode_cursor(model, ordering, cursor)
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def estimate_count(self, queryset):
+        """Planner estimate on PostgreSQL, a capped count everywhere else"""
+        queryset = queryset.order_by()
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows'])
+        return queryset[:self.estimate_cap].count()
+
+
+class ProductKeysetPagination(KeysetPagination):
+    orderings = {
+        'created': ('-created_at', '-id'),
+        'price': ('price', 'id'),
+    }
+
+
+class BundleKeysetPagination(KeysetPagination):
+    orderings = {
+        'created': ('-created_at', '-id'),
+        'price': ('total_price', 'id'),
+    }
+
+
+class OrderKeysetPagination(KeysetPagination):
+    orderings = {
+        'created': ('-created_at', '-id'),
+    }
@@ -0,0 +1,79 @@
+# store/phone.py
+"""
+Phone numbers in E.164 form.
+
+Customers type their numbers as "0712 345 678", "+255 712 345 678",
+"255712345678" or "00255712345678". Orders keep what was typed and also an
+E.164 copy ("+255712345678") that is indexed, so support staff find an
+order whichever way either side wrote the number. Numbers without a
+country code are taken to be Tanzanian.
+
+This module has no Django imports so migrations can use it.
+"""
+import re
+
+DEFAULT_COUNTRY_CODE = '255'
+# A national significant number in Tanzania has nine digits.
+NATIONAL_NUMBER_LENGTH = 9
+MIN_E164_DIGITS = 8
+MAX_E164_DIGITS = 15
+PHONE_CHARACTERS = re.compile(r'^[\d\s+().\-/]+$')
+
+
+def e164_digits(value, country_code=DEFAULT_COUNTRY_CODE):
+    """The digits of `value` with the country code in front, however it was written"""
+    value = value.strip()
+    digits = re.sub(r'\D', '', value)
+    if value.startswith('+'):
+        return digits
+    if digits.startswith('00'):
+        return digits[2:]
+    if digits.startswith('0'):
+        return country_code + digits[1:]
+    if digits.startswith(country_code) and len(digits) > NATIONAL_NUMBER_LENGTH:
+        return digits
+    return country_code + digits
+
+
+def normalize_phone(value, country_code=DEFAULT_COUNTRY_CODE):
+    """`value` as E.164 ("+255712345678"), or '' when it is not a plausible number"""
+    if not value or not PHONE_CHARACTERS.match(value):
+        return ''
+    digits = e164_digits(value, country_code)
+    if not MIN_E164_DIGITS <= len(digits) <= MAX_E164_DIGITS:
+        return ''
+    return '+' + digits
+
+
+def phone_search_prefix(query, min_digits=4, country_code=DEFAULT_COUNTRY_CODE):
+    """
+    E.164 prefix for a search box query that looks like the start of a
+    phone number, or None.
+
+    "0712 34" gives "+25571234", so it matches however the order's number
+    was typed.
+    """
+    if not query or not PHONE_CHARACTERS.match(query):
+        return None
+    if len(re.sub(r'\D', '', query)) < min_digits:
+        return None
+    return '+' + e164_digits(query, country_code)[:MAX_E164_DIGITS]
+
+
+def phone_search_digits(query, min_digits=4):
+    """
+    The digits of a search box query that looks like part of a phone
+    number, or None.
+
+    "345 678" gives "345678", to be matched anywhere in the E.164 number.
+    """
+    if not query or not PHONE_CHARACTERS.match(query):
+        return None
+    digits = re.sub(r'\D', '', query)
+    return digits if len(digits) >= min_digits else None
+
+
+def is_full_phone_number(query, country_code=DEFAULT_COUNTRY_CODE):
+    """True when `query` is a whole phone number rather than a run of digits from one"""
+    digits = re.sub(r'\D', '', query or '')
+    return bool(normalize_phone(query, country_code)) and len(digits) >= NATIONAL_NUMBER_LENGTH
@@ -0,0 +1,212 @@
+# store/search.py
+"""
+Full-text search across electronics, routers, data plans and bundles.
+
+Every product has one `SearchEntry` row holding its searchable text. The
+full-text index over those rows is created by migration 0017 for the
+database in use:
+
+- SQLite: an FTS5 table kept in step with `store_searchentry` by triggers,
+  ranked with bm25() (title matches weigh more than body matches)
+- PostgreSQL: a generated `tsvector` column with a GIN index, ranked with
+  ts_rank() over title (weight A) and body (weight B)
+
+Other backends fall back to `icontains`, unranked. Entries are written by
+the signal handlers in store/signals.py; `rebuild_search_index` recreates
+them all after bulk writes that bypass signals.
+"""
+import re
+
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .models import SearchEntry, ElectronicsDevices, RouterProduct, DataPlan, Bundle
+from .serializers import (
+    ElectronicsDevicesSerializer, RouterProductSerializer, DataPlanSerializer, BundleSerializer
+)
+from .fast_serializers import fast_serialize
+
+MAX_TERMS = 8
+REBUILD_BATCH_SIZE = 1000
+
+
+def join_text(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def electronics_document(device):
+    body = join_text(device.get_category_display(), device.description, device.specifications)
+    return device.name, body, device.price, device.is_available
+
+
+def router_document(router):
+    return router.name, join_text(router.description, router.specifications), router.price, router.is_available
+
+
+def data_plan_document(plan):
+    body = join_text(
+        plan.provider.name, plan.data_volume, plan.get_data_type_display(),
+        plan.get_network_type_display(), plan.description
+    )
+    return plan.name, body, plan.price, plan.is_active
+
+
+def bundle_document(bundle):
+    features = bundle.features if isinstance(bundle.features, list) else []
+    body = join_text(
+        bundle.provider.name, bundle.get_bundle_type_display(), bundle.total_data_volume,
+        bundle.description, *features
+    )
+    return bundle.name, body, bundle.total_price, bundle.is_active
+
+
+# kind -> (model, serializer for hits, document builder, select_related for rebuilds)
+SEARCH_SOURCES = {
+    'electronics': (ElectronicsDevices, ElectronicsDevicesSerializer, electronics_document, ()),
+    'router': (RouterProduct, RouterProductSerializer, router_document, ()),
+    'data_plan': (DataPlan, DataPlanSerializer, data_plan_document, ('provider',)),
+    'bundle': (Bundle, BundleSerializer, bundle_document, ('provider',)),
+}
+SEARCH_KINDS = tuple(SEARCH_SOURCES)
+MODEL_KINDS = {source[0]: kind for kind, source in SEARCH_SOURCES.items()}
+
+
+# ============ INDEXING ============
+
+def build_entry(kind, instance):
+    title, body, price, is_visible = SEARCH_SOURCES[kind][2](instance)
+    return SearchEntry(kind=kind, object_id=instance.pk, title=title, body=body, price=price, is_visible=is_visible)
+
+
+def index_object(instance):
+    """Create or refresh the search entry for one product"""
+    kind = MODEL_KINDS[type(instance)]
+    entry = build_entry(kind, instance)
+    SearchEntry.objects.update_or_create(
+        kind=kind, object_id=instance.pk,
+        defaults={'title': entry.title, 'body': entry.body, 'price': entry.price, 'is_visible': entry.is_visible}
+    )
+
+
+def remove_object(instance):
+    SearchEntry.objects.filter(kind=MODEL_KINDS[type(instance)], object_id=instance.pk).delete()
+
+
+def reindex_provider(provider):
+    """Refresh plan and bundle entries, whose text includes the provider name"""
+    for plan in provider.data_plans.select_related('provider'):
+        index_object(plan)
+    for bundle in provider.bundles.select_related('provider'):
+        index_object(bundle)
+
+
+def rebuild_search_index():
+    """Recreate every search entry from the catalog tables; returns the entry count"""
+    count = 0
+    with transaction.atomic():
+        SearchEntry.objects.all().delete()
+        for kind, (model, _, _, select_related) in SEARCH_SOURCES.items():
+            batch = []
+            for instance in model.objects.select_related(*select_related).iterator(chunk_size=REBUILD_BATCH_SIZE):
+                batch.append(build_entry(kind, instance))
+                if len(batch) >= REBUILD_BATCH_SIZE:
+                    SearchEntry.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            SearchEntry.objects.bulk_create(batch)
+            count += len(batch)
+    return count
+
+
+# ============ QUERYING ============
+
+def parse_terms(query):
+    """Split a user query into plain word tokens, so no query syntax reaches the index"""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def kinds_clause(kinds, column):
+    if not kinds:
+        return '', []
+    return f" AND {column} IN ({', '.join(['%s'] * len(kinds))})", list(kinds)
+
+
+def search_entries(query, kinds=None, limit=20, offset=0):
+    """
+    Return `([(kind, object_id, score), ...], total)` for visible products.
+
+    Every term must match, as a prefix, so partial words typed into a search
+    box still hit. Higher scores rank first.
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return [], 0
+
+    connection = connections[SearchEntry.objects.db]
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        kind_sql, kind_params = kinds_clause(kinds, 'e.kind')
+        # CROSS JOIN pins the FTS table as the outer loop, so the MATCH runs
+        # once instead of once per entry row.
+        where = (
+            " FROM store_searchentry_fts CROSS JOIN store_searchentry e ON e.id = store_searchentry_fts.rowid"
+            " WHERE store_searchentry_fts MATCH %s AND e.is_visible" + kind_sql
+        )
+        params = [match] + kind_params
+        # bm25() is lower for better matches; column weights are (title, body).
+        select = "SELECT e.kind, e.object_id, -bm25(store_searchentry_fts, 10.0, 1.0) AS score"
+        order = " ORDER BY score DESC, e.id LIMIT %s OFFSET %s"
+    elif connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        kind_sql, kind_params = kinds_clause(kinds, 'kind')
+        where = (
+            " FROM store_searchentry, to_tsquery('simple', %s) query"
+            " WHERE search_vector @@ query AND is_visible" + kind_sql
+        )
+        params = [tsquery] + kind_params
+        select = "SELECT kind, object_id, ts_rank(search_vector, query) AS score"
+        order = " ORDER BY score DESC, id LIMIT %s OFFSET %s"
+    else:
+        return icontains_entries(terms, kinds, limit, offset)
+
+    with connection.cursor() as cursor:
+        cursor.execute(select + where + order, params + [limit, offset])
+        hits = [(kind, object_id, float(score)) for kind, object_id, score in cursor.fetchall()]
+        if offset == 0 and len(hits) < limit:
+            total = len(hits)
+        else:
+            cursor.execute("SELECT COUNT(*)" + where, params)
+            total = cursor.fetchone()[0]
+    return hits, total
+
+
+def icontains_entries(terms, kinds, limit, offset):
+    entries = SearchEntry.objects.filter(is_visible=True)
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    for term in terms:
+        entries = entries.filter(Q(title__icontains=term) | Q(body__icontains=term))
+    rows = entries.order_by('id').values_list('kind', 'object_id')[offset:offset + limit]
+    hits = [(kind, object_id, 0.0) for kind, object_id in rows]
+    return hits, entries.count()
+
+
+def search_catalog(query, kinds=None, limit=20, offset=0):
+    """Ranked hits with each product serialized as its list endpoint would"""
+    hits, total = search_entries(query, kinds, limit, offset)
+
+    ids_by_kind = {}
+    for kind, object_id, _ in hits:
+        ids_by_kind.setdefault(kind, []).append(object_id)
+    items = {}
+    for kind, ids in ids_by_kind.items():
+        model, serializer_class, _, _ = SEARCH_SOURCES[kind]
+        for data in fast_serialize(serializer_class, model.objects.filter(pk__in=ids)):
+            items[kind, data['id']] = data
+
+    results = [
+        {'type': kind, 'id': object_id, 'score': round(score, 4), 'item': items[kind, object_id]}
+        for kind, object_id, score in hits
+        if (kind, object_id) in items
+    ]
+    return results, total
@@ -1,11 +1,59 @@
 # store/serializers.py
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import (
     DataPlan, Bundle, ElectronicsDevices, Order, 
-    ServiceProvider, RouterProduct, OrderTracking
+    ServiceProvider, RouterProduct, OrderTracking, OrderItem
 )
+from .fast_serializers import known_fields
+from .order_ingest import MAX_CART_LINES, MAX_LINE_QUANTITY, MAX_ORDER_TOTAL, price_cart
 
-class DataPlanSerializer(serializers.ModelSerializer):
+class SparseFieldsetMixin:
+    """
+    Trim read output with `?fields=a,b` or `?view=summary`.
+
+    `Meta.summary_fields` lists the fields sent in summary mode and
+    `Meta.deferrable_fields` names the heavy columns that are left unread
+    by `narrow_queryset` when the request does not ask for them.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            fields = self.get_requested_fields(self.context.get('request'))
+        if fields is not None:
+            for name in list(self.fields):
+                if name not in fields:
+                    self.fields.pop(name)
+
+    @classmethod
+    def get_requested_fields(cls, request):
+        """
+        Return the requested field names, or None for the full representation.
+
+        Names the serializer does not declare are dropped, so the result is
+        always a subset of its fields and safe to use as a cache key.
+        """
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        params = getattr(request, 'query_params', request.GET)
+        fields = params.get('fields')
+        if fields:
+            return known_fields(cls, (name.strip() for name in fields.split(',')))
+        if params.get('view') == 'summary':
+            return known_fields(cls, cls.Meta.summary_fields)
+        return None
+
+    @classmethod
+    def narrow_queryset(cls, queryset, request):
+        """Defer the heavy columns the requested fieldset does not need"""
+        fields = cls.get_requested_fields(request)
+        if fields is None:
+            return queryset
+        deferred = [name for name in getattr(cls.Meta, 'deferrable_fields', ()) if name not in fields]
+        return queryset.defer(*deferred) if deferred else queryset
+
+class DataPlanSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     provider_name = serializers.CharField(source='provider.name', read_only=True)
     data_type_display = serializers.CharField(source='get_data_type_display', read_only=True)
     network_type_display = serializers.CharField(source='get_network_type_display', read_only=True)
@@ -15,11 +63,17 @@ class DataPlanSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'provider', 'provider_name', 'data_volume', 'validity_days',
             'price', 'data_type', 'data_type_display', 'network_type', 'network_type_display',
-            'description', 'is_active', 'created_at'
+            'description', 'is_active', 'data_volume_mb', 'price_per_gb', 'created_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+        summary_fields = [
+            'id', 'name', 'provider', 'provider_name', 'data_volume', 'validity_days',
+            'price', 'data_type', 'data_type_display', 'network_type', 'network_type_display',
+            'is_active', 'data_volume_mb', 'price_per_gb'
+        ]
+        deferrable_fields = ['description']
 
-class BundleSerializer(serializers.ModelSerializer):
+class BundleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     provider_name = serializers.CharField(source='provider.name', read_only=True)
     bundle_type_display = serializers.CharField(source='get_bundle_type_display', read_only=True)
     actual_price = serializers.DecimalField(source='get_actual_price', read_only=True, max_digits=10, decimal_places=2)
@@ -31,11 +85,18 @@ class BundleSerializer(serializers.ModelSerializer):
             'id', 'name', 'provider', 'provider_name', 'bundle_type', 'bundle_type_display',
             'data_plans', 'data_plans_details', 'total_data_volume', 'total_price',
             'actual_price', 'discount_percentage', 'description', 'features',
-            'is_active', 'is_featured', 'created_at'
+            'is_active', 'is_featured', 'data_volume_mb', 'price_per_gb', 'created_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+        summary_fields = [
+            'id', 'name', 'provider', 'provider_name', 'bundle_type', 'bundle_type_display',
+            'total_data_volume', 'total_price', 'actual_price', 'discount_percentage',
+            'is_active', 'is_featured', 'data_volume_mb', 'price_per_gb'
+        ]
+        deferrable_fields = ['description', 'features']
+        method_sources = {'get_actual_price': ['total_price', 'discount_percentage']}
 
-class ElectronicsDevicesSerializer(serializers.ModelSerializer):
+class ElectronicsDevicesSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category_display = serializers.CharField(source='get_category_display', read_only=True)
     
     class Meta:
@@ -46,6 +107,11 @@ class ElectronicsDevicesSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+        summary_fields = [
+            'id', 'name', 'price', 'category', 'category_display', 'is_available',
+            'image', 'stock_quantity'
+        ]
+        deferrable_fields = ['description', 'specifications']
 
 class OrderSerializer(serializers.ModelSerializer):
     service_type_display = serializers.CharField(source='get_service_type_display', read_only=True)
@@ -53,7 +119,8 @@ class OrderSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Order
-        fields = '__all__'
+        # The normalized phone is an internal search key
+        exclude = ['customer_phone_e164']
 
 class OrderCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -69,17 +136,56 @@ class OrderUpdateSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['status', 'admin_notes', 'tracking_number']
 
-class ServiceProviderSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = [
+            'id', 'service_type', 'data_plan', 'bundle', 'router_product', 'electronics_device',
+            'product_name', 'unit_price', 'quantity', 'line_total'
+        ]
+
+class CheckoutItemSerializer(serializers.Serializer):
+    service_type = serializers.ChoiceField(choices=Order.SERVICE_TYPES)
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, max_value=MAX_LINE_QUANTITY, default=1)
+
+class CheckoutSerializer(serializers.Serializer):
+    """A whole cart; `items` validates to priced, unsaved `OrderItem`s"""
+    customer_name = serializers.CharField(max_length=255)
+    customer_email = serializers.EmailField()
+    customer_phone = serializers.CharField(max_length=20)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    items = CheckoutItemSerializer(many=True, allow_empty=False, max_length=MAX_CART_LINES)
+
+    def validate_items(self, items):
+        lines, missing = price_cart(
+            (item['service_type'], item['product_id'], item['quantity']) for item in items
+        )
+        if missing:
+            raise serializers.ValidationError(
+                [f'{service_type} {product_id} is not available' for service_type, product_id in missing]
+            )
+        if sum(line.line_total for line in lines) > MAX_ORDER_TOTAL:
+            raise serializers.ValidationError('Order total is too large')
+        return lines
+
+class ServiceProviderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = ServiceProvider
         fields = '__all__'
+        summary_fields = ['id', 'name', 'is_active']
+        deferrable_fields = ['description']
 
-class RouterProductSerializer(serializers.ModelSerializer):
+class RouterProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = RouterProduct
         fields = '__all__'
+        summary_fields = ['id', 'name', 'price', 'is_available', 'image']
+        deferrable_fields = ['description', 'specifications']
 
 class OrderTrackingSerializer(serializers.ModelSerializer):
+    status_updates = serializers.ReadOnlyField()
+    
     class Meta:
         model = OrderTracking
         fields = '__all__'
\ No newline at end of file
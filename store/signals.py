@@ -0,0 +1,102 @@
+# store/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.utils import timezone
+
+from .models import ServiceProvider, DataPlan, Bundle, RouterProduct, ElectronicsDevices, Order, OrderTracking, OrderTrackingEvent
+from .catalog_cache import invalidate_catalog_snapshot
+from .search import MODEL_KINDS, index_object, remove_object, reindex_provider
+from .order_stats import order_state, record_order_deleted
+from .tracking_cache import invalidate_order_tracking, invalidate_tracking
+
+CATALOG_MODELS = (ServiceProvider, DataPlan, Bundle, RouterProduct, ElectronicsDevices)
+
+# ============ CATALOG INVALIDATION ============
+
+def catalog_changed(sender, **kwargs):
+    """Mark the catalog snapshot stale once the surrounding transaction commits"""
+    action = kwargs.get('action')
+    if action is not None and not action.startswith('post_'):
+        return
+    transaction.on_commit(invalidate_catalog_snapshot)
+
+for model in CATALOG_MODELS:
+    post_save.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_save_{model.__name__}')
+    post_delete.connect(catalog_changed, sender=model, dispatch_uid=f'catalog_delete_{model.__name__}')
+
+m2m_changed.connect(catalog_changed, sender=Bundle.data_plans.through, dispatch_uid='catalog_bundle_data_plans')
+
+def touch_bundles(sender, instance, action, reverse, pk_set, **kwargs):
+    """Bump `Bundle.updated_at` when its data plans change so list validators move"""
+    if reverse and action == 'pre_clear':
+        # `plan.bundles.clear()` sends no pk_set; note the bundles before they are unlinked
+        instance._cleared_bundle_ids = list(instance.bundles.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        Bundle.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_bundle_ids', None)
+    if pk_set:
+        Bundle.objects.filter(pk__in=pk_set).update(updated_at=timezone.now())
+
+def touch_plan_bundles(sender, instance, **kwargs):
+    """Deleting a plan drops it from its bundles without an m2m_changed signal"""
+    Bundle.objects.filter(data_plans=instance).update(updated_at=timezone.now())
+
+m2m_changed.connect(touch_bundles, sender=Bundle.data_plans.through, dispatch_uid='touch_bundle_data_plans')
+pre_delete.connect(touch_plan_bundles, sender=DataPlan, dispatch_uid='touch_deleted_plan_bundles')
+
+
+# ============ SEARCH INDEX ============
+
+def product_saved(sender, instance, raw=False, **kwargs):
+    """Keep the product's search entry in step with the row"""
+    if not raw:
+        index_object(instance)
+
+def product_deleted(sender, instance, **kwargs):
+    remove_object(instance)
+
+def provider_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        reindex_provider(instance)
+
+for model in MODEL_KINDS:
+    post_save.connect(product_saved, sender=model, dispatch_uid=f'search_save_{model.__name__}')
+    post_delete.connect(product_deleted, sender=model, dispatch_uid=f'search_delete_{model.__name__}')
+
+post_save.connect(provider_saved, sender=ServiceProvider, dispatch_uid='search_save_ServiceProvider')
+
+# ============ ORDER COUNTERS AND ROLLUPS ============
+
+def order_deleted(sender, instance, **kwargs):
+    """Saves update the counters in Order.save(); deletes (including QuerySet.delete) land here"""
+    record_order_deleted(instance._counted_state or order_state(instance))
+
+post_delete.connect(order_deleted, sender=Order, dispatch_uid='order_counters_delete')
+
+# ============ TRACKING CACHE ============
+
+def tracking_changed(sender, instance, **kwargs):
+    invalidate_tracking(instance.tracking_number)
+
+def tracking_event_added(sender, instance, created, **kwargs):
+    invalidate_tracking(instance.tracking.tracking_number)
+
+def order_tracking_changed(sender, instance, created, **kwargs):
+    """The tracking response shows the order's status and details"""
+    if created:
+        return  # nothing can be cached for an order that did not exist
+    tracking = instance._state.fields_cache.get('tracking')
+    if tracking is not None:
+        invalidate_tracking(tracking.tracking_number)
+    else:
+        invalidate_order_tracking([instance.pk])
+
+post_save.connect(tracking_changed, sender=OrderTracking, dispatch_uid='tracking_cache_save')
+post_delete.connect(tracking_changed, sender=OrderTracking, dispatch_uid='tracking_cache_delete')
+post_save.connect(order_tracking_changed, sender=Order, dispatch_uid='tracking_cache_order_save')
+post_save.connect(tracking_event_added, sender=OrderTrackingEvent, dispatch_uid='tracking_cache_event_save')
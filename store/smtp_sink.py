@@ -0,0 +1,140 @@
+# store/smtp_sink.py
+"""
+A throwaway SMTP server on localhost that accepts and keeps every message.
+
+It stands in for the real mail server in tests and in
+bench_notification_worker, so the SMTP code paths (connect, EHLO, MAIL,
+RCPT, DATA, QUIT) run for real without sending anything. `latency` delays
+each accepted message, like a remote server acknowledging DATA;
+`connect_latency` delays the greeting, like the TCP and TLS handshakes
+with a remote server; and `reject` is a predicate on the recipient address
+that makes the server refuse it with 550.
+"""
+import socketserver
+import threading
+import time
+
+SINK_HOST = '127.0.0.1'
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        sink = self.server.sink
+        sink.connected()
+        if sink.connect_latency:
+            time.sleep(sink.connect_latency)
+        self.reply('220 smtp-sink ready')
+        mail_from, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode('latin-1').rstrip('\r\n').partition(' ')
+            command = command.upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 smtp-sink')
+            elif command == 'MAIL':
+                mail_from, recipients = address(argument), []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipient = address(argument)
+                if sink.reject and sink.reject(recipient):
+                    self.reply('550 Mailbox unavailable')
+                else:
+                    recipients.append(recipient)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                if not recipients:
+                    self.reply('503 No valid recipients')
+                    continue
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                sink.received(mail_from, recipients, self.read_data())
+                mail_from, recipients = None, []
+                self.reply('250 OK')
+            elif command in ('RSET', 'NOOP'):
+                if command == 'RSET':
+                    mail_from, recipients = None, []
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+    def read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line == b'.\r\n':
+                return b''.join(lines)
+            # Undo dot-stuffing
+            lines.append(line[1:] if line.startswith(b'..') else line)
+
+
+def address(argument):
+    """The address from `FROM:<a@b>` / `TO:<a@b>`"""
+    _, _, value = argument.partition(':')
+    return value.strip().split(' ')[0].strip('<>')
+
+
+class SMTPSinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Run with `with SMTPSink() as sink:`; point Django at it with `override_settings(**sink.settings())`"""
+
+    def __init__(self, latency=0.0, connect_latency=0.0, reject=None, host=SINK_HOST, port=0):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.reject = reject
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = SMTPSinkServer((host, port), SMTPSinkHandler)
+        self.server.sink = self
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def settings(self):
+        return {
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': self.server.server_address[0],
+            'EMAIL_PORT': self.port,
+            'EMAIL_HOST_USER': '',
+            'EMAIL_HOST_PASSWORD': '',
+            'EMAIL_USE_TLS': False,
+            'EMAIL_USE_SSL': False,
+        }
+
+    def connected(self):
+        with self.lock:
+            self.connections += 1
+
+    def received(self, mail_from, recipients, data):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.messages.append((mail_from, recipients, data))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,103 @@
+# store/streaming.py
+"""
+Streaming response mode for large lists.
+
+Rows are read through a server-side cursor (`QuerySet.iterator(chunk_size=...)`),
+serialized a chunk at a time and written out as they are produced, either
+as NDJSON (one JSON value per line) or as a JSON document whose arrays are
+emitted incrementally. Peak memory per request stays around one chunk and
+the first bytes go out before the last rows are read.
+
+Clients opt in with `?stream=ndjson`, `?stream=json` or
+`Accept: application/x-ndjson`.
+"""
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+STREAM_CHUNK_SIZE = 500
+STREAM_BUFFER_SIZE = 64 * 1024
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+class NDJSONRenderer(JSONRenderer):
+    """Lets `Accept: application/x-ndjson` pass content negotiation on streaming views"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+STREAM_RENDERER_CLASSES = list(api_settings.DEFAULT_RENDERER_CLASSES) + [NDJSONRenderer]
+
+
+def get_stream_format(request):
+    """Return 'ndjson', 'json' or None if the request did not ask to stream"""
+    requested = request.GET.get('stream')
+    if requested in CONTENT_TYPES:
+        return requested
+    if 'application/x-ndjson' in request.META.get('HTTP_ACCEPT', ''):
+        return 'ndjson'
+    return None
+
+
+def iter_serialized(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield `serializer_class` representations of a queryset, one chunk in memory at a time"""
+    objects = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(objects, chunk_size))
+        if not chunk:
+            return
+        yield from serializer_class(chunk, many=True).data
+
+
+def buffered(pieces, size=STREAM_BUFFER_SIZE):
+    """Coalesce many small byte strings into writes of roughly `size` bytes"""
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def render_sections(sections, stream_format, trailer=None):
+    """
+    Render `(name, rows)` pairs.
+
+    JSON output is the document `{name: [rows...], ...}` followed by any
+    `trailer()` keys, which may depend on the rows already streamed; NDJSON
+    output is one `{"section": name, "data": row}` line per row.
+    """
+    render = JSONRenderer().render
+    if stream_format == 'ndjson':
+        for name, rows in sections:
+            for row in rows:
+                yield render({'section': name, 'data': row}) + b'\n'
+        return
+
+    yield b'{'
+    for index, (name, rows) in enumerate(sections):
+        yield (b',' if index else b'') + render(name) + b':['
+        for position, row in enumerate(rows):
+            yield (b',' if position else b'') + render(row)
+        yield b']'
+    if trailer is not None:
+        for name, value in trailer().items():
+            yield b',' + render(name) + b':' + render(value)
+    yield b'}'
+
+
+def streaming_response(sections, stream_format, trailer=None):
+    response = StreamingHttpResponse(
+        buffered(render_sections(sections, stream_format, trailer)),
+        content_type=CONTENT_TYPES[stream_format]
+    )
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,3 +1,1357 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from itertools import product
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core import mail
+from django.core.management import call_command
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .models import (
+    ServiceProvider, DataPlan, Bundle, RouterProduct, ElectronicsDevices, Order, OrderItem, OrderTracking,
+    OrderTrackingEvent, IdempotencyKey, NotificationOutbox
+)
+from .serializers import (
+    ServiceProviderSerializer, DataPlanSerializer, BundleSerializer,
+    RouterProductSerializer, ElectronicsDevicesSerializer
+)
+from .catalog_cache import CATALOG_SECTIONS, build_catalog_payload, get_catalog_snapshot, write_catalog_snapshot
+from .compression import brotli
+from .eager_loading import get_eager_loading
+from .fast_serializers import compile_serializer, fast_serialize
+from .search import search_entries, rebuild_search_index
+from .facets import compute_section_facets
+from .data_volume import parse_data_volume, parse_volume_param, UNLIMITED_MB
+from . import optimizer
+from .optimizer import load_plan_groups, solve_group
+from .idempotency import purge_expired_keys
+from .notifications import (
+    MAX_ATTEMPTS, clear_worker_heartbeat, drain_outbox, notify_orders, record_worker_heartbeat, worker_running
+)
+from .order_ingest import place_order
+from .order_search import search_orders
+from .pagination import OrderKeysetPagination, ProductKeysetPagination
+from .phone import normalize_phone
+from . import tracking_cache
+from .tracking_cache import tracking_cache_key, tracking_generation_key
+from .smtp_sink import SMTPSink
+from .streaming import buffered
+from .order_stats import (
+    GLOBAL_SCOPE, user_scope, read_counts, update_order_status, reconcile_order_counters,
+    reconcile_order_rollups, read_rollups
+)
+
+
+class FastSerializerParityTests(TestCase):
+    """The compiled list serializers must render byte-identical JSON"""
+
+    @classmethod
+    def setUpTestData(cls):
+        vodacom = ServiceProvider.objects.create(name='Vodacom', description='Largest network in Tanzania')
+        airtel = ServiceProvider.objects.create(name='Airtél', is_active=False)
+
+        daily = DataPlan.objects.create(
+            name='Daily 1GB', provider=vodacom, data_volume='1GB', validity_days=1,
+            price=Decimal('1000'), data_type='daily', network_type='4g'
+        )
+        weekly = DataPlan.objects.create(
+            name='Wiki Bando', provider=vodacom, data_volume='5GB', validity_days=7,
+            price=Decimal('5500.50'), data_type='weekly', network_type='5g',
+            description='Kifurushi cha wiki – “bora”'
+        )
+        night = DataPlan.objects.create(
+            name='Night', provider=airtel, data_volume='Unlimited', validity_days=1,
+            price=Decimal('0.00'), data_type='night', network_type='3g', is_active=False
+        )
+
+        family = Bundle.objects.create(
+            name='Family', provider=vodacom, bundle_type='family', total_data_volume='6GB',
+            total_price=Decimal('6000.00'), discount_percentage=Decimal('12.50'),
+            features=['Shared data', {'calls': 100}], is_featured=True
+        )
+        family.data_plans.set([weekly, daily, night])
+        Bundle.objects.create(
+            name='Student', provider=airtel, bundle_type='student', total_data_volume='2GB',
+            total_price=Decimal('2500.00')
+        )
+
+        RouterProduct.objects.create(
+            name='Huawei B311', price=Decimal('150000.00'), specifications='4G LTE, 32 users',
+            image='routers/huawei b311.png'
+        )
+        RouterProduct.objects.create(name='ZTE MF927', price=Decimal('85000.00'), is_available=False)
+
+        ElectronicsDevices.objects.create(
+            name='Tecno Spark', price=Decimal('320000.00'), category='smartphones',
+            image='electronics/tecno spark ünï.jpg', stock_quantity=4
+        )
+        ElectronicsDevices.objects.create(name='Cable', category='accessories')
+
+    def assertParity(self, serializer_class, queryset, fields=None):
+        renderer = JSONRenderer()
+        expected = renderer.render(serializer_class(queryset, many=True, fields=fields).data)
+        actual = renderer.render(fast_serialize(serializer_class, queryset, fields))
+        self.assertEqual(actual, expected)
+
+    def test_providers(self):
+        self.assertParity(ServiceProviderSerializer, ServiceProvider.objects.all())
+
+    def test_data_plans(self):
+        self.assertParity(DataPlanSerializer, DataPlan.objects.all())
+
+    def test_bundles_with_nested_data_plans(self):
+        self.assertParity(BundleSerializer, Bundle.objects.all())
+
+    def test_routers(self):
+        self.assertParity(RouterProductSerializer, RouterProduct.objects.all())
+
+    def test_electronics(self):
+        self.assertParity(ElectronicsDevicesSerializer, ElectronicsDevices.objects.all())
+
+    def test_sparse_fieldsets(self):
+        self.assertParity(BundleSerializer, Bundle.objects.all(), {'id', 'name', 'data_plans'})
+        self.assertParity(DataPlanSerializer, DataPlan.objects.all(), set(DataPlanSerializer.Meta.summary_fields))
+        self.assertParity(ElectronicsDevicesSerializer, ElectronicsDevices.objects.all(), {'image', 'category_display'})
+
+    def test_catalog_snapshot_matches_model_serializers(self):
+        expected = JSONRenderer().render({
+            'providers': ServiceProviderSerializer(ServiceProvider.objects.filter(is_active=True), many=True).data,
+            'data_plans': DataPlanSerializer(DataPlan.objects.filter(is_active=True), many=True).data,
+            'bundles': BundleSerializer(Bundle.objects.filter(is_active=True), many=True).data,
+            'routers': RouterProductSerializer(RouterProduct.objects.filter(is_available=True), many=True).data,
+            'electronics': ElectronicsDevicesSerializer(ElectronicsDevices.objects.filter(is_available=True), many=True).data
+        })
+        self.assertEqual(JSONRenderer().render(build_catalog_payload()), expected)
+
+    def test_unknown_fields_share_one_cached_plan(self):
+        plan = compile_serializer(DataPlanSerializer, {'id', 'name'})
+        for junk in ('a', 'b', 'zzz' * 50):
+            self.assertIs(compile_serializer(DataPlanSerializer, {'id', 'name', junk}), plan)
+        self.assertParity(DataPlanSerializer, DataPlan.objects.all(), {'id', 'name', 'nope'})
+
+    def test_requested_fields_are_normalised_to_declared_fields(self):
+        factory = APIRequestFactory()
+        request = Request(factory.get('/api/data-plans/', {'fields': 'id, name,,bogus,provider_name'}))
+        fields = DataPlanSerializer.get_requested_fields(request)
+        self.assertEqual(fields, frozenset({'id', 'name', 'provider_name'}))
+        self.assertIs(
+            get_eager_loading(DataPlanSerializer, fields | {'other'}), get_eager_loading(DataPlanSerializer, fields)
+        )
+        self.assertEqual(get_eager_loading(DataPlanSerializer, fields)[0], ('provider',))
+
+    def test_query_count_is_independent_of_row_count(self):
+        with self.assertNumQueries(2):
+            fast_serialize(BundleSerializer, Bundle.objects.all())
+        with self.assertNumQueries(1):
+            fast_serialize(DataPlanSerializer, DataPlan.objects.all())
+
+
+def use_temporary_snapshot(test):
+    """Point CATALOG_SNAPSHOT_PATH at a directory removed when `test` ends"""
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory)
+    override = override_settings(CATALOG_SNAPSHOT_PATH=os.path.join(directory, 'catalog.snapshot'))
+    override.enable()
+    test.addCleanup(override.disable)
+
+
+class CatalogSnapshotTests(TestCase):
+    """The catalog snapshot is rebuilt lazily and served with the negotiated encoding"""
+
+    def setUp(self):
+        use_temporary_snapshot(self)
+        self.vodacom = ServiceProvider.objects.create(name='Vodacom')
+
+    def make_plan(self, name, price='1000.00'):
+        return DataPlan.objects.create(
+            name=name, provider=self.vodacom, data_volume='1GB', validity_days=1,
+            price=Decimal(price), data_type='daily', network_type='4g'
+        )
+
+    def test_changes_mark_stale_and_next_read_rebuilds_once(self):
+        version = get_catalog_snapshot().version
+        with mock.patch('store.catalog_cache.write_catalog_snapshot', wraps=write_catalog_snapshot) as write:
+            with self.captureOnCommitCallbacks(execute=True):
+                for name in ('Daily', 'Weekly', 'Monthly'):
+                    self.make_plan(name)
+            self.assertEqual(write.call_count, 0)
+
+            snapshot = get_catalog_snapshot()
+            self.assertIs(get_catalog_snapshot(), snapshot)
+            self.assertEqual(write.call_count, 1)
+        self.assertGreater(snapshot.version, version)
+        self.assertEqual(len(json.loads(bytes(snapshot.content('data_plans')))), 3)
+
+    def test_snapshot_is_byte_identical_to_rendered_payload(self):
+        weekly = self.make_plan('Wiki Bando – “bora”', '5500.50')
+        family = Bundle.objects.create(
+            name='Family', provider=self.vodacom, bundle_type='family', total_data_volume='6GB',
+            total_price=Decimal('6000.00'), discount_percentage=Decimal('12.50'), features=['Shared data']
+        )
+        family.data_plans.set([weekly])
+        RouterProduct.objects.create(name='Huawei B311', price=Decimal('150000.00'))
+        write_catalog_snapshot()
+
+        renderer = JSONRenderer()
+        payload = build_catalog_payload()
+        snapshot = get_catalog_snapshot()
+        self.assertEqual(bytes(snapshot.content()), renderer.render(payload))
+        for section in CATALOG_SECTIONS:
+            self.assertEqual(bytes(snapshot.content(section)), renderer.render(payload[section]))
+
+    def test_encoded_variants_have_their_own_etags(self):
+        for index in range(20):
+            self.make_plan(f'Daily {index}')
+        url = '/api/public-data-plans/'
+        identity = self.client.get(url, secure=True)
+        gzipped = self.client.get(url, secure=True, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertNotIn('Content-Encoding', identity)
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.content), identity.content)
+        self.assertNotEqual(gzipped['ETag'], identity['ETag'])
+        for response in (identity, gzipped):
+            self.assertIn('Accept-Encoding', response['Vary'])
+
+        # A client's cached gzip body must not validate an identity request
+        response = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=gzipped['ETag'])
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            url, secure=True, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=gzipped['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        refused = self.client.get(url, secure=True, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', refused)
+        # Sections too small to shrink are only stored raw
+        empty = self.client.get('/api/public-electronics/', secure=True, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual((empty.content, empty.has_header('Content-Encoding')), (b'[]', False))
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_brotli_is_preferred_unless_outweighed(self):
+        for index in range(20):
+            self.make_plan(f'Daily {index}')
+        url = '/api/all-services/'
+        identity = self.client.get(url, secure=True)
+        response = self.client.get(url, secure=True, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), identity.content)
+        etags = {identity['ETag'], response['ETag']}
+
+        response = self.client.get(url, secure=True, HTTP_ACCEPT_ENCODING='br;q=0.5, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etags.add(response['ETag'])
+        self.assertEqual(len(etags), 3)
+
+    def test_public_endpoints_serve_snapshot_slices(self):
+        self.make_plan('Daily')
+        snapshot = get_catalog_snapshot()
+        routes = {
+            '/api/all-services/': None,
+            '/api/public-providers/': 'providers',
+            '/api/public-data-plans/': 'data_plans',
+            '/api/public-bundles/': 'bundles',
+            '/api/public-routers/': 'routers',
+            '/api/public-electronics/': 'electronics',
+        }
+        for url, section in routes.items():
+            response = self.client.get(url, secure=True)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.content, bytes(snapshot.content(section)), url)
+
+
+class ConditionalGetTests(TestCase):
+    """Catalog lists and detail routes answer If-None-Match and If-Modified-Since with 304"""
+
+    def setUp(self):
+        use_temporary_snapshot(self)
+        self.vodacom = ServiceProvider.objects.create(name='Vodacom')
+        self.plan = DataPlan.objects.create(
+            name='Daily 1GB', provider=self.vodacom, data_volume='1GB', validity_days=1,
+            price=Decimal('1000.00'), data_type='daily', network_type='4g'
+        )
+
+    def get(self, url, params=None, **headers):
+        return self.client.get(url, params, secure=True, **headers)
+
+    def assertNotModified(self, url, params=None):
+        first = self.get(url, params)
+        self.assertEqual(first.status_code, 200, url)
+        etag, last_modified = first['ETag'], first['Last-Modified']
+
+        response = self.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.content), (304, b''), url)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(url, params, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304, url)
+
+        self.assertEqual(self.get(url, params, HTTP_IF_NONE_MATCH='"stale"').status_code, 200, url)
+        earlier = http_date(parse_http_date(last_modified) - 3600)
+        self.assertEqual(self.get(url, params, HTTP_IF_MODIFIED_SINCE=earlier).status_code, 200, url)
+        return etag
+
+    def test_viewset_list_and_detail(self):
+        self.assertNotModified('/api/data-plans/')
+        self.assertNotModified(f'/api/data-plans/{self.plan.pk}/')
+        self.assertNotModified('/api/data-plans/', {'view': 'summary'})
+
+    def test_public_lists(self):
+        self.assertNotModified('/api/public-data-plans/')
+        self.assertNotModified('/api/public-data-plans/', {'fields': 'id,name'})
+        self.assertNotModified('/api/public-data-plans/', {'limit': 1})
+        self.assertNotModified('/api/all-services/')
+
+    def test_not_modified_skips_serialization(self):
+        etag = self.get('/api/data-plans/')['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get('/api/data-plans/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_malformed_pk_is_not_found(self):
+        for url in ('/api/data-plans/abc/', '/api/bundles/abc/', '/api/providers/1.5/', '/api/routers/%20/'):
+            self.assertEqual(self.get(url).status_code, 404, url)
+
+    def test_bundle_plan_changes_move_the_validators(self):
+        bundle = Bundle.objects.create(
+            name='Family', provider=self.vodacom, bundle_type='family', total_data_volume='6GB',
+            total_price=Decimal('6000.00')
+        )
+        other = DataPlan.objects.create(
+            name='Weekly', provider=self.vodacom, data_volume='5GB', validity_days=7,
+            price=Decimal('5000.00'), data_type='weekly', network_type='4g'
+        )
+        bundle.data_plans.set([self.plan, other])
+        # Each change drops the older plan, so the newest plan timestamp alone would not move
+        changes = [
+            lambda: bundle.data_plans.remove(self.plan),
+            lambda: bundle.data_plans.add(self.plan),
+            lambda: self.plan.bundles.clear(),
+            lambda: bundle.data_plans.add(self.plan),
+            lambda: self.plan.delete(),
+        ]
+        for change in changes:
+            etags = [self.get(url)['ETag'] for url in ('/api/bundles/', f'/api/bundles/{bundle.pk}/')]
+            change()
+            for url, etag in zip(('/api/bundles/', f'/api/bundles/{bundle.pk}/'), etags):
+                self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200, (url, changes.index(change)))
+
+    def test_related_changes_move_the_validators(self):
+        url = f'/api/data-plans/{self.plan.pk}/'
+        etag = self.get(url)['ETag']
+        self.vodacom.name = 'Vodacom Tanzania'
+        self.vodacom.save()
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['provider_name'], 'Vodacom Tanzania')
+
+
+class StreamingResponseTests(TestCase):
+    """Streamed catalog and order search output is framed correctly and matches the buffered responses"""
+
+    def setUp(self):
+        use_temporary_snapshot(self)
+        vodacom = ServiceProvider.objects.create(name='Vodacom')
+        for index in range(5):
+            DataPlan.objects.create(
+                name=f'Plan {index}', provider=vodacom, data_volume='1GB', validity_days=1,
+                price=Decimal('1000.00') + index, data_type='daily', network_type='4g',
+                description='Line one\nline two'
+            )
+        RouterProduct.objects.create(name='Huawei B311', price=Decimal('150000.00'))
+
+    def stream(self, url, params=None, **headers):
+        response = self.client.get(url, params, secure=True, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_framing(self):
+        response, body = self.stream('/api/all-services/', {'stream': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertTrue(body.endswith(b'\n'))
+        lines = body.split(b'\n')[:-1]
+        records = [json.loads(line) for line in lines]
+        self.assertTrue(all(set(record) == {'section', 'data'} for record in records))
+
+        expected = json.loads(bytes(get_catalog_snapshot().content()))
+        for section in CATALOG_SECTIONS:
+            self.assertEqual([record['data'] for record in records if record['section'] == section], expected[section])
+        self.assertEqual(len(lines), sum(len(rows) for rows in expected.values()))
+
+        _, accepted = self.stream('/api/all-services/', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(accepted, body)
+
+    def test_json_stream_matches_snapshot(self):
+        response, body = self.stream('/api/all-services/', {'stream': 'json'})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(body, bytes(get_catalog_snapshot().content()))
+
+    def test_chunked_rows_match_one_pass(self):
+        queryset = DataPlan.objects.order_by('id')
+        plan = compile_serializer(DataPlanSerializer)
+        self.assertEqual(list(plan.iter_serialize(queryset, chunk_size=2)), plan.serialize(queryset))
+        self.assertEqual(list(buffered([b'ab', b'cd', b'e'], size=3)), [b'abcd', b'e'])
+
+    def test_order_search_stream_trailer(self):
+        for name in ('Juma Mushi', 'Neema Mushi'):
+            Order.objects.create(
+                customer_name=name, customer_email='x@example.com', customer_phone='0712345678', product_details='1GB'
+            )
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+        _, body = self.stream('/api/admin/search-orders/', {'q': 'mushi', 'stream': 'json'})
+        data = json.loads(body)
+        self.assertEqual((len(data['results']), data['count']), (2, 2))
+
+        _, body = self.stream('/api/admin/search-orders/', {'q': 'mushi', 'stream': 'ndjson'})
+        records = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([record['section'] for record in records], ['results', 'results'])
+
+
+class ViewSetQueryCountTests(TestCase):
+    """Catalog ViewSet listings run the same number of queries whatever the row count"""
+
+    def setUp(self):
+        self.providers = [ServiceProvider.objects.create(name=name) for name in ('Vodacom', 'Airtel', 'Tigo')]
+
+    def add_rows(self, count):
+        for index in range(count):
+            provider = self.providers[index % len(self.providers)]
+            plans = [
+                DataPlan.objects.create(
+                    name=f'{provider.name} {index}.{n}', provider=provider, data_volume='1GB', validity_days=1,
+                    price=Decimal('1000.00'), data_type='daily', network_type='4g'
+                )
+                for n in range(2)
+            ]
+            bundle = Bundle.objects.create(
+                name=f'Bundle {index}', provider=provider, bundle_type='family', total_data_volume='2GB',
+                total_price=Decimal('2000.00'), is_featured=True
+            )
+            bundle.data_plans.set(plans)
+            ElectronicsDevices.objects.create(name=f'Device {index}', category='smartphones')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries), response.json()
+
+    def test_list_query_count_is_independent_of_row_count(self):
+        urls = ('/api/bundles/', '/api/bundles/featured/', '/api/data-plans/', '/api/electronics/')
+        self.add_rows(4)
+        small = {url: self.count_queries(url) for url in urls}
+        self.add_rows(8)
+        for url in urls:
+            count, data = self.count_queries(url)
+            self.assertEqual(count, small[url][0], url)
+            self.assertEqual(len(data), 3 * len(small[url][1]), url)
+
+
+class SearchIndexTests(TestCase):
+    """The search index follows catalog writes and ranks title matches first"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vodacom = ServiceProvider.objects.create(name='Vodacom')
+        cls.laptop = ElectronicsDevices.objects.create(
+            name='HP Laptop 14', category='laptops', price=Decimal('950000'),
+            description='Slim laptop for students'
+        )
+        cls.bag = ElectronicsDevices.objects.create(
+            name='Carry bag', category='accessories', description='Fits any laptop up to 15 inches'
+        )
+        cls.plan = DataPlan.objects.create(
+            name='Wiki Bando', provider=cls.vodacom, data_volume='5GB', price=Decimal('5500')
+        )
+
+    def ids(self, query, kinds=None):
+        hits, total = search_entries(query, kinds)
+        self.assertEqual(total, len(hits))
+        return [(kind, object_id) for kind, object_id, _ in hits]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(
+            self.ids('laptop'),
+            [('electronics', self.laptop.pk), ('electronics', self.bag.pk)]
+        )
+
+    def test_prefix_terms_and_kind_filter(self):
+        self.assertEqual(self.ids('voda band'), [('data_plan', self.plan.pk)])
+        self.assertEqual(self.ids('vodacom', ['electronics']), [])
+
+    def test_entries_follow_saves_and_deletes(self):
+        self.vodacom.name = 'Halotel'
+        self.vodacom.save()
+        self.assertEqual(self.ids('halotel'), [('data_plan', self.plan.pk)])
+
+        self.bag.is_available = False
+        self.bag.save()
+        self.assertEqual(self.ids('laptop'), [('electronics', self.laptop.pk)])
+
+        self.laptop.delete()
+        self.assertEqual(self.ids('laptop'), [])
+
+    def test_rebuild_matches_signal_maintained_index(self):
+        before = self.ids('vodacom laptop bando')
+        self.assertEqual(rebuild_search_index(), 3)
+        self.assertEqual(self.ids('vodacom laptop bando'), before)
+
+    def test_search_endpoint(self):
+        response = self.client.get('/api/search/', {'q': 'laptop', 'limit': 1}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['next'], 1)
+        self.assertEqual(data['results'][0]['item'], fast_serialize(
+            ElectronicsDevicesSerializer, ElectronicsDevices.objects.filter(pk=self.laptop.pk)
+        )[0])
+
+
+class CatalogFacetTests(TestCase):
+    """Facet counts come from one grouped query and ignore their own selection"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vodacom = ServiceProvider.objects.create(name='Vodacom')
+        for data_type, network_type, price in [
+            ('daily', '4g', '500'), ('daily', '5g', '1500'), ('weekly', '4g', '3000'), ('monthly', '3g', '60000')
+        ]:
+            DataPlan.objects.create(
+                name=f'{data_type} {network_type}', provider=cls.vodacom, data_volume='1GB',
+                price=Decimal(price), data_type=data_type, network_type=network_type
+            )
+
+    def counts(self, facets, name):
+        return {entry['value']: entry['count'] for entry in facets['facets'][name]}
+
+    def test_counts_follow_other_selections(self):
+        with self.assertNumQueries(1):
+            facets = compute_section_facets('data_plans', {'data_type': 'daily'})
+        self.assertEqual(facets['total'], 2)
+        self.assertEqual(self.counts(facets, 'data_type'), {'daily': 2, 'weekly': 1, 'monthly': 1})
+        self.assertEqual(self.counts(facets, 'network_type'), {'4g': 1, '5g': 1, '3g': 0})
+        self.assertEqual([bucket['count'] for bucket in facets['price']['buckets']], [1, 1, 0, 0, 0, 0, 0])
+        self.assertEqual((facets['price']['min'], facets['price']['max']), ('500.00', '1500.00'))
+
+    def test_price_filter_narrows_every_facet(self):
+        facets = compute_section_facets('data_plans', {'max_price': '5000'})
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual(self.counts(facets, 'data_type'), {'daily': 2, 'weekly': 1})
+
+    def test_non_finite_prices_are_rejected(self):
+        for value in ('NaN', 'Infinity', '-Infinity', 'sNaN', 'cheap'):
+            with self.assertRaises(ValueError):
+                compute_section_facets('data_plans', {'min_price': value})
+            for name in ('min_price', 'max_price'):
+                response = self.client.get('/api/facets/', {name: value}, secure=True)
+                self.assertEqual(response.status_code, 400, (name, value))
+                self.assertIn(name, response.json()['error'])
+
+
+class DataVolumeTests(TestCase):
+    """Volume text is parsed into indexed columns the list endpoints filter and sort on"""
+
+    def test_parse_data_volume(self):
+        cases = {
+            '1GB': 1024, '500MB': 500, '1.5 GB': 1536, '2,5GB': 2560, '10GB + 5GB Night': 15360,
+            '1,000MB': 1000, '1,500 MB': 1500, '1,024.5MB': 1025, '2,25GB': 2304,
+            'Unlimited': UNLIMITED_MB, 'Bila kikomo': UNLIMITED_MB, 'Talk only': None, '': None,
+        }
+        for text, expected in cases.items():
+            self.assertEqual(parse_data_volume(text), expected, text)
+
+    def test_filter_and_order_by_price_per_gb(self):
+        vodacom = ServiceProvider.objects.create(name='Vodacom')
+        small = DataPlan.objects.create(name='Small', provider=vodacom, data_volume='500MB', price=Decimal('1000'))
+        large = DataPlan.objects.create(name='Large', provider=vodacom, data_volume='10GB', price=Decimal('10000'))
+        unlimited = DataPlan.objects.create(name='Unlimited', provider=vodacom, data_volume='Unlimited', price=Decimal('50000'))
+        self.assertEqual((small.data_volume_mb, small.price_per_gb), (500, Decimal('2048.00')))
+
+        def ids(params):
+            response = self.client.get('/api/data-plans/', params, secure=True)
+            return [plan['id'] for plan in response.json()]
+
+        self.assertEqual(ids({'ordering': 'price_per_gb'}), [large.id, small.id, unlimited.id])
+        self.assertEqual(ids({'min_volume': '1GB', 'ordering': '-data_volume'}), [unlimited.id, large.id])
+        self.assertEqual(ids({'max_volume': '1024'}), [small.id])
+
+        # Unparseable or non-finite values are ignored; huge ones are clamped
+        every = sorted([small.id, large.id, unlimited.id])
+        for value in ['nan', 'NaN', 'Infinity', '-inf', 'snan', 'lots']:
+            self.assertEqual(sorted(ids({'min_volume': value})), every, value)
+        self.assertEqual(ids({'min_volume': '1e30'}), [unlimited.id])
+        self.assertEqual(sorted(ids({'max_volume': '-5'})), [])
+        self.assertEqual(parse_volume_param('1e999999'), UNLIMITED_MB)
+
+
+class PlanOptimizerTests(TestCase):
+    """The knapsack solver agrees with brute force on a small catalog"""
+
+    @classmethod
+    def setUpTestData(cls):
+        provider = ServiceProvider.objects.create(name='Tigo')
+        for name, volume, days, price in [
+            ('Daily 1GB', '1GB', 1, '900'), ('Weekly 3GB', '3GB', 7, '4000'),
+            ('Monthly 8GB', '8GB', 30, '20000'), ('Social 300MB', '300MB', 30, '600'),
+        ]:
+            DataPlan.objects.create(
+                name=name, provider=provider, data_volume=volume, validity_days=days, price=Decimal(price)
+            )
+        cls.group = next(iter(load_plan_groups().values()))
+
+    def brute_force(self, volume_mb, days):
+        stretched = [
+            (-(-days // plan['validity_days']) if days else 1, plan) for plan in self.group.plans
+        ]
+        best = None
+        for counts in product(range(12), repeat=len(stretched)):
+            volume = sum(count * times * plan['data_volume_mb'] for count, (times, plan) in zip(counts, stretched))
+            price = sum(count * times * plan['price'] for count, (times, plan) in zip(counts, stretched))
+            if volume >= volume_mb and (best is None or price < best):
+                best = price
+        return best
+
+    def test_matches_brute_force(self):
+        for volume_mb, days in [(1024, 0), (5000, 0), (10240, 30), (2048, 7), (20480, 30)]:
+            solution = solve_group(self.group, volume_mb, days)
+            self.assertEqual(Decimal(solution['total_price']), self.brute_force(volume_mb, days), (volume_mb, days))
+            covered = sum(plan['quantity'] * parse_data_volume(plan['data_volume']) for plan in solution['plans'])
+            self.assertGreaterEqual(covered, volume_mb)
+
+    def test_choice_table_stays_within_budget(self):
+        with mock.patch('store.optimizer.MAX_TABLE_CELLS', 5000), \
+                mock.patch('store.optimizer.fill_table', wraps=optimizer.fill_table) as fill:
+            for volume_mb, days in [(20480, 30), (65536, 0), (1024, 0)]:
+                solution = solve_group(self.group, volume_mb, days)
+                items, steps = fill.call_args.args
+                self.assertLessEqual(len(items) * (steps + 1), 5000)
+                covered = sum(plan['quantity'] * parse_data_volume(plan['data_volume']) for plan in solution['plans'])
+                self.assertGreaterEqual(covered, volume_mb)
+        self.assertEqual(
+            solve_group(self.group, 1024, 0)['total_price'], str(self.brute_force(1024, 0).quantize(Decimal('0.01')))
+        )
+
+    def test_endpoint_reloads_plans_without_rebuilding_the_snapshot(self):
+        use_temporary_snapshot(self)
+        optimize = lambda: self.client.get('/api/data-plans/optimize/', {'volume': '300MB'}, secure=True).json()
+        self.assertEqual(optimize()['results'][0]['total_price'], '600.00')
+        plan = DataPlan.objects.get(name='Social 300MB')
+        plan.price = Decimal('500.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            plan.save()
+        self.assertEqual(optimize()['results'][0]['total_price'], '500.00')
+        self.assertFalse(os.path.exists(settings.CATALOG_SNAPSHOT_PATH))
+
+    def test_endpoint_rejects_bad_input(self):
+        def optimize(**params):
+            return self.client.get('/api/data-plans/optimize/', params, secure=True)
+
+        for params in [{}, {'volume': '-5'}, {'volume': '0'}, {'volume': 'nan'}, {'volume': 'lots'},
+                       {'volume': '2GB', 'days': '0'}, {'volume': '2GB', 'days': '-3'},
+                       {'volume': '2GB', 'days': 'nan'}, {'volume': '2GB', 'limit': 'x'}]:
+            self.assertEqual(optimize(**params).status_code, 400, params)
+        response = optimize(volume='2GB', days='7')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['results'])
+        self.assertEqual(optimize(volume='2GB').json()['days'], 0)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+class QueryPlanTests(TestCase):
+    """Hot filter and ordering paths must be served by an index, not a table scan"""
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = queryset.explain()
+        self.assertTrue(
+            any(f'INDEX {name}' in plan for name in index_names),
+            f'expected one of {index_names} in:\n{plan}\n{queryset.query}'
+        )
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, f'sorts without an index:\n{plan}')
+
+    def test_catalog_lists(self):
+        self.assertUsesIndex(ServiceProvider.objects.filter(is_active=True), 'provider_active_name_idx')
+        self.assertUsesIndex(DataPlan.objects.filter(is_active=True), 'dataplan_active_prov_price_idx')
+        self.assertUsesIndex(Bundle.objects.filter(is_active=True), 'bundle_active_feat_price_idx')
+        self.assertUsesIndex(RouterProduct.objects.filter(is_available=True), 'router_available_idx')
+        self.assertUsesIndex(ElectronicsDevices.objects.filter(is_available=True), 'electronics_available_idx')
+
+    def test_catalog_filters(self):
+        self.assertUsesIndex(
+            DataPlan.objects.filter(is_active=True, provider_id=1), 'dataplan_active_prov_price_idx'
+        )
+        self.assertUsesIndex(
+            Bundle.objects.filter(is_active=True, provider_id=1).order_by('total_price'),
+            'bundle_active_prov_price_idx'
+        )
+        self.assertUsesIndex(ElectronicsDevices.objects.filter(category='laptops'), 'electronics_category_idx')
+
+    def test_order_paths(self):
+        self.assertUsesIndex(Order.objects.filter(status='pending'), 'order_status_created_idx')
+        self.assertUsesIndex(Order.objects.filter(user_id=1), 'order_user_created_id_idx')
+        self.assertUsesIndex(Order.objects.filter(customer_email='a@example.com'), 'order_email_created_idx')
+        self.assertUsesIndex(
+            Order.objects.filter(created_at__gte=timezone.now()), 'order_created_id_idx'
+        )
+        self.assertUsesIndex(
+            OrderTrackingEvent.objects.filter(tracking_id=1).order_by('timestamp', 'id'), 'trackingevent_tracking_ts_idx'
+        )
+
+
+class OrderCounterTests(TestCase):
+    """Counters follow every order write path and agree with a recount"""
+
+    def make_order(self, user=None, status='pending'):
+        return Order.objects.create(
+            user=user, customer_name='Asha', customer_email='asha@example.com',
+            customer_phone='0712345678', product_details='1GB', status=status
+        )
+
+    def test_write_paths(self):
+        user = User.objects.create_user('asha', password='x')
+        first = self.make_order(user)
+        self.make_order(user, status='confirmed')
+        guest = self.make_order()
+
+        first.status = 'shipped'
+        first.save()
+        update_order_status(Order.objects.filter(pk=guest.pk), 'delivered', completed_at=timezone.now())
+        Order.objects.filter(status='confirmed').delete()
+
+        counts = read_counts(GLOBAL_SCOPE)
+        self.assertEqual(counts['total'], 2)
+        self.assertEqual((counts['pending'], counts['confirmed'], counts['shipped'], counts['delivered']), (0, 0, 1, 1))
+        user_counts = read_counts(user_scope(user.id))
+        self.assertEqual((user_counts['total'], user_counts['shipped']), (1, 1))
+        self.assertEqual(reconcile_order_counters(dry_run=True), {})
+
+    def test_stale_instances_do_not_move_counts_twice(self):
+        order = self.make_order()
+        first, second = Order.objects.get(pk=order.pk), Order.objects.get(pk=order.pk)
+        first.status = 'cancelled'
+        first.save()
+        second.status = 'cancelled'
+        second.save()
+
+        counts = read_counts()
+        self.assertEqual((counts['total'], counts['pending'], counts['cancelled']), (1, 0, 1))
+        self.assertEqual(reconcile_order_counters(dry_run=True), {})
+
+    def test_update_fields_only_moves_written_fields(self):
+        order = self.make_order()
+        order.status = 'shipped'
+        order.admin_notes = 'Called the customer'
+        order.save(update_fields=['admin_notes'])
+        self.assertEqual((read_counts()['pending'], read_counts()['shipped']), (1, 0))
+
+        order.save(update_fields=['status'])
+        self.assertEqual((read_counts()['pending'], read_counts()['shipped']), (0, 1))
+        self.assertEqual(reconcile_order_counters(dry_run=True), {})
+        self.assertEqual(reconcile_order_rollups(dry_run=True), {})
+
+    def test_reconcile_repairs_drift(self):
+        self.make_order()
+        Order.objects.update(status='cancelled')  # bypasses the counters
+        self.assertEqual(read_counts()['cancelled'], 0)
+
+        drift = reconcile_order_counters()
+        self.assertEqual(drift[GLOBAL_SCOPE, 'cancelled'], (0, 1))
+        self.assertEqual((read_counts()['pending'], read_counts()['cancelled']), (0, 1))
+
+
+class OrderRollupTests(TestCase):
+    """Hourly and daily rollups follow order writes and serve the dashboard range endpoint"""
+
+    def make_order(self, service_type='data_plan', total_price='1500.00'):
+        return Order.objects.create(
+            customer_name='Asha', customer_email='asha@example.com', customer_phone='0712345678',
+            product_details='1GB', service_type=service_type, total_price=total_price
+        )
+
+    def test_buckets_follow_writes(self):
+        plan = self.make_order()
+        self.make_order('router', '85000.00')
+        plan.total_price = Decimal('2000.00')
+        plan.save()
+        update_order_status(Order.objects.filter(service_type='router'), 'shipped')
+
+        now = timezone.now()
+        for granularity in ('hour', 'day'):
+            bucket = read_rollups(granularity, now, now)[0]
+            self.assertEqual((bucket['orders'], bucket['revenue']), (2, Decimal('87000.00')))
+            self.assertEqual(bucket['by_status']['shipped'], {'orders': 1, 'revenue': Decimal('85000.00')})
+            self.assertEqual(bucket['by_service_type']['data_plan']['revenue'], Decimal('2000.00'))
+
+        Order.objects.filter(pk=plan.pk).delete()
+        self.assertEqual(read_rollups('day', now, now)[0]['orders'], 1)
+        self.assertEqual(reconcile_order_rollups(dry_run=True), {})
+
+    def test_endpoint_fills_empty_buckets(self):
+        order = self.make_order()
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=2))
+        self.assertTrue(reconcile_order_rollups())
+
+        admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.client.force_login(admin)
+        start = (timezone.now() - timedelta(days=3)).date().isoformat()
+        response = self.client.get('/api/admin/order-rollups/', {'granularity': 'day', 'from': start}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([bucket['orders'] for bucket in data['buckets']], [0, 1, 0, 0])
+        self.assertEqual(data['totals'], {'orders': 1, 'revenue': '1500.00'})
+
+        self.assertEqual(self.client.get('/api/admin/order-rollups/', {'granularity': 'week'}, secure=True).status_code, 400)
+
+
+class OrderSearchTests(TestCase):
+    """Order search matches substrings and phone numbers however they were typed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        make = lambda name, email, phone, product: Order.objects.create(
+            customer_name=name, customer_email=email, customer_phone=phone, product_details=product
+        )
+        cls.neema = make('Neema Mushi', 'neema.m@gmail.com', '+255 754 111 222', 'Vodacom 10GB monthly bundle')
+        cls.juma = make('Juma Mushi', 'juma@example.com', '0712 345 678', 'Huawei B535 router')
+        cls.other = make('Asha Kimaro', 'asha@example.com', '255713000111', 'Airtel 5GB weekly')
+
+    def test_normalize_phone(self):
+        for typed in ('0712 345 678', '+255 712-345-678', '255712345678', '00255712345678', '712345678'):
+            self.assertEqual(normalize_phone(typed), '+255712345678')
+        self.assertEqual(normalize_phone('not a number'), '')
+        self.assertEqual(self.juma.customer_phone_e164, '+255712345678')
+
+    def test_search(self):
+        ids = lambda query: [order.id for order in search_orders(query)[0]]
+        self.assertEqual(ids('+255 712 345 678'), [self.juma.id])
+        self.assertEqual(ids('0754 111'), [self.neema.id])
+        self.assertEqual(set(ids('mushi')), {self.neema.id, self.juma.id})
+        self.assertEqual(ids('gmail 10GB'), [self.neema.id])
+        self.assertEqual(ids('MUSHI ju'), [self.juma.id])
+        self.assertEqual(ids('nothing like it'), [])
+        self.assertEqual(ids('345678'), [self.juma.id])
+        self.assertEqual(ids('111 222'), [self.neema.id])
+
+    def test_digit_queries_also_match_order_text(self):
+        ids = lambda query: {order.id for order in search_orders(query)[0]}
+        make = lambda product: Order.objects.create(
+            customer_name='Baraka', customer_email='baraka@example.com', customer_phone='0689 000 999',
+            product_details=product
+        )
+        serial = make('Router serial 88123456')
+        imei = make('Tecno Spark IMEI 356938035643809')
+        shared = make('Bundle ref 345678')
+        self.assertEqual(ids('88123456'), {serial.id})
+        self.assertEqual(ids('356938035643809'), {imei.id})
+        self.assertEqual(ids('345678'), {self.juma.id, shared.id})
+        self.assertEqual(ids('0712 345 678'), {self.juma.id})
+
+        self.other.customer_name = 'Asha Mushi'
+        self.other.save()
+        self.assertEqual(search_orders('mushi')[1], 3)
+
+    def test_endpoint_requires_admin(self):
+        self.assertEqual(self.client.get('/api/admin/search-orders/', {'q': 'mushi'}, secure=True).status_code, 403)
+        self.client.force_login(User.objects.create_user('asha', password='x'))
+        self.assertEqual(self.client.get('/api/admin/search-orders/', {'q': 'mushi'}, secure=True).status_code, 403)
+
+    def test_endpoint_paginates(self):
+        admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.client.force_login(admin)
+        response = self.client.get('/api/admin/search-orders/', {'q': 'mushi', 'limit': 1}, secure=True)
+        data = response.json()
+        self.assertEqual((len(data['results']), data['count'], data['next']), (1, 2, 1))
+        self.assertNotIn('customer_phone_e164', data['results'][0])
+        self.assertEqual(data['results'][0]['customer_phone'], '0712 345 678')
+
+
+class TrackingCacheTests(TestCase):
+    """track_order serves cached bodies and drops them when the order or tracking changes"""
+
+    def setUp(self):
+        caches['shared'].clear()
+        caches['default'].clear()
+        self.order = Order.objects.create(
+            customer_name='Asha', customer_email='asha@example.com', customer_phone='0712345678',
+            product_details='Vodacom 10GB'
+        )
+        self.tracking = OrderTracking.objects.create(
+            order=self.order, tracking_number='fre1a2b3c', customer_email='asha@example.com'
+        )
+
+    def track(self, number):
+        return self.client.get(f'/api/track-order/{number}/', secure=True)
+
+    def track_counting_queries(self, number):
+        """The response and the queries it made, leaving out those of the database cache itself"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.track(number)
+        return response, [
+            query['sql'] for query in queries
+            if 'store_shared_cache' not in query['sql'] and not query['sql'].startswith(('SAVEPOINT', 'RELEASE'))
+        ]
+
+    def test_events_form_the_timeline(self):
+        with self.assertNumQueries(1):
+            self.tracking.add_status_update('order_created', 'Order placed')
+        self.tracking.add_status_update('shipped')
+        self.assertEqual([update['status'] for update in self.tracking.status_updates], ['order_created', 'shipped'])
+        response, queries = self.track_counting_queries('FRE1A2B3C')
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(response.json()['status_updates'][0]['notes'], 'Order placed')
+
+    def test_cached_case_insensitively(self):
+        self.assertEqual(self.tracking.tracking_number, 'FRE1A2B3C')
+        self.assertEqual(self.track('FRE1A2B3C').json()['order_status'], 'pending')
+        response, queries = self.track_counting_queries('fre1a2b3c')
+        self.assertEqual(queries, [])
+        self.assertEqual(response.json()['tracking_number'], 'FRE1A2B3C')
+
+    def test_writes_invalidate(self):
+        self.track('FRE1A2B3C')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.status = 'shipped'
+            self.order.save()
+        self.assertEqual(self.track('FRE1A2B3C').json()['order_status'], 'shipped')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tracking.add_status_update('shipped', 'On the way')
+        self.assertEqual(self.track('FRE1A2B3C').json()['status_updates'][-1]['notes'], 'On the way')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            update_order_status(Order.objects.all(), 'delivered')
+        self.assertEqual(self.track('FRE1A2B3C').json()['order_status'], 'delivered')
+
+    def test_invalidation_reaches_other_workers(self):
+        # A separately created backend shares no process state, like another gunicorn worker
+        other_worker = caches.create_connection('shared')
+        key, generation_key = tracking_cache_key('FRE1A2B3C'), tracking_generation_key('FRE1A2B3C')
+        self.track('FRE1A2B3C')
+        generation, _ = other_worker.get(key)
+        self.assertEqual(generation, other_worker.get(generation_key))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.status = 'shipped'
+            self.order.save()
+        self.assertNotEqual(generation, other_worker.get(generation_key))
+
+    def test_write_committed_during_a_miss_is_not_cached_over(self):
+        load = tracking_cache.load_tracking_response
+
+        def read_then_commit_a_write(number):
+            # The reader loads the row, then a writer commits before the reader stores it
+            response = load(number)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.order.status = 'shipped'
+                self.order.save()
+            return response
+
+        with mock.patch.object(tracking_cache, 'load_tracking_response', side_effect=read_then_commit_a_write):
+            self.assertEqual(self.track('FRE1A2B3C').json()['order_status'], 'pending')
+        self.assertEqual(self.track('FRE1A2B3C').json()['order_status'], 'shipped')
+
+    def test_unknown_numbers_are_cached_per_process(self):
+        self.assertEqual(self.track('FRENOPE').status_code, 404)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.track('frenope')
+        self.assertEqual((response.status_code, len(queries)), (404, 0))
+        self.assertIsNone(caches['shared'].get(tracking_cache_key('FRENOPE')))
+
+        # A number that starts to exist drops this worker's negative entry
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderTracking.objects.create(order=Order.objects.create(
+                customer_name='Juma', customer_email='juma@example.com', customer_phone='0712345678',
+                product_details='Router'
+            ), tracking_number='FRENOPE')
+        self.assertEqual(self.track('FRENOPE').status_code, 200)
+
+
+class OrderIngestTests(TestCase):
+    """create_order writes the order, tracking and first event together, with inserts only"""
+
+    payload = {
+        'customer_name': 'Asha', 'customer_email': 'asha@example.com', 'customer_phone': '0712345678',
+        'product_details': 'Vodacom 10GB', 'total_price': '1500.00',
+    }
+
+    def test_create_order(self):
+        # Savepoint and release, then the order, two counter upserts, tracking and event inserts
+        with self.assertNumQueries(7):
+            response = self.client.post('/api/create-order/', self.payload, content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, 201)
+        tracking = OrderTracking.objects.get(tracking_number=response.json()['tracking_number'])
+        self.assertEqual(tracking.order.customer_phone_e164, '+255712345678')
+        self.assertEqual([update['status'] for update in tracking.status_updates], ['order_created'])
+        self.assertEqual(read_counts()['pending'], 1)
+
+    def test_failure_leaves_nothing(self):
+        fields = {key: value for key, value in self.payload.items()}
+        with mock.patch.object(OrderTracking, 'add_status_update', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                place_order(fields)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderTracking.objects.exists())
+        self.assertEqual(read_counts()['total'], 0)
+
+
+class IdempotencyKeyTests(TestCase):
+    """Retried order POSTs with the same Idempotency-Key create one order"""
+
+    payload = OrderIngestTests.payload
+
+    def post(self, path, key, payload=None):
+        return self.client.post(
+            path, payload or self.payload, content_type='application/json', secure=True,
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_response(self):
+        first = self.post('/api/create-order/', 'checkout-1')
+        self.assertEqual(first.status_code, 201)
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.post('/api/create-order/', 'checkout-1')
+        self.assertFalse([query for query in queries if 'store_order' in query['sql']])
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['tracking_number'], first.json()['tracking_number'])
+        self.assertEqual(Order.objects.count(), 1)
+
+        self.assertEqual(self.post('/api/orders/', 'checkout-1').status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)  # keys are per endpoint
+
+    def test_conflicts(self):
+        self.post('/api/create-order/', 'checkout-2')
+        changed = dict(self.payload, total_price='9999.00')
+        self.assertEqual(self.post('/api/create-order/', 'checkout-2', changed).status_code, 422)
+
+        IdempotencyKey.objects.create(
+            scope='create_order:anonymous', key='in-flight', fingerprint='x', expires_at=timezone.now() + timedelta(hours=1)
+        )
+        self.assertEqual(self.post('/api/create-order/', 'in-flight').status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_purge_expired(self):
+        self.post('/api/create-order/', 'old')
+        self.post('/api/create-order/', 'new', dict(self.payload, customer_name='Juma'))
+        IdempotencyKey.objects.filter(key='old').update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(purge_expired_keys(batch_size=1), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
+
+
+class CheckoutTests(TestCase):
+    """A cart checks out as one order with a line per product, priced from the catalogue"""
+
+    @classmethod
+    def setUpTestData(cls):
+        vodacom = ServiceProvider.objects.create(name='Vodacom')
+        cls.plan = DataPlan.objects.create(
+            name='Wiki Bando', provider=vodacom, data_volume='5GB', validity_days=7, price=Decimal('5500.50')
+        )
+        cls.bundle = Bundle.objects.create(
+            name='Family', provider=vodacom, total_data_volume='6GB',
+            total_price=Decimal('6000.00'), discount_percentage=Decimal('12.50')
+        )
+        cls.router = RouterProduct.objects.create(name='Huawei B311', price=Decimal('150000.00'))
+        cls.retired = RouterProduct.objects.create(name='ZTE MF927', price=Decimal('85000.00'), is_available=False)
+
+    def checkout(self, items):
+        payload = {
+            'customer_name': 'Asha', 'customer_email': 'asha@example.com', 'customer_phone': '0712345678',
+            'items': items,
+        }
+        return self.client.post('/api/checkout/', payload, content_type='application/json', secure=True)
+
+    def test_checkout(self):
+        items = [
+            {'service_type': 'data_plan', 'product_id': self.plan.pk, 'quantity': 1, 'price': '1.00'},
+            {'service_type': 'bundle', 'product_id': self.bundle.pk, 'quantity': 2},
+            {'service_type': 'router', 'product_id': self.router.pk},
+            {'service_type': 'data_plan', 'product_id': self.plan.pk, 'quantity': 2},
+        ]
+        # Three price lookups, then the usual ingest plus one bulk insert for the lines
+        with self.assertNumQueries(11):
+            response = self.checkout(items)
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(
+            [(line['product_name'], line['quantity'], line['line_total']) for line in body['order']['items']],
+            [('Wiki Bando', 3, '16501.50'), ('Family', 2, '10500.00'), ('Huawei B311', 1, '150000.00')]
+        )
+
+        order = Order.objects.get()
+        self.assertEqual(order.total_price, Decimal('177001.50'))
+        self.assertEqual(order.quantity, 6)
+        self.assertEqual(order.service_type, 'router')
+        self.assertIsNone(order.router_product_id)
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual(order.tracking.tracking_number, body['tracking_number'])
+        self.assertEqual(order.tracking.events.count(), 1)
+        self.assertEqual(read_counts()['total'], 1)
+
+    def test_single_line_sets_reference(self):
+        response = self.checkout([{'service_type': 'bundle', 'product_id': self.bundle.pk}])
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get()
+        self.assertEqual((order.bundle_id, order.total_price), (self.bundle.pk, Decimal('5250.00')))
+
+    def test_rejects_unavailable_products(self):
+        response = self.checkout([
+            {'service_type': 'router', 'product_id': self.router.pk},
+            {'service_type': 'router', 'product_id': self.retired.pk},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.json())
+        self.assertEqual(self.checkout([]).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+
+@override_settings(NOTIFICATION_COALESCE_WINDOW=0)
+class NotificationOutboxTests(TestCase):
+    """Notifications are queued with the order change and sent later by the worker"""
+
+    def setUp(self):
+        record_worker_heartbeat()
+        self.order = Order.objects.create(
+            customer_name='Asha', customer_email='asha@example.com', customer_phone='0712345678',
+            product_details='Vodacom 10GB', total_price=Decimal('1500.00')
+        )
+
+    def test_status_change_queues(self):
+        admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.client.force_login(admin)
+        response = self.client.post(
+            f'/api/admin/orders/{self.order.pk}/update-status/', {'status': 'shipped'},
+            content_type='application/json', secure=True
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['notification_queued'])
+        self.assertEqual(mail.outbox, [])
+        row = NotificationOutbox.objects.get()
+        self.assertIn('Shipped', row.body)
+
+        self.assertEqual(drain_outbox()['sent'], 1)
+        self.assertEqual([message.to for message in mail.outbox], [['asha@example.com']])
+        row.refresh_from_db()
+        self.assertEqual(row.status, NotificationOutbox.SENT)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.customer_notified, self.order.notification_method), (True, 'email'))
+
+    def test_rolled_back_change_queues_nothing(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.order.send_notification(message='Shipped')
+            raise RuntimeError
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_worker_reuses_connection(self):
+        for _ in range(3):
+            self.order.send_notification(method='both')
+        with SMTPSink() as sink, override_settings(**sink.settings()):
+            self.assertEqual(drain_outbox(batch_size=2)['sent'], 3)
+        self.assertEqual((len(sink.messages), sink.connections), (3, 1))
+
+    def test_backoff_and_dead_letter(self):
+        self.order.customer_email = 'bounce@example.com'
+        self.order.send_notification()
+        with SMTPSink(reject=lambda address: address.startswith('bounce')) as sink, override_settings(**sink.settings()):
+            self.assertEqual(drain_outbox()['retried'], 1)
+            row = NotificationOutbox.objects.get()
+            self.assertEqual((row.status, row.attempts), (NotificationOutbox.PENDING, 1))
+            self.assertGreater(row.available_at, timezone.now())
+            self.assertIn('SMTPRecipientsRefused', row.last_error)
+
+            NotificationOutbox.objects.update(attempts=MAX_ATTEMPTS - 1, available_at=timezone.now())
+            self.assertEqual(drain_outbox()['dead'], 1)
+        self.assertEqual(NotificationOutbox.objects.get().status, NotificationOutbox.DEAD)
+        self.assertEqual(sink.messages, [])
+
+
+class BulkNotificationTests(TestCase):
+    """Admin notification actions send over a few reused connections and save with one bulk_update"""
+
+    def setUp(self):
+        for name in ['Asha', 'Juma', 'Neema', 'Baraka', 'Zawadi']:
+            Order.objects.create(
+                customer_name=name, customer_email=f'{name.lower()}@example.com', customer_phone='0712345678',
+                product_details='Vodacom 10GB', total_price=Decimal('1500.00')
+            )
+
+    def test_per_order_failures(self):
+        with SMTPSink(reject=lambda address: address.startswith('juma')) as sink, override_settings(**sink.settings()):
+            # One SELECT and one bulk UPDATE
+            with self.assertNumQueries(2):
+                sent, failures = notify_orders(Order.objects.order_by('id'), 'Price {note}: 100%', pool_size=2)
+        self.assertEqual(len(sent), 4)
+        self.assertEqual([order.customer_name for order, _ in failures], ['Juma'])
+        self.assertEqual(len(sink.messages), 4)
+        self.assertLessEqual(sink.connections, 3)  # two threads, one reconnect after the refusal
+        self.assertIn(b'Price {note}: 100%', sink.messages[0][2])
+        self.assertEqual(
+            dict(Order.objects.values_list('customer_name', 'customer_notified')),
+            {'Asha': True, 'Juma': False, 'Neema': True, 'Baraka': True, 'Zawadi': True}
+        )
+
+    def test_admin_action(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(admin)
+        response = self.client.post('/admin/store/order/', {
+            'action': 'send_notification_email', '_selected_action': list(Order.objects.values_list('pk', flat=True)),
+        }, secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            [str(message) for message in get_messages(response.wsgi_request)], ['Email notifications sent for 5 orders']
+        )
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertTrue(all('currently being processed' in message.body for message in mail.outbox))
+
+
+class NotificationCoalescingTests(TestCase):
+    """Status changes within the coalescing window go out as one digest"""
+
+    def setUp(self):
+        record_worker_heartbeat()
+        self.order = Order.objects.create(
+            customer_name='Asha', customer_email='asha@example.com', customer_phone='0712345678',
+            product_details='Vodacom 10GB', total_price=Decimal('1500.00')
+        )
+        admin = User.objects.create_user('admin', password='x', is_staff=True)
+        self.client.force_login(admin)
+
+    def change_status(self, status, **data):
+        response = self.client.post(
+            f'/api/admin/orders/{self.order.pk}/update-status/', dict(data, status=status),
+            content_type='application/json', secure=True
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=60)
+    def test_changes_merge_into_digest(self):
+        for status in ['confirmed', 'processing', 'processing']:
+            self.change_status(status)
+        row = NotificationOutbox.objects.get()
+        self.assertEqual(row.statuses, ['confirmed', 'processing'])
+        self.assertIn('Steps since our last update: Confirmed → Processing', row.body)
+        self.assertIn('- Status: Processing', row.body)
+        self.assertEqual(drain_outbox()['sent'], 0)  # still inside the window
+
+        NotificationOutbox.objects.update(available_at=timezone.now())
+        self.assertEqual(drain_outbox()['sent'], 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+        # After the digest is sent, the next change starts a new one
+        self.change_status('shipped')
+        self.assertEqual(NotificationOutbox.objects.filter(status=NotificationOutbox.PENDING).count(), 1)
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=60)
+    def test_terminal_status_flushes(self):
+        self.change_status('shipped')
+        self.change_status('delivered')
+        self.assertEqual(drain_outbox()['sent'], 1)
+        self.assertIn('Steps since our last update: Shipped → Delivered', mail.outbox[0].body)
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=60)
+    def test_custom_messages_are_not_merged(self):
+        self.change_status('confirmed')
+        self.change_status('processing', custom_message='Your router is being configured')
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+        self.assertEqual(drain_outbox()['sent'], 1)
+        self.assertIn('Your router is being configured', mail.outbox[0].body)
+
+
+class InlineNotificationFallbackTests(TestCase):
+    """Without a running worker, queued notifications are sent once the request commits"""
+
+    def setUp(self):
+        clear_worker_heartbeat()
+        self.order = Order.objects.create(
+            customer_name='Asha', customer_email='asha@example.com', customer_phone='0712345678',
+            product_details='Vodacom 10GB', total_price=Decimal('1500.00')
+        )
+        self.client.force_login(User.objects.create_user('admin', password='x', is_staff=True))
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=60)
+    def test_sent_after_commit_without_a_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/admin/orders/{self.order.pk}/update-status/', {'status': 'shipped'},
+                content_type='application/json', secure=True
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([message.to for message in mail.outbox], [['asha@example.com']])
+        self.assertEqual(NotificationOutbox.objects.get().status, NotificationOutbox.SENT)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.send_notification(message='Your router is on its way')
+        self.assertIn('Your router is on its way', mail.outbox[-1].body)
+
+    def test_worker_heartbeat_switches_requests_to_queueing(self):
+        with mock.patch('store.management.commands.run_notification_worker.record_worker_heartbeat',
+                        wraps=record_worker_heartbeat) as heartbeat:
+            call_command('run_notification_worker', '--once', stdout=StringIO())
+        self.assertTrue(heartbeat.called)
+        self.assertFalse(worker_running())  # a worker that stopped hands sending back to requests
+
+        record_worker_heartbeat()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.send_notification(message='Queued')
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(NotificationOutbox.objects.get().status, NotificationOutbox.PENDING)
+
+
+class KeysetPaginationTests(TestCase):
+    """Walking the cursor visits every row once, even across sub-millisecond and tied keys"""
+
+    def walk(self, paginator_class, queryset, **params):
+        ids, cursor = [], None
+        for _ in range(20):
+            query = dict(params, **({'cursor': cursor} if cursor else {}))
+            paginator = paginator_class()
+            page = paginator.paginate_queryset(queryset, Request(APIRequestFactory().get('/', query)))
+            ids += [row.pk for row in page]
+            cursor = paginator.next_cursor
+            if cursor is None:
+                return ids
+        self.fail('cursor walk did not finish')
+
+    def test_sub_millisecond_and_tied_timestamps(self):
+        start = timezone.now().replace(microsecond=0)
+        offsets = [0, 100, 200, 300, 400, 500, 500, 500]  # microseconds; the last three tie
+        orders = []
+        for offset in offsets:
+            order = Order.objects.create(
+                customer_name='Asha', customer_email='asha@example.com', customer_phone='0712345678',
+                product_details='Vodacom 10GB'
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=start + timedelta(microseconds=offset))
+            orders.append(order.pk)
+        expected = list(Order.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(len(expected), len(offsets))
+        for limit in (1, 2, 3):
+            self.assertEqual(self.walk(OrderKeysetPagination, Order.objects.all(), limit=limit), expected)
+
+    def test_price_ties(self):
+        for price in ['100.00', '100.00', '100.50', '100.00', '99.99']:
+            RouterProduct.objects.create(name='Router', price=Decimal(price))
+        expected = list(RouterProduct.objects.order_by('price', 'id').values_list('pk', flat=True))
+        self.assertEqual(self.walk(ProductKeysetPagination, RouterProduct.objects.all(), limit=2, sort='price'), expected)
+
+    def test_invalid_cursor(self):
+        request = Request(APIRequestFactory().get('/', {'cursor': 'not-a-cursor'}))
+        with self.assertRaises(NotFound):
+            OrderKeysetPagination().paginate_queryset(Order.objects.all(), request)
 
-# Create your tests here.
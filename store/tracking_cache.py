@@ -0,0 +1,130 @@
+# store/tracking_cache.py
+"""
+Read-through cache for the public tracking endpoint.
+
+`track_order` is polled by customers far more often than orders change,
+so the rendered JSON body is cached per tracking number. Numbers are
+matched case-insensitively: they are stored uppercase and every lookup is
+uppercased first, so "fre1a2b3c4" and "FRE1A2B3C4" share a database row
+and a cache entry.
+
+Found numbers are cached in the `shared` cache (Redis, or the database),
+not the per-process default, so an invalidation made by one worker reaches
+every other worker too. Each entry is stored with the number's generation
+as it was before the database read, and only served while that generation
+is current. Any write to an order or its tracking row moves the
+generation once the transaction commits (the signal handlers in
+store/signals.py and `update_order_status` take care of that), so a
+reader that loaded the row before the commit and stores its body after
+the bump leaves an entry nobody will serve. The entry and the generation
+are fetched together in one round trip.
+
+Unknown numbers are cached only in the per-process default cache, and
+briefly, so scanning for numbers costs no writes to the shared cache.
+"""
+import hashlib
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from .models import OrderTracking
+
+TRACKING_CACHE_ALIAS = 'shared'
+MISSING_CACHE_ALIAS = 'default'
+TRACKING_CACHE_TIMEOUT = 60 * 60
+# Outlives every entry stored under it, so an expired generation cannot
+# make a stale entry current again.
+GENERATION_TIMEOUT = 2 * TRACKING_CACHE_TIMEOUT
+MISSING_CACHE_TIMEOUT = 30
+MAX_TRACKING_NUMBER_LENGTH = 100
+SUPPORT_EMAIL = 'support@frechaiotech.com'
+
+NOT_FOUND = (404, JSONRenderer().render({'error': 'Tracking number not found'}))
+
+
+def normalize_tracking_number(value):
+    return (value or '').strip().upper()
+
+
+def tracking_cache_key(number):
+    # Hashed so any string a client sends makes a valid cache key.
+    return 'order-tracking:' + hashlib.md5(normalize_tracking_number(number).encode()).hexdigest()
+
+
+def tracking_generation_key(number):
+    return tracking_cache_key(number) + ':generation'
+
+
+def render_tracking(tracking):
+    """The response body; the timeline is one ordered range read of the tracking event index"""
+    order = tracking.order
+    return JSONRenderer().render({
+        'tracking_number': tracking.tracking_number,
+        'order_status': order.status,
+        'status_display': order.get_status_display(),
+        'customer_name': order.customer_name,
+        'product_details': order.product_details,
+        'order_date': order.created_at,
+        'status_updates': tracking.status_updates,
+        'customer_support_email': SUPPORT_EMAIL,
+    })
+
+
+def load_tracking_response(number):
+    tracking = (
+        OrderTracking.objects.select_related('order')
+        .filter(tracking_number=number, is_active=True)
+        .first()
+    )
+    if tracking is None:
+        return NOT_FOUND
+    return (200, render_tracking(tracking))
+
+
+def get_tracking_response(number):
+    """`(status_code, json_bytes)` for a tracking number, from the cache when possible"""
+    number = normalize_tracking_number(number)
+    if not number or len(number) > MAX_TRACKING_NUMBER_LENGTH:
+        return NOT_FOUND
+
+    missing = caches[MISSING_CACHE_ALIAS]
+    key, generation_key = tracking_cache_key(number), tracking_generation_key(number)
+    if missing.get(key) is not None:
+        return NOT_FOUND
+
+    cache = caches[TRACKING_CACHE_ALIAS]
+    cached = cache.get_many([key, generation_key])
+    generation = cached.get(generation_key)
+    entry = cached.get(key)
+    if entry is not None and entry[0] == generation:
+        return entry[1]
+
+    response = load_tracking_response(number)
+    if response is NOT_FOUND:
+        missing.set(key, True, MISSING_CACHE_TIMEOUT)
+    else:
+        cache.set(key, (generation, response), TRACKING_CACHE_TIMEOUT)
+    return response
+
+
+def invalidate_tracking(*numbers):
+    """Retire cached responses for `numbers` once the current transaction commits"""
+    numbers = [number for number in numbers if number]
+    if not numbers:
+        return
+
+    def bump():
+        generation = uuid.uuid4().hex
+        caches[TRACKING_CACHE_ALIAS].set_many(
+            {tracking_generation_key(number): generation for number in numbers}, GENERATION_TIMEOUT
+        )
+        caches[MISSING_CACHE_ALIAS].delete_many([tracking_cache_key(number) for number in numbers])
+
+    transaction.on_commit(bump)
+
+
+def invalidate_order_tracking(order_ids):
+    """Drop cached responses for the tracking numbers of these orders"""
+    invalidate_tracking(*OrderTracking.objects.filter(order_id__in=order_ids).values_list('tracking_number', flat=True))
@@ -24,11 +24,15 @@ from .views import (
     public_bundles,
     public_routers,
     all_services,
+    product_search,
+    catalog_facets,
     create_order,
+    checkout,
     user_login,
     user_logout,
     current_user,
     admin_order_stats,
+    admin_order_rollups,
     admin_update_order_status,
     admin_send_notification,
     admin_search_orders,
@@ -68,9 +72,12 @@ urlpatterns = [
     path('api/public-bundles/', public_bundles, name='public_bundles'),
     path('api/public-routers/', public_routers, name='public_routers'),
     path('api/all-services/', all_services, name='all_services'),
+    path('api/search/', product_search, name='product_search'),
+    path('api/facets/', catalog_facets, name='catalog_facets'),
     
     # Order management
     path('api/create-order/', create_order, name='create_order'),
+    path('api/checkout/', checkout, name='checkout'),
     path('api/track-order/<str:tracking_number>/', track_order, name='track_order'),
     path('api/guest-signup/', guest_order_signup, name='guest_order_signup'),
     
@@ -81,6 +88,7 @@ urlpatterns = [
     
     # Admin endpoints
     path('api/admin/order-stats/', admin_order_stats, name='admin_order_stats'),
+    path('api/admin/order-rollups/', admin_order_rollups, name='admin_order_rollups'),
     path('api/admin/orders/<int:order_id>/update-status/', admin_update_order_status, name='admin_update_order_status'),
     path('api/admin/orders/<int:order_id>/send-notification/', admin_send_notification, name='admin_send_notification'),
     path('api/admin/search-orders/', admin_search_orders, name='admin_search_orders'),
@@ -1,22 +1,46 @@
 # store/views.py
 from rest_framework import viewsets, permissions, status, filters
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
-from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from django.db import transaction
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.contrib.auth import authenticate, login, logout
 from django.shortcuts import render, redirect
+from django.http import HttpResponse
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from datetime import timedelta
+from decimal import Decimal
 
-from .models import Order, ServiceProvider, DataPlan, Bundle, RouterProduct, OrderTracking, ElectronicsDevices
+from .models import Order, ServiceProvider, DataPlan, Bundle, RouterProduct, OrderTracking, ElectronicsDevices, NotificationOutbox
 from .serializers import (
     OrderSerializer, OrderCreateSerializer, OrderUpdateSerializer, 
+    CheckoutSerializer, OrderItemSerializer,
     ServiceProviderSerializer, DataPlanSerializer, BundleSerializer,
     RouterProductSerializer, ElectronicsDevicesSerializer
 )
+from .catalog_cache import catalog_response
+from .pagination import ProductKeysetPagination, BundleKeysetPagination, OrderKeysetPagination
+from .mixins import CatalogViewSetMixin
+from .eager_loading import optimize_queryset
+from .conditional import compute_validators, not_modified_response, set_validators
+from .fast_serializers import fast_serialize, compile_serializer
+from .search import SEARCH_KINDS, search_catalog
+from .facets import get_catalog_facets
+from .data_volume import apply_volume_filters, parse_volume_param
+from .optimizer import MAX_DAYS, optimize_plans
+from .idempotency import idempotent
+from .order_ingest import place_cart_order, place_order
+from .order_search import search_orders
+from .tracking_cache import get_tracking_response
+from .order_stats import (
+    GLOBAL_SCOPE, MAX_ROLLUP_BUCKETS, ROLLUP_STEPS, user_scope, read_counts, read_rollups, orders_since, parse_moment
+)
+from .streaming import STREAM_RENDERER_CLASSES, get_stream_format, iter_serialized, streaming_response
 
 # ============ TEMPLATE VIEWS ============
 
@@ -56,7 +80,7 @@ def profile(request):
 
 # ============ DATA PLAN VIEWSETS ============
 
-class DataPlanViewSet(viewsets.ModelViewSet):
+class DataPlanViewSet(CatalogViewSetMixin, viewsets.ModelViewSet):
     """
     Public ViewSet for data plans
     """
@@ -77,7 +101,7 @@ class DataPlanViewSet(viewsets.ModelViewSet):
         if network_type:
             queryset = queryset.filter(network_type=network_type)
             
-        return queryset
+        return apply_volume_filters(queryset, self.request.query_params)
 
     @action(detail=False, methods=['get'])
     def data_types(self, request):
@@ -91,7 +115,30 @@ class DataPlanViewSet(viewsets.ModelViewSet):
         network_types = DataPlan.objects.values_list('network_type', flat=True).distinct()
         return Response({'network_types': list(network_types)})
 
-class AdminDataPlanViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def optimize(self, request):
+        """Cheapest plan combination per provider and network type for a volume and period"""
+        volume_mb = parse_volume_param(request.query_params.get('volume'))
+        if volume_mb is None or volume_mb <= 0:
+            return Response({'error': 'volume must be a positive amount, e.g. volume=20GB'}, status=400)
+        try:
+            # Without `days` each plan is bought once, whatever its validity
+            days = int(request.query_params['days']) if request.query_params.get('days') else 0
+            limit = max(1, min(int(request.query_params.get('limit', 5)), 50))
+        except ValueError:
+            return Response({'error': 'days and limit must be integers'}, status=400)
+        if 'days' in request.query_params and not 1 <= days <= MAX_DAYS:
+            return Response({'error': f'days must be between 1 and {MAX_DAYS}'}, status=400)
+        
+        results = optimize_plans(
+            volume_mb, days,
+            provider=request.query_params.get('provider'),
+            network_type=request.query_params.get('network_type'),
+            limit=limit
+        )
+        return Response({'volume_mb': volume_mb, 'days': days, 'results': results})
+
+class AdminDataPlanViewSet(CatalogViewSetMixin, viewsets.ModelViewSet):
     """
     Admin ViewSet for managing data plans
     """
@@ -117,7 +164,7 @@ class AdminDataPlanViewSet(viewsets.ModelViewSet):
 
 # ============ BUNDLE VIEWSETS ============
 
-class BundleViewSet(viewsets.ModelViewSet):
+class BundleViewSet(CatalogViewSetMixin, viewsets.ModelViewSet):
     """
     Public ViewSet for bundles
     """
@@ -135,7 +182,7 @@ class BundleViewSet(viewsets.ModelViewSet):
         if bundle_type:
             queryset = queryset.filter(bundle_type=bundle_type)
             
-        return queryset
+        return apply_volume_filters(queryset, self.request.query_params)
 
     @action(detail=False, methods=['get'])
     def featured(self, request):
@@ -150,7 +197,7 @@ class BundleViewSet(viewsets.ModelViewSet):
         bundle_types = Bundle.objects.values_list('bundle_type', flat=True).distinct()
         return Response({'bundle_types': list(bundle_types)})
 
-class AdminBundleViewSet(viewsets.ModelViewSet):
+class AdminBundleViewSet(CatalogViewSetMixin, viewsets.ModelViewSet):
     """
     Admin ViewSet for managing bundles
     """
@@ -192,7 +239,7 @@ class AdminBundleViewSet(viewsets.ModelViewSet):
 
 # ============ ELECTRONICS DEVICES VIEWSET ============
 
-class ElectronicsDevicesViewSet(viewsets.ModelViewSet):
+class ElectronicsDevicesViewSet(CatalogViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet for electronics devices
     """
@@ -207,10 +254,10 @@ class ElectronicsDevicesViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = ElectronicsDevices.objects.all()
         
-        # Filter by category if provided
+        # Filter by category if provided (exact match, so the category index applies)
         category = self.request.query_params.get('category', None)
         if category:
-            queryset = queryset.filter(category__icontains=category)
+            queryset = queryset.filter(category=category.lower())
             
         # Filter by price range if provided
         min_price = self.request.query_params.get('min_price', None)
@@ -264,6 +311,7 @@ class ElectronicsDevicesViewSet(viewsets.ModelViewSet):
 
 class OrderViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
+    pagination_class = OrderKeysetPagination
     
     def get_queryset(self):
         user = self.request.user
@@ -284,6 +332,10 @@ class OrderViewSet(viewsets.ModelViewSet):
             return OrderSerializer
         return OrderSerializer
     
+    @idempotent('orders-create')
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         if self.request.user.is_authenticated:
             serializer.save(user=self.request.user)
@@ -295,35 +347,26 @@ class OrderViewSet(viewsets.ModelViewSet):
         if not request.user.is_authenticated:
             return Response({'error': 'Authentication required'}, status=401)
         orders = Order.objects.filter(user=request.user)
+        page = self.paginate_queryset(orders)
+        if page is not None:
+            return self.get_paginated_response(OrderSerializer(page, many=True).data)
         serializer = OrderSerializer(orders, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def status_counts(self, request):
-        if request.user.is_staff:
-            counts = {
-                'total': Order.objects.count(),
-                'pending': Order.objects.filter(status='pending').count(),
-                'confirmed': Order.objects.filter(status='confirmed').count(),
-                'processing': Order.objects.filter(status='processing').count(),
-                'shipped': Order.objects.filter(status='shipped').count(),
-                'delivered': Order.objects.filter(status='delivered').count(),
-            }
-        else:
-            counts = {
-                'total': Order.objects.filter(user=request.user).count(),
-                'pending': Order.objects.filter(user=request.user, status='pending').count(),
-                'confirmed': Order.objects.filter(user=request.user, status='confirmed').count(),
-                'processing': Order.objects.filter(user=request.user, status='processing').count(),
-                'shipped': Order.objects.filter(user=request.user, status='shipped').count(),
-                'delivered': Order.objects.filter(user=request.user, status='delivered').count(),
-            }
-        return Response(counts)
+        scope = GLOBAL_SCOPE if request.user.is_staff else user_scope(request.user.id)
+        counts = read_counts(scope)
+        return Response({
+            key: counts[key]
+            for key in ('total', 'pending', 'confirmed', 'processing', 'shipped', 'delivered')
+        })
 
 class AdminOrderViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAdminUser]
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    pagination_class = OrderKeysetPagination
     
     def get_serializer_class(self):
         if self.action in ['update', 'partial_update']:
@@ -355,7 +398,7 @@ class AdminOrderViewSet(viewsets.ModelViewSet):
 
 # ============ SERVICE PROVIDER VIEWSETS ============
 
-class ServiceProviderViewSet(viewsets.ModelViewSet):
+class ServiceProviderViewSet(CatalogViewSetMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     queryset = ServiceProvider.objects.filter(is_active=True)
     serializer_class = ServiceProviderSerializer
@@ -364,7 +407,7 @@ class ServiceProviderViewSet(viewsets.ModelViewSet):
     def data_plans(self, request, pk=None):
         """Get data plans for a specific provider"""
         provider = self.get_object()
-        data_plans = DataPlan.objects.filter(provider=provider, is_active=True)
+        data_plans = optimize_queryset(DataPlan.objects.filter(provider=provider, is_active=True), DataPlanSerializer)
         serializer = DataPlanSerializer(data_plans, many=True)
         return Response({
             'provider': ServiceProviderSerializer(provider).data,
@@ -375,14 +418,14 @@ class ServiceProviderViewSet(viewsets.ModelViewSet):
     def bundles(self, request, pk=None):
         """Get bundles for a specific provider"""
         provider = self.get_object()
-        bundles = Bundle.objects.filter(provider=provider, is_active=True)
+        bundles = optimize_queryset(Bundle.objects.filter(provider=provider, is_active=True), BundleSerializer)
         serializer = BundleSerializer(bundles, many=True)
         return Response({
             'provider': ServiceProviderSerializer(provider).data,
             'bundles': serializer.data
         })
 
-class AdminServiceProviderViewSet(viewsets.ModelViewSet):
+class AdminServiceProviderViewSet(CatalogViewSetMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAdminUser]
     queryset = ServiceProvider.objects.all()
     serializer_class = ServiceProviderSerializer
@@ -403,7 +446,7 @@ class AdminServiceProviderViewSet(viewsets.ModelViewSet):
 
 # ============ ROUTER PRODUCT VIEWSETS ============
 
-class RouterProductViewSet(viewsets.ModelViewSet):
+class RouterProductViewSet(CatalogViewSetMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = RouterProductSerializer
     
@@ -423,7 +466,7 @@ class RouterProductViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class AdminRouterProductViewSet(viewsets.ModelViewSet):
+class AdminRouterProductViewSet(CatalogViewSetMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAdminUser]
     queryset = RouterProduct.objects.all()
     serializer_class = RouterProductSerializer
@@ -468,14 +511,36 @@ def electronics_stats(request):
         'categories_count': categories_count
     })
 
+def catalog_list_response(request, section, queryset, serializer_class, paginator=None):
+    """Serve a public catalog list from the snapshot unless the request pages or trims it"""
+    fields = serializer_class.get_requested_fields(request)
+    paginated = paginator is not None and ('cursor' in request.GET or 'limit' in request.GET)
+    if fields is None and not paginated:
+        return catalog_response(request, section)
+    
+    validators = compute_validators(request, queryset, serializer_class, fields)
+    response = not_modified_response(request, *validators)
+    if response is not None:
+        return response
+    
+    queryset = serializer_class.narrow_queryset(queryset, request)
+    queryset = optimize_queryset(queryset, serializer_class, fields)
+    page = paginator.paginate_queryset(queryset, request) if paginator else None
+    if page is not None:
+        response = paginator.get_paginated_response(serializer_class(page, many=True, fields=fields).data)
+    else:
+        response = Response(fast_serialize(serializer_class, queryset, fields))
+    return set_validators(response, *validators)
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def public_electronics(request):
     """Public endpoint to get all available electronics"""
     try:
         electronics = ElectronicsDevices.objects.filter(is_available=True)
-        serializer = ElectronicsDevicesSerializer(electronics, many=True)
-        return Response(serializer.data)
+        return catalog_list_response(request, 'electronics', electronics, ElectronicsDevicesSerializer, ProductKeysetPagination())
+    except NotFound:
+        raise
     except Exception as e:
         return Response(
             {'error': 'Failed to fetch electronics', 'details': str(e)},
@@ -488,8 +553,7 @@ def public_providers(request):
     """Public endpoint to get all active service providers"""
     try:
         providers = ServiceProvider.objects.filter(is_active=True)
-        serializer = ServiceProviderSerializer(providers, many=True)
-        return Response(serializer.data)
+        return catalog_list_response(request, 'providers', providers, ServiceProviderSerializer)
     except Exception as e:
         return Response(
             {'error': 'Failed to fetch providers', 'details': str(e)},
@@ -502,8 +566,9 @@ def public_data_plans(request):
     """Public endpoint to get all active data plans"""
     try:
         data_plans = DataPlan.objects.filter(is_active=True).select_related('provider')
-        serializer = DataPlanSerializer(data_plans, many=True)
-        return Response(serializer.data)
+        return catalog_list_response(request, 'data_plans', data_plans, DataPlanSerializer, ProductKeysetPagination())
+    except NotFound:
+        raise
     except Exception as e:
         return Response(
             {'error': 'Failed to fetch data plans', 'details': str(e)},
@@ -516,8 +581,9 @@ def public_bundles(request):
     """Public endpoint to get all active bundles"""
     try:
         bundles = Bundle.objects.filter(is_active=True).select_related('provider')
-        serializer = BundleSerializer(bundles, many=True)
-        return Response(serializer.data)
+        return catalog_list_response(request, 'bundles', bundles, BundleSerializer, BundleKeysetPagination())
+    except NotFound:
+        raise
     except Exception as e:
         return Response(
             {'error': 'Failed to fetch bundles', 'details': str(e)},
@@ -530,8 +596,9 @@ def public_routers(request):
     """Public endpoint to get all available router products"""
     try:
         routers = RouterProduct.objects.filter(is_available=True)
-        serializer = RouterProductSerializer(routers, many=True)
-        return Response(serializer.data)
+        return catalog_list_response(request, 'routers', routers, RouterProductSerializer, ProductKeysetPagination())
+    except NotFound:
+        raise
     except Exception as e:
         return Response(
             {'error': 'Failed to fetch routers', 'details': str(e)},
@@ -540,30 +607,82 @@ def public_routers(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@renderer_classes(STREAM_RENDERER_CLASSES)
 def all_services(request):
-    """Get all services in one endpoint"""
+    """Get all services in one endpoint, served from the catalog snapshot"""
     try:
-        providers = ServiceProvider.objects.filter(is_active=True)
-        data_plans = DataPlan.objects.filter(is_active=True).select_related('provider')
-        bundles = Bundle.objects.filter(is_active=True).select_related('provider')
-        routers = RouterProduct.objects.filter(is_available=True)
-        electronics = ElectronicsDevices.objects.filter(is_available=True)
+        stream_format = get_stream_format(request)
+        if stream_format:
+            sections = [
+                ('providers', ServiceProviderSerializer, ServiceProvider.objects.filter(is_active=True)),
+                ('data_plans', DataPlanSerializer, DataPlan.objects.filter(is_active=True)),
+                ('bundles', BundleSerializer, Bundle.objects.filter(is_active=True)),
+                ('routers', RouterProductSerializer, RouterProduct.objects.filter(is_available=True)),
+                ('electronics', ElectronicsDevicesSerializer, ElectronicsDevices.objects.filter(is_available=True)),
+            ]
+            return streaming_response(
+                [(name, compile_serializer(serializer_class).iter_serialize(queryset))
+                 for name, serializer_class, queryset in sections],
+                stream_format
+            )
+        return catalog_response(request)
+    except Exception as e:
+        return Response(
+            {'error': 'Failed to fetch services', 'details': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def catalog_facets(request):
+    """Facet counts and price histograms for the catalog filters, following the current selection"""
+    try:
+        sections = [section for section in request.GET.get('sections', '').split(',') if section]
+        version, etag, facets = get_catalog_facets(request.GET, sections)
+        last_modified = version // 1_000_000
         
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response({'version': version, **facets})
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {'error': 'Failed to compute facets', 'details': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def product_search(request):
+    """Ranked full-text search across electronics, routers, data plans and bundles"""
+    try:
+        query = request.GET.get('q', '').strip()
+        kinds = [kind for kind in request.GET.get('type', '').split(',') if kind in SEARCH_KINDS]
+        try:
+            limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+            offset = max(0, int(request.GET.get('offset', 0)))
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers'}, status=400)
+        
+        results, total = search_catalog(query, kinds, limit, offset)
         return Response({
-            'providers': ServiceProviderSerializer(providers, many=True).data,
-            'data_plans': DataPlanSerializer(data_plans, many=True).data,
-            'bundles': BundleSerializer(bundles, many=True).data,
-            'routers': RouterProductSerializer(routers, many=True).data,
-            'electronics': ElectronicsDevicesSerializer(electronics, many=True).data
+            'results': results,
+            'count': total,
+            'next': offset + limit if offset + limit < total else None,
         })
     except Exception as e:
         return Response(
-            {'error': 'Failed to fetch services', 'details': str(e)},
+            {'error': 'Search failed', 'details': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
+@idempotent('create_order')
 def create_order(request):
     """Create a new order with automatic tracking"""
     try:
@@ -580,20 +699,9 @@ def create_order(request):
         
         serializer = OrderCreateSerializer(data=order_data)
         if serializer.is_valid():
+            # Order, tracking and the first tracking event in one transaction.
             # For public orders, don't associate with user
-            order = serializer.save()
-            
-            # ✅ AUTOMATICALLY CREATE TRACKING FOR EVERY ORDER
-            tracking, created = OrderTracking.objects.get_or_create(
-                order=order,
-                defaults={
-                    'customer_email': order.customer_email,
-                    'customer_phone': order.customer_phone
-                }
-            )
-            
-            # Add initial status update
-            tracking.add_status_update('order_created', 'Order placed successfully')
+            order, tracking = place_order(serializer.validated_data)
             
             return Response({
                 'success': True,
@@ -610,6 +718,35 @@ def create_order(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+@idempotent('checkout')
+def checkout(request):
+    """Place one order for a whole cart, priced server-side, with automatic tracking"""
+    serializer = CheckoutSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        fields = dict(serializer.validated_data)
+        lines = fields.pop('items')
+        user = request.user if request.user.is_authenticated else None
+        # Header, lines, tracking and the first tracking event in one transaction
+        order, tracking = place_cart_order(fields, lines, user=user)
+        
+        return Response({
+            'success': True,
+            'order': dict(OrderSerializer(order).data, items=OrderItemSerializer(lines, many=True).data),
+            'tracking_number': tracking.tracking_number,
+            'message': 'Order created successfully! Use your tracking number to track your order.'
+        }, status=status.HTTP_201_CREATED)
+    
+    except Exception as e:
+        return Response(
+            {'error': 'Failed to place order', 'details': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['POST'])
 @permission_classes([permissions.AllowAny])
 def user_login(request):
@@ -662,15 +799,14 @@ def current_user(request):
 def admin_order_stats(request):
     """Get order statistics for admin dashboard"""
     try:
-        from django.db.models import Count
-        
+        counts = read_counts(GLOBAL_SCOPE)
         stats = {
-            'total_orders': Order.objects.count(),
-            'pending_orders': Order.objects.filter(status='pending').count(),
-            'completed_orders': Order.objects.filter(status='delivered').count(),
-            'recent_orders': Order.objects.filter(created_at__gte=timezone.now() - timezone.timedelta(days=7)).count(),
+            'total_orders': counts['total'],
+            'pending_orders': counts['pending'],
+            'completed_orders': counts['delivered'],
+            'recent_orders': orders_since(timezone.now() - timezone.timedelta(days=7)),
             'status_breakdown': {
-                status_val: Order.objects.filter(status=status_val).count()
+                status_val: counts[status_val]
                 for status_val, _ in Order.STATUS_CHOICES
             }
         }
@@ -679,6 +815,54 @@ def admin_order_stats(request):
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def admin_order_rollups(request):
+    """Orders and revenue per hour or day, with service type and status breakdowns, for dashboard charts"""
+    try:
+        granularity = request.GET.get('granularity', 'day')
+        if granularity not in ROLLUP_STEPS:
+            return Response({'error': f"granularity must be one of: {', '.join(ROLLUP_STEPS)}"}, status=400)
+        
+        end = parse_moment(request.GET['to']) if request.GET.get('to') else timezone.now()
+        default_span = timedelta(days=30) if granularity == 'day' else timedelta(hours=48)
+        start = parse_moment(request.GET['from']) if request.GET.get('from') else end - default_span
+        if start is None or end is None:
+            return Response({'error': 'from and to must be ISO dates or datetimes'}, status=400)
+        if start > end:
+            return Response({'error': 'from must not be after to'}, status=400)
+        if (end - start) / ROLLUP_STEPS[granularity] >= MAX_ROLLUP_BUCKETS:
+            return Response({'error': f'Range covers more than {MAX_ROLLUP_BUCKETS} buckets'}, status=400)
+        
+        buckets = read_rollups(
+            granularity, start, end,
+            service_type=request.GET.get('service_type'), status=request.GET.get('status')
+        )
+        totals = {
+            'orders': sum(bucket['orders'] for bucket in buckets),
+            'revenue': sum((bucket['revenue'] for bucket in buckets), Decimal('0')),
+        }
+        money = lambda value: str(value.quantize(Decimal('0.01')))
+        totals['revenue'] = money(totals['revenue'])
+        for bucket in buckets:
+            bucket['revenue'] = money(bucket['revenue'])
+            for breakdown in ('by_service_type', 'by_status'):
+                for entry in bucket[breakdown].values():
+                    entry['revenue'] = money(entry['revenue'])
+        
+        return Response({
+            'granularity': granularity,
+            'from': start,
+            'to': end,
+            'totals': totals,
+            'buckets': buckets,
+        })
+    except Exception as e:
+        return Response(
+            {'error': 'Failed to read order rollups', 'details': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAdminUser])
 def admin_update_order_status(request, order_id):
@@ -692,6 +876,8 @@ def admin_update_order_status(request, order_id):
         
         if new_status not in dict(Order.STATUS_CHOICES):
             return Response({'error': 'Invalid status'}, status=400)
+        if send_notification and notification_method not in dict(NotificationOutbox.METHOD_CHOICES):
+            return Response({'error': 'Invalid notification method'}, status=400)
         
         # Update order
         order.status = new_status
@@ -701,18 +887,19 @@ def admin_update_order_status(request, order_id):
         if new_status == 'delivered':
             order.completed_at = timezone.now()
         
-        order.save()
-        
-        # Send notification if requested
-        notification_sent = False
-        if send_notification:
-            message = request.data.get('custom_message') or f"Your order status has been updated to: {order.get_status_display()}"
-            notification_sent = order.send_notification(method=notification_method, message=message)
+        # The notification is queued with the status change and sent by run_notification_worker
+        notification_queued = False
+        with transaction.atomic():
+            order.save()
+            if send_notification:
+                # Without a custom message, rapid changes are merged into one digest
+                message = request.data.get('custom_message')
+                notification_queued = order.send_notification(method=notification_method, message=message)
         
         return Response({
             'message': 'Order updated successfully',
             'order': OrderSerializer(order).data,
-            'notification_sent': notification_sent
+            'notification_queued': notification_queued
         })
         
     except Order.DoesNotExist:
@@ -731,12 +918,14 @@ def admin_send_notification(request, order_id):
         
         if not message:
             return Response({'error': 'Message is required'}, status=400)
+        if method not in dict(NotificationOutbox.METHOD_CHOICES):
+            return Response({'error': 'Invalid notification method'}, status=400)
         
         success = order.send_notification(method=method, message=message)
         
         return Response({
             'success': success,
-            'message': 'Notification sent successfully' if success else 'Notification failed'
+            'message': 'Notification queued for delivery'
         })
         
     except Order.DoesNotExist:
@@ -745,27 +934,66 @@ def admin_send_notification(request, order_id):
         return Response({'error': str(e)}, status=500)
 
 @api_view(['GET'])
-@permission_classes([permissions.AllowAny])
+@permission_classes([permissions.IsAdminUser])
+@renderer_classes(STREAM_RENDERER_CLASSES)
 def admin_search_orders(request):
     """Search orders by customer name, email, phone, or product"""
     try:
-        query = request.GET.get('q', '')
+        query = request.GET.get('q', '').strip()
+        stream_format = get_stream_format(request)
         
-        if not query:
-            orders = Order.objects.all().order_by('-created_at')[:50]
-        else:
-            orders = Order.objects.filter(
-                Q(customer_name__icontains=query) |
-                Q(customer_email__icontains=query) |
-                Q(customer_phone__icontains=query) |
-                Q(product_details__icontains=query)
-            ).order_by('-created_at')
+        if query:
+            # Ranked search through the order search index, one page at a time
+            try:
+                limit = max(1, min(int(request.GET.get('limit', 50)), 200))
+                offset = max(0, int(request.GET.get('offset', 0)))
+            except ValueError:
+                return Response({'error': 'limit and offset must be integers'}, status=400)
+            
+            orders, total = search_orders(query, limit, offset)
+            if stream_format:
+                return streaming_response(
+                    [('results', iter(OrderSerializer(orders, many=True).data))],
+                    stream_format,
+                    trailer=lambda: {'count': total}
+                )
+            return Response({
+                'results': OrderSerializer(orders, many=True).data,
+                'count': total,
+                'next': offset + limit if offset + limit < total else None,
+            })
+        
+        orders = Order.objects.all()
+        paginator = OrderKeysetPagination()
+        page = paginator.paginate_queryset(orders, request)
+        if page is not None:
+            return paginator.get_paginated_response(OrderSerializer(page, many=True).data)
+        
+        orders = orders.order_by('-created_at')[:50]
+        
+        if stream_format:
+            streamed = {'count': 0}
+            
+            def counted(rows):
+                for row in rows:
+                    streamed['count'] += 1
+                    yield row
+            
+            return streaming_response(
+                [('results', counted(iter_serialized(orders, OrderSerializer)))],
+                stream_format,
+                trailer=lambda: streamed
+            )
+        
+        results = OrderSerializer(orders, many=True).data
         
         return Response({
-            'results': OrderSerializer(orders, many=True).data,
-            'count': orders.count()
+            'results': results,
+            'count': len(results)
         })
         
+    except NotFound:
+        raise
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
@@ -823,27 +1051,12 @@ def guest_order_signup(request):
 def track_order(request, tracking_number):
     """Public endpoint to track order status"""
     try:
-        tracking = OrderTracking.objects.get(
-            tracking_number=tracking_number,
-            is_active=True
-        )
-        order = tracking.order
-        
-        return Response({
-            'tracking_number': tracking.tracking_number,
-            'order_status': order.status,
-            'status_display': order.get_status_display(),
-            'customer_name': order.customer_name,
-            'product_details': order.product_details,
-            'order_date': order.created_at,
-            'status_updates': tracking.status_updates,
-            'customer_support_email': 'support@frechaiotech.com'
-        })
-        
-    except OrderTracking.DoesNotExist:
+        status_code, content = get_tracking_response(tracking_number)
+        return HttpResponse(content, status=status_code, content_type='application/json')
+    except Exception as e:
         return Response(
-            {'error': 'Tracking number not found'},
-            status=status.HTTP_404_NOT_FOUND
+            {'error': 'Failed to track order', 'details': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 @api_view(['POST'])